@@ -0,0 +1,80 @@
+"""
+工具调用动作日志
+记录成功修改沙盒的工具调用（tool_name / tool_input），可保存为JSON并在新的沙盒上确定性回放，
+重建已知场景时不再需要调用大模型
+"""
+
+import json
+import time
+from typing import Iterator, List, Optional
+
+
+# 动作日志文件的格式版本号
+ACTION_LOG_VERSION = 1
+
+
+class ActionLog:
+    """
+    按执行顺序排列的工具调用记录
+
+    每条记录包括 tool_name、tool_input（原样保存，回放时原样传回工具）和执行结果 result。
+    """
+
+    def __init__(self, actions: Optional[List[dict]] = None):
+        """
+        初始化动作日志
+
+        Args:
+            actions: 已有的动作记录列表
+        """
+        self.actions: List[dict] = list(actions or [])
+
+    def __len__(self) -> int:
+        return len(self.actions)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.actions)
+
+    def record(self, tool_name: str, tool_input, result: str) -> None:
+        """追加一条工具调用记录"""
+        self.actions.append({"tool_name": tool_name, "tool_input": tool_input, "result": result})
+
+    def clear(self) -> None:
+        """清空记录"""
+        self.actions.clear()
+
+    def to_dict(self) -> dict:
+        """转换为可JSON序列化的字典"""
+        return {
+            "version": ACTION_LOG_VERSION,
+            "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "actions": self.actions
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ActionLog":
+        """
+        从 to_dict 的结果（或只包含动作列表的旧数据）重建动作日志
+
+        Args:
+            data: 字典或动作记录列表
+
+        Returns:
+            动作日志
+        """
+        if isinstance(data, list):
+            return cls(data)
+        if data.get("version", ACTION_LOG_VERSION) > ACTION_LOG_VERSION:
+            raise ValueError(f"动作日志版本{data['version']}高于支持的版本{ACTION_LOG_VERSION}")
+        return cls(data.get("actions", []))
+
+    def save(self, path: str) -> None:
+        """保存为JSON文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "ActionLog":
+        """从JSON文件读取动作日志"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,547 @@
+"""
+物理沙盒性能基准测试
+用法：python benchmark.py <场景名>，不带参数时运行全部场景
+"""
+
+import argparse
+import copy
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict
+
+from physics_sandbox import PhysicsSandbox
+from status_renderer import render_status
+
+
+def _timeit(func: Callable[[], object], repeat: int = 5) -> float:
+    """多次执行取最小耗时（秒）"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _build_status(sandbox: PhysicsSandbox) -> dict:
+    """使状态缓存失效后重建 get_space_status，测量完整构建的耗时"""
+    sandbox.mark_dirty()
+    return sandbox.get_space_status()
+
+
+def _build_scene(body_count: int) -> PhysicsSandbox:
+    """构建包含地面和 body_count 个复制小球的场景"""
+    sandbox = PhysicsSandbox()
+    sandbox.create_ground("ground", (0, 580), (4000, 580))
+    sandbox.create_circle("ball", (20, 100), 8)
+    if body_count > 1:
+        sandbox.duplicate_body("ball", body_count - 1, offset=(0.5, 0))
+    return sandbox
+
+
+def bench_status_scaling() -> None:
+    """get_space_status 随物体数量的耗时变化，应近似线性"""
+    print("== get_space_status 名称解析扩展性 ==")
+    print(f"{'bodies':>8} {'ms/call':>10} {'us/body':>10}")
+    for count in (10, 100, 1000, 5000):
+        sandbox = _build_scene(count)
+        seconds = _timeit(lambda: _build_status(sandbox), repeat=3)
+        print(f"{count:>8} {seconds * 1e3:>10.2f} {seconds * 1e6 / count:>10.2f}")
+
+
+def bench_state_arrays() -> None:
+    """列式快照 get_state_arrays 与字典快照 get_space_status 的对比"""
+    print("== get_state_arrays vs get_space_status ==")
+    print(f"{'bodies':>8} {'dict ms':>10} {'arrays ms':>10} {'speedup':>8}")
+    for count in (10, 100, 1000, 5000):
+        sandbox = _build_scene(count)
+        dict_seconds = _timeit(lambda: _build_status(sandbox), repeat=3)
+        array_seconds = _timeit(sandbox.get_state_arrays, repeat=3)
+        print(f"{count:>8} {dict_seconds * 1e3:>10.2f} {array_seconds * 1e3:>10.2f} "
+              f"{dict_seconds / array_seconds:>7.1f}x")
+
+
+def bench_rollout_memory() -> None:
+    """get_simulation_sequence 的峰值内存应与 max_steps 无关"""
+    print("== get_simulation_sequence 峰值内存 ==")
+    print(f"{'max_steps':>10} {'steps':>6} {'seconds':>8} {'peak MB':>8}")
+    for max_steps in (250, 500, 1000, 2000):
+        # 没有地面的自由落体场景不会收敛，会跑满 max_steps
+        sandbox = PhysicsSandbox()
+        sandbox.create_box("box", (0, 0), (10, 10))
+        sandbox.duplicate_body("box", 49, offset=(15, 0))
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = sandbox.get_simulation_sequence(max_steps=max_steps)
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{max_steps:>10} {result['metadata']['total_steps']:>6} {seconds:>8.2f} {peak / 1e6:>8.2f}")
+
+
+def bench_snapshot() -> None:
+    """fork/snapshot 与原先 copy.deepcopy(space) 的耗时对比"""
+    print("== fork vs copy.deepcopy(space) ==")
+    print(f"{'bodies':>8} {'deepcopy ms':>12} {'fork ms':>10} {'speedup':>8}")
+    for count in (10, 100, 1000, 5000):
+        sandbox = _build_scene(count)
+        sandbox.create_car("car", (100, 100))
+        deepcopy_seconds = _timeit(lambda: copy.deepcopy(sandbox.space), repeat=3)
+        fork_seconds = _timeit(sandbox.fork, repeat=3)
+        print(f"{count:>8} {deepcopy_seconds * 1e3:>12.2f} {fork_seconds * 1e3:>10.2f} "
+              f"{deepcopy_seconds / fork_seconds:>7.1f}x")
+
+
+def _build_box_pile(shape_count: int) -> PhysicsSandbox:
+    """构建约 shape_count 个同尺寸方块逐行排列、落在地面上的场景"""
+    sandbox = PhysicsSandbox()
+    columns = max(2, int(shape_count ** 0.5))
+    sandbox.create_ground("ground", (-50, 0), (columns * 12 + 50, 0))
+    for row in range(max(1, shape_count // columns)):
+        name = f"box_{row}"
+        sandbox.create_box(name, (0, -20 - row * 12), (10, 10))
+        sandbox.duplicate_body(name, columns - 1, offset=(12, 0))
+    return sandbox
+
+
+def bench_broadphase() -> None:
+    """包围盒树与空间哈希在大量同尺寸方块场景下的步进吞吐"""
+    print("== 宽相位步进吞吐 (steps/s) ==")
+    print(f"{'shapes':>8} {'bbtree':>10} {'spatial_hash':>13} {'speedup':>8}")
+    for count in (100, 1000, 10000):
+        steps = max(5, 20000 // count)
+        throughput = {}
+        for mode in ("bbtree", "spatial_hash"):
+            sandbox = _build_box_pile(count)
+            sandbox.configure_broadphase(mode)
+            # 先让方块落下形成接触，再计时
+            for _ in range(30):
+                sandbox.space.step(1 / 60)
+            seconds = _timeit(lambda: [sandbox.space.step(1 / 60) for _ in range(steps)], repeat=1)
+            throughput[mode] = steps / seconds
+        print(f"{count:>8} {throughput['bbtree']:>10.1f} {throughput['spatial_hash']:>13.1f} "
+              f"{throughput['spatial_hash'] / throughput['bbtree']:>7.2f}x")
+
+
+def bench_threads() -> None:
+    """单线程与多线程求解器在大场景下的单步耗时"""
+    print(f"== 求解线程数对单步耗时的影响 (CPU核数: {os.cpu_count()}) ==")
+    print(f"{'shapes':>8} {'1 thread ms':>12} {'2 threads ms':>13} {'speedup':>8}")
+    for count in (1000, 5000, 10000):
+        step_ms = {}
+        for threads in (1, 2):
+            sandbox = _build_box_pile(count)
+            sandbox.configure_threads(threads)
+            for _ in range(30):
+                sandbox.space.step(1 / 60)
+            steps = 10
+            seconds = _timeit(lambda: [sandbox.space.step(1 / 60) for _ in range(steps)], repeat=2)
+            step_ms[threads] = seconds * 1e3 / steps
+        print(f"{count:>8} {step_ms[1]:>12.2f} {step_ms[2]:>13.2f} {step_ms[1] / step_ms[2]:>7.2f}x")
+
+
+def bench_parallel_rollouts() -> None:
+    """串行模拟多个变体与 RolloutService 多进程并行模拟的墙钟时间对比"""
+    from rollout_service import RolloutService
+
+    print(f"== 多变体模拟墙钟时间 (CPU核数: {os.cpu_count()}) ==")
+    print(f"{'variants':>8} {'serial s':>9} {'parallel s':>11} {'speedup':>8}")
+    sandbox = _build_scene(200)
+    with RolloutService(max_workers=max(2, os.cpu_count() or 1)) as service:
+        # 预热进程池，避免把进程启动时间计入
+        service.run_perturbations(sandbox, [{}, {}], max_steps=10)
+        for count in (2, 4, 8):
+            perturbations = [{"gravity": (0, 981 + 50 * i)} for i in range(count)]
+            serial = _timeit(lambda: RolloutService(max_workers=1).run_perturbations(
+                sandbox, perturbations, max_steps=300), repeat=1)
+            parallel = _timeit(lambda: service.run_perturbations(sandbox, perturbations, max_steps=300), repeat=1)
+            print(f"{count:>8} {serial:>9.2f} {parallel:>11.2f} {serial / parallel:>7.2f}x")
+
+
+def bench_bulk_create() -> None:
+    """create_bodies 批量创建与 duplicate_body 逐个复制的耗时对比"""
+    print("== create_bodies vs duplicate_body ==")
+    print(f"{'bodies':>8} {'duplicate ms':>13} {'bulk ms':>9} {'speedup':>8}")
+    for count in (100, 1000, 5000):
+        def duplicate() -> None:
+            sandbox = PhysicsSandbox()
+            sandbox.create_box("box", (0, 0), (10, 10))
+            sandbox.duplicate_body("box", count - 1, offset=(12, 0))
+
+        def bulk() -> None:
+            PhysicsSandbox().create_bodies("box", "box", layout={"type": "array", "start": (0, 0), "count": count,
+                                                                  "offset": (12, 0)}, size=(10, 10))
+
+        duplicate_seconds = _timeit(duplicate, repeat=3)
+        bulk_seconds = _timeit(bulk, repeat=3)
+        print(f"{count:>8} {duplicate_seconds * 1e3:>13.2f} {bulk_seconds * 1e3:>9.2f} "
+              f"{duplicate_seconds / bulk_seconds:>7.1f}x")
+
+
+def bench_particles() -> None:
+    """同样数量的小圆作为命名物体与作为粒子场时 get_space_status 的耗时与输出规模对比"""
+    print("== 命名物体 vs 粒子场的状态查询 ==")
+    print(f"{'circles':>8} {'named ms':>9} {'field ms':>9} {'named KB':>9} {'field KB':>9}")
+    for count in (1000, 5000):
+        layout = {"type": "grid", "origin": (0, 0), "rows": count // 50, "columns": 50, "spacing": (7, 7)}
+        named = PhysicsSandbox()
+        named.create_bodies("grain", "circle", layout=layout, size=3, mass=0.1)
+        field = PhysicsSandbox()
+        field.create_particle_field("sand", layout=layout)
+        named_seconds = _timeit(lambda: _build_status(named), repeat=3)
+        field_seconds = _timeit(lambda: _build_status(field), repeat=3)
+        named_size = len(repr(named.get_space_status())) / 1e3
+        field_size = len(repr(field.get_space_status())) / 1e3
+        print(f"{count:>8} {named_seconds * 1e3:>9.2f} {field_seconds * 1e3:>9.2f} "
+              f"{named_size:>9.1f} {field_size:>9.1f}")
+
+
+def bench_terrain() -> None:
+    """多段轨道用逐段 create_ground 与一次 create_terrain 搭建时的状态查询耗时与输出规模"""
+    print("== 逐段地面 vs 折线地形 ==")
+    print(f"{'segments':>8} {'grounds ms':>11} {'terrain ms':>11} {'grounds KB':>11} {'terrain KB':>11}")
+    for count in (10, 50, 200):
+        points = [(i * 20.0, 400 + 30 * ((i % 7) - 3)) for i in range(count + 1)]
+        grounds = PhysicsSandbox()
+        for i in range(count):
+            grounds.create_ground(f"piece_{i}", points[i], points[i + 1])
+        terrain = PhysicsSandbox()
+        terrain.create_terrain("track", points=points)
+        grounds_seconds = _timeit(lambda: _build_status(grounds), repeat=3)
+        terrain_seconds = _timeit(lambda: _build_status(terrain), repeat=3)
+        print(f"{count:>8} {grounds_seconds * 1e3:>11.2f} {terrain_seconds * 1e3:>11.2f} "
+              f"{len(repr(grounds.get_space_status())) / 1e3:>11.1f} {len(repr(terrain.get_space_status())) / 1e3:>11.1f}")
+
+
+def bench_constraints() -> None:
+    """链式连接场景中删除物体（级联删除约束）与清空的耗时"""
+    print("== 多关节场景的删除与清空 ==")
+    print(f"{'bodies':>8} {'us/remove':>10} {'clear ms':>9}")
+    for count in (100, 1000, 5000):
+        sandbox = PhysicsSandbox()
+        sandbox.create_bodies("node", "circle", layout={"type": "array", "start": (0, 0), "count": count,
+                                                        "offset": (10, 0)}, size=3)
+        for i in range(1, count):
+            sandbox.add_pin_joint(f"node_{i}", f"node_{i + 1}", (0, 0), (0, 0))
+        removed = [f"node_{i}" for i in range(1, count, 10)]
+        start = time.perf_counter()
+        for name in removed:
+            sandbox.remove_body(name)
+        remove_seconds = (time.perf_counter() - start) / len(removed)
+        clear_seconds = _timeit(sandbox.clear_all, repeat=1)
+        print(f"{count:>8} {remove_seconds * 1e6:>10.1f} {clear_seconds * 1e3:>9.2f}")
+
+
+def bench_status_cache() -> None:
+    """只读工具调用后获取状态：缓存命中与每次重建的对比"""
+    print("== 只读调用后的状态获取 ==")
+    print(f"{'bodies':>8} {'rebuild ms':>11} {'cached us':>10} {'delta ms':>9}")
+    for count in (100, 1000, 5000):
+        sandbox = _build_scene(count)
+        sandbox.get_space_status()
+
+        rebuild_seconds = _timeit(lambda: _build_status(sandbox), repeat=3)
+        cached_seconds = _timeit(lambda: (sandbox.get_position("ball"), sandbox.get_space_status()), repeat=3)
+        version = sandbox.get_space_status()["version"]
+        sandbox.set_position("ball", (30, 100))
+        delta_seconds = _timeit(lambda: sandbox.get_space_status(since_version=version), repeat=1)
+        print(f"{count:>8} {rebuild_seconds * 1e3:>11.2f} {cached_seconds * 1e6:>10.1f} {delta_seconds * 1e3:>9.2f}")
+
+
+def bench_status_render() -> None:
+    """原始状态 repr 与 render_status 紧凑输出的字符数及渲染耗时"""
+    print("== 状态渲染 ==")
+    print(f"{'bodies':>8} {'repr chars':>11} {'compact chars':>14} {'budget chars':>13} {'render ms':>10}")
+    for count in (10, 100, 1000):
+        sandbox = _build_scene(count)
+        sandbox.step()
+        status = sandbox.get_space_status()
+        compact_chars = len(render_status(status))
+        budget_chars = len(render_status(status, max_chars=6000))
+        render_seconds = _timeit(lambda: render_status(status, max_chars=6000), repeat=3)
+        print(f"{count:>8} {len(repr(status)):>11} {compact_chars:>14} {budget_chars:>13} {render_seconds * 1e3:>10.2f}")
+
+
+def bench_scene_io() -> None:
+    """场景文件（npz / json）的保存与加载耗时、文件大小，以及与 fork 的对比"""
+    print("== 场景文件读写 ==")
+    print(f"{'bodies':>8} {'format':>7} {'save ms':>9} {'load ms':>9} {'size KB':>9} {'fork ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (1000, 10000):
+            # 不重叠的网格场景；_build_scene 中重叠的小球会使包围盒树插入本身成为瓶颈
+            sandbox = PhysicsSandbox()
+            sandbox.create_ground("ground", (0, 580), (4000, 580))
+            sandbox.create_bodies("ball", layout={"type": "grid", "origin": (10, 10), "rows": count // 100,
+                                                  "columns": 100, "spacing": (12, 12)}, size=5)
+            sandbox.step()
+            fork_seconds = _timeit(sandbox.fork, repeat=1)
+            for format in ("npz", "json"):
+                path = os.path.join(directory, f"scene.{format}")
+                save_seconds = _timeit(lambda: sandbox.save_scene(path), repeat=3)
+                loaded = PhysicsSandbox()
+                # 先回收上一次加载的场景，避免把析构耗时计入加载
+                gc.collect()
+                load_seconds = _timeit(lambda: loaded.load_scene(path), repeat=1)
+                print(f"{count:>8} {format:>7} {save_seconds * 1e3:>9.1f} {load_seconds * 1e3:>9.1f} "
+                      f"{os.path.getsize(path) / 1024:>9.0f} {fork_seconds * 1e3:>9.1f}")
+
+
+def bench_rollout_cache() -> None:
+    """未变化场景重复模拟：每次重新步进、内存缓存命中与磁盘缓存命中的对比"""
+    from rollout_cache import RolloutCache
+
+    print("== 模拟结果缓存 ==")
+    print(f"{'bodies':>8} {'rollout ms':>11} {'memory ms':>10} {'disk ms':>9} {'hash ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (10, 100):
+            sandbox = _build_scene(count)
+            cache = RolloutCache(cache_dir=directory)
+            rollout_seconds = _timeit(lambda: cache.simulate(sandbox, output_format="compact"), repeat=1)
+            memory_seconds = _timeit(lambda: cache.simulate(sandbox, output_format="compact"))
+            disk_cache = RolloutCache(cache_dir=directory)
+            disk_seconds = _timeit(lambda: (disk_cache.clear(), disk_cache.simulate(sandbox, output_format="compact")))
+            hash_seconds = _timeit(lambda: (sandbox.mark_dirty(), sandbox.content_hash()))
+            print(f"{count:>8} {rollout_seconds * 1e3:>11.1f} {memory_seconds * 1e3:>10.3f} "
+                  f"{disk_seconds * 1e3:>9.2f} {hash_seconds * 1e3:>9.2f}")
+
+
+def _build_car_scene() -> PhysicsSandbox:
+    """main.py 中小车冲下斜面撞飞圆形的场景"""
+    sandbox = PhysicsSandbox()
+    sandbox.create_slope("slope", (50, 150), (600, 400))
+    sandbox.create_ground("flat", (600, 400), (1000, 400))
+    sandbox.create_circle("ball", (950, 385), 10, mass=0.3)
+    sandbox.create_car("car", (100, 110))
+    return sandbox
+
+
+def bench_collision_events() -> None:
+    """小车冲下斜面场景中记录碰撞事件的额外耗时，以及事件流与状态帧序列的输出规模"""
+    print("== 碰撞事件记录 ==")
+    sandbox = _build_car_scene()
+    plain_seconds = _timeit(lambda: sandbox.get_simulation_sequence(output_format="compact"), repeat=3)
+    events_seconds = _timeit(lambda: sandbox.get_simulation_sequence(
+        output_format="compact", record_collisions=True, min_collision_impulse=1.0), repeat=3)
+    result = sandbox.get_simulation_sequence(output_format="compact", record_collisions=True, min_collision_impulse=1.0)
+    print(f"{'plain ms':>9} {'events ms':>10} {'events':>7} {'event chars':>12} {'sequence chars':>15}")
+    print(f"{plain_seconds * 1e3:>9.1f} {events_seconds * 1e3:>10.1f} {len(result['collision_events']):>7} "
+          f"{len(render_status(result['collision_events'])):>12} {len(render_status(result['sequence'])):>15}")
+
+
+def bench_video_stream() -> None:
+    """流式编码与先缓存全部帧再编码的峰值内存和耗时，流式编码的峰值内存应与时长无关"""
+    import imageio
+    import numpy as np
+    import pygame as pg
+    from pymunk.pygame_util import DrawOptions
+    from video_renderer import render_video
+
+    def render_buffered(sandbox: PhysicsSandbox, path: str, seconds: float, fps: int = 60) -> None:
+        # 原先 render_video_frames 的做法
+        pg.init()
+        surface = pg.Surface((800, 600))
+        draw_options = DrawOptions(surface)
+        frames = []
+        for _ in range(int(seconds * fps)):
+            surface.fill((255, 255, 255))
+            sandbox.space.debug_draw(draw_options)
+            sandbox.step(1.0 / fps)
+            frames.append(np.frombuffer(pg.image.tostring(surface, "RGB"), dtype=np.uint8).reshape((600, 800, 3)))
+        imageio.mimwrite(path, frames, fps=fps, quality=7)
+        pg.quit()
+
+    print("== 视频编码 ==")
+    print(f"{'seconds':>8} {'mode':>9} {'time s':>8} {'peak MB':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "video.mp4")
+        for seconds in (1, 4):
+            for mode, render in (("buffered", render_buffered), ("streaming", render_video)):
+                sandbox = _build_car_scene()
+                tracemalloc.start()
+                start = time.perf_counter()
+                render(sandbox, path, seconds)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{seconds:>8} {mode:>9} {elapsed:>8.2f} {peak / 1e6:>8.1f}")
+
+
+def bench_frame_copy() -> None:
+    """从 800x600 Surface 取出一帧像素的耗时：字节串往返、surfarray 复制与直接引用像素内存"""
+    import numpy as np
+    import pygame as pg
+    from video_renderer import SURFACE_MASKS, surface_pixels
+
+    pg.init()
+    surface = pg.Surface((800, 600), 0, 32, SURFACE_MASKS)
+    surface.fill((255, 255, 255))
+    methods = {
+        # 原先 render_video_frames 的做法
+        "tostring": lambda: np.frombuffer(pg.image.tobytes(surface, "RGB"), dtype=np.uint8).reshape((600, 800, 3)),
+        "array3d": lambda: pg.surfarray.array3d(surface),
+        "view": lambda: surface_pixels(surface),
+    }
+    print("== 帧像素提取 ==")
+    print(f"{'method':>9} {'us/frame':>9}")
+    for name, method in methods.items():
+        seconds = _timeit(lambda: [method() for _ in range(100)]) / 100
+        print(f"{name:>9} {seconds * 1e6:>9.1f}")
+    pg.quit()
+
+
+def bench_static_layer() -> None:
+    """地形线段数不同的场景中，每帧用 debug_draw 绘制整个空间与缓存静态图层的绘制耗时"""
+    import math
+    import pygame as pg
+    from pymunk.pygame_util import DrawOptions
+    from video_renderer import SURFACE_MASKS, StaticLayerRenderer
+
+    pg.init()
+    surface = pg.Surface((800, 600), 0, 32, SURFACE_MASKS)
+    draw_options = DrawOptions(surface)
+    print("== 静态图层缓存 ==")
+    print(f"{'segments':>9} {'debug_draw ms':>14} {'layer ms':>9} {'speedup':>8}")
+    for segment_count in (100, 1000, 4000):
+        sandbox = PhysicsSandbox()
+        spacing = 800 / segment_count
+        heights = [500 + 40 * math.sin(i * spacing / 60) for i in range(segment_count + 1)]
+        sandbox.create_terrain("terrain", heights=heights, spacing=spacing)
+        sandbox.create_car("car", (100, 300))
+        for i in range(10):
+            sandbox.create_circle(f"ball{i}", (200 + 50 * i, 200), 10)
+        renderer = StaticLayerRenderer((800, 600))
+        renderer.draw(sandbox, surface, draw_options)  # 首帧绘制静态图层
+
+        def full_draw():
+            surface.fill((255, 255, 255))
+            sandbox.space.debug_draw(draw_options)
+
+        full_seconds = _timeit(lambda: [full_draw() for _ in range(20)]) / 20
+        layer_seconds = _timeit(lambda: [renderer.draw(sandbox, surface, draw_options) for _ in range(20)]) / 20
+        print(f"{segment_count:>9} {full_seconds * 1e3:>14.2f} {layer_seconds * 1e3:>9.2f} "
+              f"{full_seconds / layer_seconds:>7.1f}x")
+    pg.quit()
+
+
+def bench_numpy_rasterizer() -> None:
+    """大量同类形状的场景中，pygame 逐个形状绘制（debug_draw）与 NumPy 批量光栅化的单帧耗时"""
+    import pygame as pg
+    from pymunk.pygame_util import DrawOptions
+    from numpy_rasterizer import RasterScene
+    from video_renderer import SURFACE_MASKS
+
+    pg.init()
+    surface = pg.Surface((800, 600), 0, 32, SURFACE_MASKS)
+    draw_options = DrawOptions(surface)
+    print("== NumPy光栅化 ==")
+    print(f"{'shape':>6} {'bodies':>7} {'debug_draw ms':>14} {'numpy ms':>9} {'speedup':>8}")
+    for shape in ("circle", "box"):
+        for count in (100, 1000, 4000):
+            sandbox = PhysicsSandbox()
+            sandbox.create_ground("ground", (0, 590), (800, 590))
+            columns = 80
+            positions = [(10 + 10 * (i % columns), 10 + 10 * (i // columns)) for i in range(count)]
+            sandbox.create_bodies("item", shape=shape, positions=positions, size=4)
+            scene = RasterScene(sandbox.space, (800, 600))
+            frame = scene.render()
+
+            def pygame_draw():
+                surface.fill((255, 255, 255))
+                sandbox.space.debug_draw(draw_options)
+
+            pygame_seconds = _timeit(lambda: [pygame_draw() for _ in range(5)]) / 5
+            numpy_seconds = _timeit(lambda: [scene.render(out=frame) for _ in range(5)]) / 5
+            print(f"{shape:>6} {count:>7} {pygame_seconds * 1e3:>14.2f} {numpy_seconds * 1e3:>9.2f} "
+                  f"{pygame_seconds / numpy_seconds:>7.1f}x")
+    pg.quit()
+
+
+def bench_parallel_video() -> None:
+    """先记录轨迹再多进程绘制编码与逐帧串行渲染的耗时，并行耗时应随CPU核数近似线性下降"""
+    from parallel_video import render_video_parallel
+    from video_renderer import render_video
+
+    def build_scene() -> PhysicsSandbox:
+        sandbox = _build_car_scene()
+        positions = [(200 + 12 * (i % 40), 20 + 12 * (i // 40)) for i in range(400)]
+        sandbox.create_bodies("grain", shape="circle", positions=positions, size=4)
+        return sandbox
+
+    cores = os.cpu_count() or 1
+    seconds, fps = 4, 120
+    print(f"== 并行视频渲染（{seconds}秒，{fps}fps，{cores}核） ==")
+    print(f"{'mode':>12} {'workers':>8} {'time s':>8}")
+    modes = [("serial", 1, lambda sandbox, path, workers: render_video(
+        sandbox, path, duration_seconds=seconds, fps=fps, renderer="numpy"))]
+    for workers in sorted({1, cores}):
+        modes.append(("parallel", workers, lambda sandbox, path, workers: render_video_parallel(
+            sandbox, path, duration_seconds=seconds, fps=fps, max_workers=workers)))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "video.mp4")
+        for mode, workers, render in modes:
+            sandbox = build_scene()
+            start = time.perf_counter()
+            render(sandbox, path, workers)
+            print(f"{mode:>12} {workers:>8} {time.perf_counter() - start:>8.2f}")
+
+
+# main.py 中小车冲下斜面撞飞圆形的场景
+CAR_ON_SLOPE_ACTIONS = [
+    {"tool_name": "create_slope", "tool_input": {"name": "slope", "start_point": [50, 150], "end_point": [600, 400]}},
+    {"tool_name": "create_ground", "tool_input": {"name": "flat", "start_point": [600, 400], "end_point": [1000, 400]}},
+    {"tool_name": "create_circle", "tool_input": {"name": "ball", "position": [950, 385], "radius": 10, "mass": 0.3}},
+    {"tool_name": "create_car", "tool_input": {"name": "car", "position": [100, 110]}},
+]
+
+
+def bench_replay() -> None:
+    """按动作日志回放重建场景的耗时"""
+    # pymunk_tools 依赖 langchain，只在运行该场景时导入
+    from action_log import ActionLog
+    from pymunk_tools import PymunkToolManager
+
+    print("== 动作日志回放 ==")
+    action_log = ActionLog(CAR_ON_SLOPE_ACTIONS)
+    replay_seconds = _timeit(lambda: PymunkToolManager.from_action_log(action_log))
+    print(f"{'actions':>8} {'replay ms':>10}")
+    print(f"{len(action_log):>8} {replay_seconds * 1e3:>10.2f}")
+
+
+BENCHMARKS: Dict[str, Callable[[], None]] = {
+    "status": bench_status_scaling,
+    "arrays": bench_state_arrays,
+    "rollout_memory": bench_rollout_memory,
+    "snapshot": bench_snapshot,
+    "broadphase": bench_broadphase,
+    "threads": bench_threads,
+    "rollouts": bench_parallel_rollouts,
+    "bulk_create": bench_bulk_create,
+    "particles": bench_particles,
+    "terrain": bench_terrain,
+    "constraints": bench_constraints,
+    "status_cache": bench_status_cache,
+    "status_render": bench_status_render,
+    "scene_io": bench_scene_io,
+    "replay": bench_replay,
+    "rollout_cache": bench_rollout_cache,
+    "collisions": bench_collision_events,
+    "video_stream": bench_video_stream,
+    "frame_copy": bench_frame_copy,
+    "static_layer": bench_static_layer,
+    "numpy_raster": bench_numpy_rasterizer,
+    "parallel_video": bench_parallel_video,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="物理沙盒性能基准测试")
+    parser.add_argument("names", nargs="*", help=f"要运行的场景，可选：{', '.join(BENCHMARKS)}，默认全部")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"未知场景: {', '.join(unknown)}")
+    for name in args.names or BENCHMARKS:
+        BENCHMARKS[name]()
@@ -0,0 +1,228 @@
+"""
+碰撞事件记录器
+模拟过程中通过碰撞回调记录物体之间开始接触（begin）和分离（separate）的事件流，
+包括物体名称、时间、冲量大小和接触点，比均匀采样的状态帧更紧凑，也能捕捉到短暂的接触
+"""
+
+import heapq
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import pymunk
+
+
+class CollisionRecorder:
+    """
+    按物体对记录接触事件
+
+    同一对物体的多个形状（如地形的相邻线段）同时接触时只算一次接触：第一个形状对开始接触时记录 begin，
+    最后一个形状对分离时记录 separate。粒子场（多个物体共用一个名称）按名称对合并，
+    场中任一粒子与同一物体接触期间只算一次接触。begin 事件的冲量为接触第一步的碰撞冲量，
+    separate 事件给出整个接触期间的峰值冲量和持续步数。
+    接触的峰值冲量首次达到 min_impulse 时，若同一对名称（如粒子场与某个物体）当前没有其他达标的接触，
+    就把这一步标记为关键事件步（见 pop_step_begin），粒子持续落在同一物体上不会每步都产生关键帧。
+    """
+
+    def __init__(self, names: Dict[pymunk.Body, str], dt: float, min_impulse: float = 0.0,
+                 max_events: int = 200):
+        """
+        初始化碰撞事件记录器
+
+        Args:
+            names: 物体 -> 名称，粒子以粒子场名称出现；不在其中的物体不记录
+            dt: 时间步长（秒），用于换算事件时间
+            min_impulse: 峰值冲量低于该值的接触不输出（过滤静止堆叠等轻微接触）
+            max_events: 输出的最大接触次数，按峰值冲量保留最强的接触，超出部分只计数
+        """
+        self.names = names
+        self.dt = dt
+        self.min_impulse = min_impulse
+        self.max_events = max_events
+        self.step = 0
+        # 多个物体共用的名称（粒子场），其接触按名称对合并
+        self._grouped = {name for name, count in Counter(names.values()).items() if count > 1}
+        # 接触键（物体对或名称对） -> [接触中的形状对数量, 接触记录, 是否已达到冲量阈值]
+        self._active: Dict[tuple, list] = {}
+        self._contacts: List[dict] = []
+        # 记录中保留的已结束接触数上限，超出时只保留峰值冲量最大的，被裁掉的只计数
+        self._contact_limit = 4 * max(1, max_events)
+        self._contact_count = 0
+        self._pruned_reported = 0
+        # 名称对 -> 当前达到冲量阈值的接触数
+        self._active_names: Dict[Tuple[str, str], int] = {}
+        self._step_has_begin = False
+        self._closed = False
+        self._space: Optional[pymunk.Space] = None
+
+    def install(self, space: pymunk.Space) -> None:
+        """在空间上安装默认碰撞回调（匹配所有碰撞类型）"""
+        space.on_collision(begin=self._begin, post_solve=self._post_solve, separate=self._separate)
+        self._space = space
+
+    def _pair(self, arbiter: pymunk.Arbiter) -> Optional[tuple]:
+        """
+        接触键：涉及粒子场时为排序后的名称对，否则为按对象id排序的物体对，使键与形状顺序无关；
+        任一方没有名称或双方同名（如同一粒子场内部）时返回None
+        """
+        body_a, body_b = arbiter.bodies
+        name_a = self.names.get(body_a)
+        name_b = self.names.get(body_b)
+        if name_a is None or name_b is None or name_a == name_b:
+            return None
+        if name_a in self._grouped or name_b in self._grouped:
+            return (name_a, name_b) if name_a < name_b else (name_b, name_a)
+        return (body_a, body_b) if id(body_a) < id(body_b) else (body_b, body_a)
+
+    def _begin(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data) -> None:
+        if self._closed:
+            return
+        pair = self._pair(arbiter)
+        if pair is None:
+            return
+        entry = self._active.get(pair)
+        if entry is not None:
+            entry[0] += 1
+            return
+        body_a, body_b = arbiter.bodies
+        points = arbiter.contact_point_set.points
+        point = points[0].point_a if points else (body_a.position + body_b.position) / 2
+        contact = {
+            "bodies": [self.names[body_a], self.names[body_b]],
+            "begin_step": self.step,
+            "point": (point.x, point.y),
+            "impulse": None,
+            "peak_impulse": 0.0,
+            "end_step": None
+        }
+        self._active[pair] = [1, contact, False]
+        self._contacts.append(contact)
+        self._contact_count += 1
+        if len(self._contacts) > 2 * self._contact_limit:
+            self._prune()
+
+    def _post_solve(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data) -> None:
+        if self._closed:
+            return
+        pair = self._pair(arbiter)
+        entry = self._active.get(pair) if pair is not None else None
+        if entry is None:
+            return
+        impulse = arbiter.total_impulse.length
+        contact = entry[1]
+        if contact["impulse"] is None:
+            contact["impulse"] = impulse
+        if impulse > contact["peak_impulse"]:
+            contact["peak_impulse"] = impulse
+        if not entry[2] and self._is_reported(contact):
+            entry[2] = True
+            names = tuple(sorted(contact["bodies"]))
+            active = self._active_names.get(names, 0)
+            if active == 0:
+                self._step_has_begin = True
+            self._active_names[names] = active + 1
+
+    def _separate(self, arbiter: pymunk.Arbiter, space: pymunk.Space, data) -> None:
+        # 空间析构时形状可能已经与物体分离，此时读取 arbiter.bodies 会出错，关闭后不再访问 arbiter
+        if self._closed:
+            return
+        pair = self._pair(arbiter)
+        entry = self._active.get(pair) if pair is not None else None
+        if entry is None:
+            return
+        entry[0] -= 1
+        if entry[0] <= 0:
+            entry[1]["end_step"] = self.step
+            del self._active[pair]
+            if entry[2]:
+                names = tuple(sorted(entry[1]["bodies"]))
+                self._active_names[names] -= 1
+                if self._active_names[names] <= 0:
+                    del self._active_names[names]
+
+    def _prune(self) -> None:
+        """
+        裁剪接触记录：保留所有仍在接触中的记录，以及已结束接触中峰值冲量最大的若干条
+        （不少于 max_events，因此输出的最强接触不受裁剪影响）
+        """
+        finished = [contact for contact in self._contacts if contact["end_step"] is not None]
+        keep_count = max(self.max_events, self._contact_limit - (len(self._contacts) - len(finished)))
+        if len(finished) <= keep_count:
+            return
+        kept = heapq.nlargest(keep_count, finished, key=lambda contact: contact["peak_impulse"])
+        kept_ids = {id(contact) for contact in kept}
+        self._pruned_reported += sum(1 for contact in finished
+                                     if id(contact) not in kept_ids and self._is_reported(contact))
+        self._contacts = [contact for contact in self._contacts
+                          if contact["end_step"] is None or id(contact) in kept_ids]
+
+    def pop_step_begin(self) -> bool:
+        """自上次调用以来是否有名称对开始达标的接触，用于选取碰撞关键帧"""
+        has_begin = self._step_has_begin
+        self._step_has_begin = False
+        return has_begin
+
+    def close(self) -> None:
+        """模拟结束后调用：卸载空间上的碰撞回调，此后（如空间析构时）触发的回调不再记录"""
+        self._closed = True
+        if self._space is not None:
+            self._space.on_collision(begin=pymunk.empty_callback, post_solve=pymunk.empty_callback,
+                                     separate=pymunk.empty_callback)
+            self._space = None
+
+    def _is_reported(self, contact: dict) -> bool:
+        return contact["peak_impulse"] >= self.min_impulse
+
+    def events(self) -> List[dict]:
+        """
+        按时间排序的事件流，接触次数超过 max_events 时只输出峰值冲量最大的接触
+
+        Returns:
+            事件列表，每个事件包括：
+            - type: "begin" 或 "separate"
+            - bodies: 接触双方的名称
+            - step / time: 发生的步数和模拟时间
+            - begin: point 接触点、impulse 第一步的碰撞冲量大小
+            - separate: peak_impulse 接触期间的峰值冲量、duration 接触持续时间（秒）
+            模拟结束时仍在接触的物体对只有 begin 事件
+        """
+        events = []
+        reported = [contact for contact in self._contacts if self._is_reported(contact)]
+        strongest = heapq.nlargest(self.max_events, reported, key=lambda contact: contact["peak_impulse"])
+        for contact in strongest:
+            begin_step = contact["begin_step"]
+            events.append({
+                "type": "begin",
+                "bodies": contact["bodies"],
+                "step": begin_step,
+                "time": begin_step * self.dt,
+                "point": contact["point"],
+                "impulse": contact["impulse"] or 0.0
+            })
+            end_step = contact["end_step"]
+            if end_step is not None:
+                events.append({
+                    "type": "separate",
+                    "bodies": contact["bodies"],
+                    "step": end_step,
+                    "time": end_step * self.dt,
+                    "peak_impulse": contact["peak_impulse"],
+                    "duration": (end_step - begin_step) * self.dt
+                })
+        events.sort(key=lambda event: event["step"])
+        return events
+
+    def summary(self) -> dict:
+        """接触统计：总接触次数、输出的接触次数，以及峰值冲量最大的接触"""
+        reported = [contact for contact in self._contacts if self._is_reported(contact)]
+        strongest = max(reported, key=lambda contact: contact["peak_impulse"], default=None)
+        reported_total = len(reported) + self._pruned_reported
+        return {
+            "contact_count": self._contact_count,
+            "reported_count": min(reported_total, self.max_events),
+            "dropped_count": max(0, reported_total - self.max_events),
+            "strongest_contact": {
+                "bodies": strongest["bodies"],
+                "time": strongest["begin_step"] * self.dt,
+                "peak_impulse": strongest["peak_impulse"]
+            } if strongest is not None else None
+        }
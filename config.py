@@ -2,6 +2,21 @@ from dotenv import load_dotenv
 import os
 load_dotenv()
 
+# 物理沙盒配置
+# 物理步进的求解线程数，大于1时使用多线程求解器（最多2个线程，Windows上自动退回单线程）
+SANDBOX_THREADS = int(os.getenv("SANDBOX_THREADS", "1"))
+# 放入提示词的沙盒状态的字符预算和浮点数精度（见 status_renderer.render_status）
+STATUS_MAX_CHARS = int(os.getenv("STATUS_MAX_CHARS", "6000"))
+STATUS_PRECISION = 2
+# 模拟结果缓存的内存条目数，以及可选的磁盘缓存目录（为空表示只使用内存缓存）
+ROLLOUT_CACHE_SIZE = int(os.getenv("ROLLOUT_CACHE_SIZE", "32"))
+ROLLOUT_CACHE_DIR = os.getenv("ROLLOUT_CACHE_DIR") or None
+# 离线视频的绘制方式："pygame"（pymunk.pygame_util）、"numpy"（numpy_rasterizer，不需要SDL）
+# 或 "parallel"（parallel_video，先记录位姿轨迹再按CPU核数并行绘制和编码）
+VIDEO_RENDERER = os.getenv("VIDEO_RENDERER", "pygame")
+# Judge使用的模拟中输出的碰撞事件的最小峰值冲量，用于过滤静止接触
+JUDGE_MIN_COLLISION_IMPULSE = 1.0
+
 EXECTUTOR_BASE_URL = "https://api.deepseek.com/v1"
 EXECTUTOR_MODEL = "deepseek-chat"
 EXECTUTOR_API_KEY = os.getenv("DEEPSEEK_API_KEY")
@@ -40,6 +55,10 @@ EXECTUTOR_SYSTEM_PROMPT = """
 (5)当放置物体在斜面或平台上时：
    - 不要将物体放在斜面/平台的边缘点上，这会导致物体直接掉落
    - 示例：如果斜面从(100,300)到(500,400)，球应该放在(120,280)而不是(100,300)
+(6)沙盒状态以紧凑JSON给出：
+   - 省略的字段表示其值为0、空或默认值（如物体类型省略表示DYNAMIC）
+   - 角度字段为 angle_degrees（度数），数值保留两位小数
+   - 如果出现 omitted 字段，表示状态过长时各分区被省略的条目数（最先省略静态物体和形状几何）
 
 ## Response
 请记住，你的一切响应都必须以**可直接解析的JSON格式**输出，不包含任何额外的文本或代码块标记（如```json）。
@@ -161,7 +180,9 @@ JUDGE_SYSTEM_PROMPT = """
 3.如果不符合则给出修改的方向和建议
 
 ## Sequence Data
-模拟输出的沙盒状态序列数据如下所示:
+模拟输出的沙盒状态序列数据如下所示（scene为只出现一次的静态场景描述，包括形状、约束、静态物体和动态物体的质量；sequence中每一帧只包含非静态物体的位置、角度、速度和角速度，通过name与scene中的物体和形状对应；
+collision_events为按时间排序的碰撞事件，begin表示两个物体开始接触（包括接触点和碰撞冲量），separate表示分离（包括接触期间的峰值冲量和持续时间），
+collision_summary为碰撞统计。判断物体之间是否发生碰撞时优先依据碰撞事件，sequence中也包含了碰撞开始时刻的帧）:
 {sequence_data}
 
 ## User Instruction
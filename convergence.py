@@ -0,0 +1,133 @@
+"""
+基于NumPy数组的模拟收敛判定
+直接读取 PhysicsSandbox.get_state_arrays 的速度/角速度列，逐步整体计算判据
+"""
+
+from typing import Optional
+
+import numpy as np
+import pymunk
+
+
+class ConvergenceMonitor:
+    """
+    收敛判定引擎
+
+    每一步根据已启用的判据判断系统是否"平静"：
+    - 单体阈值：每个动态物体的线速度大小低于阈值，角速度绝对值低于阈值或在窗口内保持不变
+      （原地匀速空转的轮子视为已稳定）
+    - 全局阈值（可选）：所有动态物体的速度大小总和、角速度绝对值总和低于阈值
+    - 动能阈值（可选）：系统总动能低于阈值
+    连续 window 步都平静时判定为收敛（窗口稳态检验），避免弹跳最高点等瞬时低速被误判。
+    状态中包含 sleeping 字段且所有动态物体都已休眠时，立即判定为收敛。
+    """
+
+    # 收敛判定需要从沙盒读取的字段
+    STATE_FIELDS = ("velocity", "angular_velocity", "mass", "moment", "type_mask")
+
+    def __init__(self, velocity_threshold: float = 0.1, angular_threshold: float = 0.01,
+                 window: int = 10, global_velocity_threshold: Optional[float] = None,
+                 global_angular_threshold: Optional[float] = None,
+                 kinetic_energy_threshold: Optional[float] = None):
+        """
+        初始化收敛判定引擎
+
+        Args:
+            velocity_threshold: 单个物体线速度大小阈值（像素/秒）
+            angular_threshold: 单个物体角速度阈值（弧度/秒）
+            window: 需要连续保持平静的步数
+            global_velocity_threshold: 速度大小总和阈值，None表示不启用
+            global_angular_threshold: 角速度绝对值总和阈值，None表示不启用
+            kinetic_energy_threshold: 系统总动能阈值，None表示不启用
+        """
+        self.velocity_threshold = velocity_threshold
+        self.angular_threshold = angular_threshold
+        self.window = max(1, window)
+        self.global_velocity_threshold = global_velocity_threshold
+        self.global_angular_threshold = global_angular_threshold
+        self.kinetic_energy_threshold = kinetic_energy_threshold
+        self.calm_steps = 0
+        # 最近 window 步的角速度环形缓冲区，用于检验原地匀速转动
+        self._angular_history = np.empty((self.window, 0))
+        self._history_size = 0
+        self.metrics = {
+            "velocity_sum": 0.0,
+            "angular_velocity_sum": 0.0,
+            "max_body_speed": 0.0,
+            "max_body_angular_speed": 0.0,
+            "kinetic_energy": 0.0,
+            "max_unsteady_angular_speed": 0.0
+        }
+
+    def measure(self, state: dict) -> dict:
+        """
+        计算当前状态的收敛指标
+
+        Args:
+            state: get_state_arrays 返回的状态，需包含 STATE_FIELDS 中的字段
+
+        Returns:
+            指标字典，同时保存在 self.metrics 中
+        """
+        dynamic = state["type_mask"] == pymunk.Body.DYNAMIC
+        velocity = state["velocity"][dynamic]
+        signed_angular = state["angular_velocity"][dynamic]
+        angular = np.abs(signed_angular)
+        speed_squared = np.einsum("ij,ij->i", velocity, velocity)
+        speed = np.sqrt(speed_squared)
+        kinetic_energy = 0.5 * (state["mass"][dynamic] @ speed_squared + state["moment"][dynamic] @ (angular * angular))
+        self.metrics = {
+            "velocity_sum": float(speed.sum()),
+            "angular_velocity_sum": float(angular.sum()),
+            "max_body_speed": float(speed.max(initial=0.0)),
+            "max_body_angular_speed": float(angular.max(initial=0.0)),
+            "kinetic_energy": float(kinetic_energy),
+            "max_unsteady_angular_speed": float(angular.max(initial=0.0))
+        }
+
+        # 更新角速度历史；物体数量变化时重新开始记录
+        history = self._angular_history
+        if history.shape[1] != len(signed_angular):
+            history = self._angular_history = np.empty((self.window, len(signed_angular)))
+            self._history_size = 0
+        history[self._history_size % self.window] = signed_angular
+        self._history_size += 1
+        if self._history_size >= self.window and len(signed_angular):
+            # 窗口内角速度变化很小的物体视为匀速转动，不计入角速度判据
+            steady = np.ptp(history, axis=0) < self.angular_threshold
+            self.metrics["max_unsteady_angular_speed"] = float(angular[~steady].max(initial=0.0))
+        return self.metrics
+
+    def is_calm(self, metrics: dict) -> bool:
+        """判断一组指标是否满足所有已启用的判据"""
+        if metrics["max_body_speed"] >= self.velocity_threshold:
+            return False
+        if metrics["max_unsteady_angular_speed"] >= self.angular_threshold:
+            return False
+        if self.global_velocity_threshold is not None and metrics["velocity_sum"] >= self.global_velocity_threshold:
+            return False
+        if self.global_angular_threshold is not None and metrics["angular_velocity_sum"] >= self.global_angular_threshold:
+            return False
+        if self.kinetic_energy_threshold is not None and metrics["kinetic_energy"] >= self.kinetic_energy_threshold:
+            return False
+        return True
+
+    def update(self, state: dict) -> Optional[str]:
+        """
+        输入新一步的状态并判断是否收敛
+
+        Args:
+            state: get_state_arrays 返回的状态
+
+        Returns:
+            收敛时返回原因说明，否则返回None
+        """
+        metrics = self.measure(state)
+        if "sleeping" in state:
+            dynamic = state["type_mask"] == pymunk.Body.DYNAMIC
+            if state["sleeping"][dynamic].all():
+                return "所有动态物体均已休眠，系统已稳定"
+        self.calm_steps = self.calm_steps + 1 if self.is_calm(metrics) else 0
+        if self.calm_steps >= self.window:
+            return f"所有动态物体连续{self.calm_steps}步低于速度、角速度及能量阈值，系统趋于稳定"
+        return None
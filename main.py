@@ -1,8 +1,16 @@
+import sys
+
+from action_log import ActionLog
 from pymunk_agent import PymunkAgent
+from pymunk_tools import PymunkToolManager
 
 if __name__ == "__main__":
-    agent = PymunkAgent()
-    agent.run("创建一个比较长的斜面，在斜面的末尾连接一个平面，平面的末尾放一个较轻的圆形，再做一个小车，矩形为车体，两个圆为轮子，将小车平稳放在该斜面上，让其自然受重力滑下，最后撞飞圆形")
-    space = agent.tool_manager.sandbox.space
+    if len(sys.argv) > 1:
+        # python main.py <动作日志路径>：回放已保存的动作日志重建场景，不调用大模型
+        space = PymunkToolManager.from_action_log(ActionLog.load(sys.argv[1])).sandbox.space
+    else:
+        agent = PymunkAgent()
+        agent.run("创建一个比较长的斜面，在斜面的末尾连接一个平面，平面的末尾放一个较轻的圆形，再做一个小车，矩形为车体，两个圆为轮子，将小车平稳放在该斜面上，让其自然受重力滑下，最后撞飞圆形")
+        space = agent.tool_manager.sandbox.space
     import util
-    util.run(space)
\ No newline at end of file
+    util.run(space)
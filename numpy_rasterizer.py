@@ -0,0 +1,415 @@
+"""
+NumPy光栅化器
+把空间中的圆形、多边形、线段和约束直接光栅化到 (height, width, 3) 的RGB数组，不依赖pygame/SDL：
+同一类图元在一帧内批量处理，覆盖测试对所有图元包围盒内的像素做一次向量化计算。
+静态形状在构建场景时光栅化为背景，每帧只根据物体位姿绘制非静态形状和约束
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pymunk
+import pymunk.batch
+
+
+# 与 pymunk.SpaceDebugDrawOptions 默认配色一致
+STATIC_COLOR = (149, 165, 166)
+DYNAMIC_COLOR = (52, 152, 219)
+KINEMATIC_COLOR = (39, 174, 96)
+SLEEPING_COLOR = (114, 148, 168)
+OUTLINE_COLOR = (44, 62, 80)
+CONSTRAINT_COLOR = (142, 68, 173)
+# 包围盒尺寸相同的图元达到该数量时按组广播计算，见 _cover
+MIN_GROUP = 8
+# 约束锚点的圆点半径，与 pymunk.pygame_util.DrawOptions.draw_dot 一致
+DOT_RADIUS = 5.0
+
+
+def _cover(x_min: np.ndarray, y_min: np.ndarray, x_max: np.ndarray, y_max: np.ndarray,
+           width: int, height: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    分组枚举所有图元包围盒覆盖的像素
+
+    包围盒的宽高只取决于图元的尺寸（不取决于位置），尺寸相同的图元（如同半径的粒子）不少于 MIN_GROUP 个时
+    作为一组广播计算：px 的形状为 (图元数, 1, 宽)，py 为 (图元数, 高, 1)，只与x或y有关的量不必按像素展开；
+    其余图元的包围盒裁剪到画面内后展开成一维像素列表。广播组中超出画面的像素由 _paint 过滤。
+
+    Yields:
+        (owner, px, py)：owner 为像素所属的图元下标，可以与 px、py 广播
+    """
+    x0 = np.floor(x_min).astype(np.intp)
+    y0 = np.floor(y_min).astype(np.intp)
+    # 容差使浮点误差不会把尺寸相同的图元分到不同的组
+    box_width = np.floor(x_max - x_min + 1e-6).astype(np.intp) + 2
+    box_height = np.floor(y_max - y_min + 1e-6).astype(np.intp) + 2
+    visible = np.flatnonzero((x0 < width) & (x0 + box_width > 0) & (y0 < height) & (y0 + box_height > 0))
+    if not len(visible):
+        return
+    size_key = box_width[visible] * (box_height[visible].max() + 1) + box_height[visible]
+    _, group, counts = np.unique(size_key, return_inverse=True, return_counts=True)
+    for g in np.flatnonzero(counts >= MIN_GROUP):
+        owner = visible[group == g]
+        columns = np.arange(box_width[owner[0]])
+        rows = np.arange(box_height[owner[0]])
+        yield (owner[:, None, None], x0[owner][:, None, None] + columns[None, None, :],
+               y0[owner][:, None, None] + rows[None, :, None])
+
+    rest = visible[counts[group] < MIN_GROUP]
+    if not len(rest):
+        return
+    left = np.clip(x0[rest], 0, width)
+    right = np.clip(x0[rest] + box_width[rest], 0, width)
+    top = np.clip(y0[rest], 0, height)
+    bottom = np.clip(y0[rest] + box_height[rest], 0, height)
+    clipped_width = right - left
+    pixel_counts = clipped_width * (bottom - top)
+    index = np.repeat(np.arange(len(rest)), pixel_counts)
+    local = np.arange(index.size) - np.repeat(np.cumsum(pixel_counts) - pixel_counts, pixel_counts)
+    index_width = clipped_width[index]
+    yield rest[index], left[index] + local % index_width, top[index] + local // index_width
+
+
+def _paint(frame: np.ndarray, hit: np.ndarray, owner: np.ndarray, px: np.ndarray, py: np.ndarray,
+           colors: np.ndarray) -> None:
+    """把命中且位于画面内的像素涂成所属图元的颜色"""
+    height, width = frame.shape[:2]
+    if px.min() < 0 or px.max() >= width or py.min() < 0 or py.max() >= height:
+        hit &= (px >= 0) & (px < width) & (py >= 0) & (py < height)
+    pixels = np.broadcast_to(py * width + px, hit.shape)[hit]
+    if (colors == colors[0]).all():
+        # 同色图元（最常见的情况）直接广播一个颜色，不按像素收集颜色
+        frame.reshape(-1, 3)[pixels] = colors[0]
+    else:
+        frame.reshape(-1, 3)[pixels] = colors[np.broadcast_to(owner, hit.shape)[hit]]
+
+
+def fill_capsules(frame: np.ndarray, a: np.ndarray, b: np.ndarray, radius: np.ndarray,
+                  colors: np.ndarray) -> None:
+    """
+    批量填充胶囊形（到线段 ab 的距离不超过半径的区域），a == b 时为圆
+
+    Args:
+        frame: (height, width, 3) 的目标数组
+        a, b: (n, 2) 的端点像素坐标
+        radius: (n,) 的半径
+        colors: (n, 3) 的uint8颜色
+    """
+    if not len(a):
+        return
+    height, width = frame.shape[:2]
+    low = np.minimum(a, b) - radius[:, None]
+    high = np.maximum(a, b) + radius[:, None]
+    edge = (b - a).astype(np.float32)
+    length2 = np.einsum("ij,ij->i", edge, edge)
+    is_disc = length2 == 0
+    inverse_length2 = np.where(is_disc, 0.0, 1.0 / np.where(is_disc, 1.0, length2)).astype(np.float32)
+    radius2 = (radius * radius).astype(np.float32)
+    for owner, px, py in _cover(low[:, 0], low[:, 1], high[:, 0], high[:, 1], width, height):
+        # 相对端点a的偏移只与x或y有关，先在未展开的形状上计算
+        dx = (px - a[owner, 0]).astype(np.float32)
+        dy = (py - a[owner, 1]).astype(np.float32)
+        if not is_disc[owner].all():
+            # 减去在线段上的投影（投影参数 t 截断到 [0, 1]），得到到线段最近点的偏移
+            ex = edge[owner, 0]
+            ey = edge[owner, 1]
+            t = np.clip((dx * ex + dy * ey) * inverse_length2[owner], 0.0, 1.0)
+            dx = dx - t * ex
+            dy = dy - t * ey
+        _paint(frame, dx * dx + dy * dy <= radius2[owner], owner, px, py, colors)
+
+
+def fill_polygons(frame: np.ndarray, vertices: np.ndarray, colors: np.ndarray) -> None:
+    """
+    批量填充凸多边形
+
+    Args:
+        frame: (height, width, 3) 的目标数组
+        vertices: (n, m, 2) 的顶点像素坐标，顶点数不足m的多边形用重复的最后一个顶点补齐
+        colors: (n, 3) 的uint8颜色
+    """
+    if not len(vertices):
+        return
+    height, width = frame.shape[:2]
+    low = vertices.min(axis=1)
+    high = vertices.max(axis=1)
+    vertex_count = vertices.shape[1]
+    edges = (np.roll(vertices, -1, axis=1) - vertices).astype(np.float32)
+    for owner, px, py in _cover(low[:, 0], low[:, 1], high[:, 0], high[:, 1], width, height):
+        # 像素在所有边的同一侧时位于凸多边形内，不依赖顶点的环绕方向；补齐的退化边对任何像素都为0
+        positive = None
+        negative = None
+        for k in range(vertex_count):
+            cross = (edges[owner, k, 0] * (py - vertices[owner, k, 1]).astype(np.float32)
+                     - edges[owner, k, 1] * (px - vertices[owner, k, 0]).astype(np.float32))
+            if positive is None:
+                positive = cross >= 0
+                negative = cross <= 0
+            else:
+                positive &= cross >= 0
+                negative &= cross <= 0
+        _paint(frame, positive | negative, owner, px, py, colors)
+
+
+class _Capsules:
+    """同一类胶囊形图元：两个端点分别以局部坐标挂在（可以不同的）物体上"""
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+
+    def add(self, body_a: int, point_a, body_b: int, point_b, radius: float, color, tint: bool = False) -> None:
+        self.rows.append((body_a, point_a[0], point_a[1], body_b, point_b[0], point_b[1], radius, *color, tint))
+
+    def freeze(self) -> None:
+        """把行列表转换为列数组"""
+        rows = np.array(self.rows, dtype=np.float64).reshape(len(self.rows), 11)
+        self.body_a = rows[:, 0].astype(np.intp)
+        self.point_a = rows[:, 1:3]
+        self.body_b = rows[:, 3].astype(np.intp)
+        self.point_b = rows[:, 4:6]
+        self.radius = rows[:, 6]
+        self.colors = rows[:, 7:10].astype(np.uint8)
+        self.tint = rows[:, 10].astype(bool)
+        del self.rows
+
+    def draw(self, frame: np.ndarray, positions: np.ndarray, cosines: np.ndarray, sines: np.ndarray,
+             sleeping: np.ndarray) -> None:
+        a = _to_world(self.body_a, self.point_a, positions, cosines, sines)
+        b = _to_world(self.body_b, self.point_b, positions, cosines, sines)
+        fill_capsules(frame, a, b, self.radius, _shade(self.colors, self.tint, self.body_a, sleeping))
+
+
+class _Polygons:
+    """多边形图元：顶点以局部坐标挂在物体上"""
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+
+    def add(self, body: int, vertices, color, tint: bool = False) -> None:
+        self.rows.append((body, [tuple(vertex) for vertex in vertices], color, tint))
+
+    def freeze(self) -> None:
+        vertex_count = max((len(vertices) for _, vertices, _, _ in self.rows), default=0)
+        self.body = np.array([row[0] for row in self.rows], dtype=np.intp)
+        padded = [vertices + vertices[-1:] * (vertex_count - len(vertices)) for _, vertices, _, _ in self.rows]
+        self.vertices = np.array(padded, dtype=np.float64).reshape(len(self.rows), vertex_count, 2)
+        self.colors = np.array([row[2] for row in self.rows], dtype=np.uint8).reshape(-1, 3)
+        self.tint = np.array([row[3] for row in self.rows], dtype=bool)
+        del self.rows
+
+    def draw(self, frame: np.ndarray, positions: np.ndarray, cosines: np.ndarray, sines: np.ndarray,
+             sleeping: np.ndarray) -> None:
+        if not len(self.body):
+            return
+        c = cosines[self.body][:, None]
+        s = sines[self.body][:, None]
+        x = self.vertices[..., 0]
+        y = self.vertices[..., 1]
+        world = np.stack([positions[self.body, 0][:, None] + c * x - s * y,
+                          positions[self.body, 1][:, None] + s * x + c * y], axis=-1)
+        fill_polygons(frame, world, _shade(self.colors, self.tint, self.body, sleeping))
+
+
+def _to_world(body: np.ndarray, local: np.ndarray, positions: np.ndarray, cosines: np.ndarray,
+              sines: np.ndarray) -> np.ndarray:
+    """局部坐标 -> 世界坐标（即像素坐标）"""
+    c = cosines[body]
+    s = sines[body]
+    return np.stack([positions[body, 0] + c * local[:, 0] - s * local[:, 1],
+                     positions[body, 1] + s * local[:, 0] + c * local[:, 1]], axis=1)
+
+
+def _shade(colors: np.ndarray, tint: np.ndarray, body: np.ndarray, sleeping: np.ndarray) -> np.ndarray:
+    """休眠物体上使用默认配色的图元改用休眠颜色"""
+    asleep = tint & sleeping[body]
+    if not asleep.any():
+        return colors
+    colors = colors.copy()
+    colors[asleep] = SLEEPING_COLOR
+    return colors
+
+
+def _read_poses(bodies: List[pymunk.Body]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """逐个读取物体的位姿：(positions, angles, sleeping)"""
+    poses = np.array([(*body.position, body.angle, body.is_sleeping) for body in bodies],
+                     dtype=np.float64).reshape(len(bodies), 4)
+    return poses[:, :2], poses[:, 2], poses[:, 3] != 0
+
+
+def _shape_color(shape: pymunk.Shape) -> Tuple[tuple, bool]:
+    """形状的填充颜色，以及是否在物体休眠时改用休眠颜色（与 color_for_shape 的规则一致）"""
+    if hasattr(shape, "color"):
+        return tuple(shape.color)[:3], False
+    body_type = shape.body.body_type
+    if body_type == pymunk.Body.STATIC:
+        return STATIC_COLOR, False
+    if body_type == pymunk.Body.KINEMATIC:
+        return KINEMATIC_COLOR, False
+    return DYNAMIC_COLOR, True
+
+
+class RasterScene:
+    """
+    一个场景的光栅化数据
+
+    构建时把静态形状光栅化为背景，并把非静态形状和约束转换为按物体下标索引的局部坐标图元；
+    之后每帧只需要 bodies 中各物体的位姿（见 poses）即可绘制，位姿可以来自当前空间，也可以来自记录的轨迹。
+    绘制顺序为：静态形状、线段、多边形、圆、圆的角度线和约束连线、约束锚点；
+    同一类图元相互重叠时哪个在上不确定。阻尼弹簧画成直线。
+    pickle 时不包括 bodies 和空间，副本（如传给工作进程的）只能通过 render 绘制给定的位姿。
+    """
+
+    def __init__(self, space: pymunk.Space, size: Tuple[int, int],
+                 background: Tuple[int, int, int] = (255, 255, 255)):
+        """
+        从空间构建光栅化数据
+
+        Args:
+            space: pymunk空间，坐标直接作为像素坐标（与 pygame_util 默认的 positive_y_is_up=False 一致）
+            size: 画面尺寸 (width, height)
+            background: 背景颜色
+        """
+        self.size = size
+        self.bodies: List[pymunk.Body] = []
+        self._body_index: Dict[pymunk.Body, int] = {}
+        static = self._new_batches()
+        moving = self._new_batches()
+        static_bodies: List[pymunk.Body] = []
+        static_index: Dict[pymunk.Body, int] = {}
+        for shape in space.shapes:
+            if shape.body.body_type == pymunk.Body.STATIC:
+                index = static_index.setdefault(shape.body, len(static_bodies))
+                if index == len(static_bodies):
+                    static_bodies.append(shape.body)
+                self._add_shape(static, index, shape)
+            else:
+                self._add_shape(moving, self._index(shape.body), shape)
+        for constraint in space.constraints:
+            self._add_constraint(moving, constraint)
+        for batch in (*static.values(), *moving.values()):
+            batch.freeze()
+        self._batches = moving
+        del self._body_index
+        self._space: Optional[pymunk.Space] = space
+        self._body_ids = np.array([body.id for body in self.bodies], dtype=np.uintp)
+        self._pose_buffer = pymunk.batch.Buffer()
+
+        width, height = size
+        self.background = np.empty((height, width, 3), dtype=np.uint8)
+        self.background[:] = background
+        positions, angles, sleeping = _read_poses(static_bodies)
+        self._draw_batches(static, self.background, positions, angles, sleeping)
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state.update(bodies=[], _space=None, _pose_buffer=None)
+        return state
+
+    @staticmethod
+    def _new_batches() -> dict:
+        return {"segments": _Capsules(), "polygons": _Polygons(), "circles": _Capsules(),
+                "lines": _Capsules(), "dots": _Capsules()}
+
+    def _index(self, body: pymunk.Body) -> int:
+        index = self._body_index.get(body)
+        if index is None:
+            index = self._body_index[body] = len(self.bodies)
+            self.bodies.append(body)
+        return index
+
+    @staticmethod
+    def _add_shape(batches: dict, body: int, shape: pymunk.Shape) -> None:
+        """按 pygame_util.DrawOptions 的画法转换形状：圆带一条角度线，多边形的圆角半径画成轮廓色的边"""
+        color, tint = _shape_color(shape)
+        if isinstance(shape, pymunk.Circle):
+            offset = shape.offset
+            batches["circles"].add(body, offset, body, offset, shape.radius, color, tint)
+            edge = (offset[0] + shape.radius, offset[1])
+            line_radius = 1.0 if shape.radius > 20 else 0.5
+            batches["lines"].add(body, offset, body, edge, line_radius, OUTLINE_COLOR)
+        elif isinstance(shape, pymunk.Segment):
+            batches["segments"].add(body, shape.a, body, shape.b, max(shape.radius, 0.5), color, tint)
+        elif isinstance(shape, pymunk.Poly):
+            vertices = shape.get_vertices()
+            batches["polygons"].add(body, vertices, color, tint)
+            if shape.radius > 0:
+                for start, end in zip(vertices, vertices[1:] + vertices[:1]):
+                    batches["segments"].add(body, start, body, end, shape.radius, OUTLINE_COLOR)
+
+    def _add_constraint(self, batches: dict, constraint: pymunk.Constraint) -> None:
+        """有两个锚点的约束画锚点圆点，除枢轴关节外再画一条连线"""
+        if not hasattr(constraint, "anchor_a") or not hasattr(constraint, "anchor_b"):
+            return
+        body_a = self._index(constraint.a)
+        body_b = self._index(constraint.b)
+        anchor_a = constraint.anchor_a
+        anchor_b = constraint.anchor_b
+        if not isinstance(constraint, pymunk.PivotJoint):
+            batches["lines"].add(body_a, anchor_a, body_b, anchor_b, 0.5, CONSTRAINT_COLOR)
+        batches["dots"].add(body_a, anchor_a, body_a, anchor_a, DOT_RADIUS, CONSTRAINT_COLOR)
+        batches["dots"].add(body_b, anchor_b, body_b, anchor_b, DOT_RADIUS, CONSTRAINT_COLOR)
+
+    def poses(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        读取 bodies 的当前位姿
+
+        位置和角度通过 pymunk.batch 一次读出整个空间后按物体id重排，不在空间中的物体（如未加入空间的
+        static_body）逐个读取；空间未启用休眠时不逐个查询休眠状态。
+
+        Returns:
+            (positions (n, 2), angles (n,), sleeping (n,) bool)
+        """
+        if self._space is None:
+            raise RuntimeError("反序列化得到的光栅化场景没有关联的空间，只能绘制给定的位姿")
+        buffer = self._pose_buffer
+        buffer.clear()
+        pymunk.batch.get_space_bodies(
+            self._space, pymunk.batch.BodyFields.BODY_ID | pymunk.batch.BodyFields.POSITION
+            | pymunk.batch.BodyFields.ANGLE, buffer)
+        ids = np.frombuffer(buffer.int_buf(), dtype=np.uintp)
+        count = len(self._body_ids)
+        poses = np.zeros((count, 3), dtype=np.float64)
+        found = np.zeros(count, dtype=bool)
+        if len(ids) and count:
+            order = np.argsort(ids)
+            rows = order[np.minimum(np.searchsorted(ids, self._body_ids, sorter=order), len(ids) - 1)]
+            found = ids[rows] == self._body_ids
+            poses[found] = np.frombuffer(buffer.float_buf(), dtype=np.float64).reshape(-1, 3)[rows[found]]
+        for i in np.flatnonzero(~found):
+            body = self.bodies[i]
+            poses[i] = (*body.position, body.angle)
+        if self._space.sleep_time_threshold == float("inf"):
+            sleeping = np.zeros(count, dtype=bool)
+        else:
+            sleeping = np.fromiter((body.is_sleeping for body in self.bodies), dtype=bool, count=count)
+        return poses[:, :2], poses[:, 2], sleeping
+
+    @staticmethod
+    def _draw_batches(batches: dict, frame: np.ndarray, positions: np.ndarray, angles: np.ndarray,
+                      sleeping: np.ndarray) -> None:
+        cosines = np.cos(angles)
+        sines = np.sin(angles)
+        for batch in batches.values():
+            batch.draw(frame, positions, cosines, sines, sleeping)
+
+    def render(self, positions: Optional[np.ndarray] = None, angles: Optional[np.ndarray] = None,
+               sleeping: Optional[np.ndarray] = None, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        绘制一帧
+
+        Args:
+            positions, angles, sleeping: bodies 的位姿（见 poses），省略时读取当前位姿
+            out: 复用的 (height, width, 3) uint8 数组，省略时新建
+
+        Returns:
+            RGB帧数组
+        """
+        if positions is None:
+            positions, angles, sleeping = self.poses()
+        elif sleeping is None:
+            sleeping = np.zeros(len(positions), dtype=bool)
+        if out is None:
+            out = self.background.copy()
+        else:
+            out[:] = self.background
+        self._draw_batches(self._batches, out, positions, angles, sleeping)
+        return out
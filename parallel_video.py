@@ -0,0 +1,194 @@
+"""
+两阶段并行视频渲染
+第一阶段在当前进程中步进沙盒，把每帧非静态物体的位姿记录到数组轨迹（.npy 文件）中；
+第二阶段把帧区间分给工作进程，各自以内存映射方式读取轨迹、用 NumPy 光栅化器绘制并编码成视频片段，
+最后用 ffmpeg 的 concat 分离器把片段无重编码地拼接起来。绘制和编码的耗时随CPU核数而不是帧数增长
+"""
+
+import os
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import imageio_ffmpeg
+import numpy as np
+
+from numpy_rasterizer import RasterScene
+from physics_sandbox import PhysicsSandbox
+
+
+# 每个视频片段的最少帧数，避免片段过短时进程启动和编码器初始化的开销占主导
+MIN_SEGMENT_FRAMES = 30
+
+
+class PoseTrajectory:
+    """
+    按帧记录的物体位姿
+
+    保存在 (帧数, 物体数, 4) 的 float32 数组中，每个物体为 (x, y, angle, sleeping)，物体顺序与
+    RasterScene.bodies 一致。指定路径时数组是 .npy 文件的内存映射，工作进程只读打开，不经过 pickle 传输。
+    """
+
+    def __init__(self, frame_count: int, body_count: int, path: Optional[str] = None):
+        """
+        创建空轨迹
+
+        Args:
+            frame_count: 帧数
+            body_count: 物体数
+            path: .npy 文件路径，None表示只保存在内存中
+        """
+        self.path = path
+        shape = (frame_count, body_count, 4)
+        if path is None:
+            self.poses = np.zeros(shape, dtype=np.float32)
+        else:
+            self.poses = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+
+    @classmethod
+    def open(cls, path: str) -> "PoseTrajectory":
+        """以只读内存映射方式打开已保存的轨迹"""
+        trajectory = cls.__new__(cls)
+        trajectory.path = path
+        trajectory.poses = np.load(path, mmap_mode="r")
+        return trajectory
+
+    def __len__(self) -> int:
+        return len(self.poses)
+
+    def record(self, index: int, positions: np.ndarray, angles: np.ndarray, sleeping: np.ndarray) -> None:
+        """写入第 index 帧的位姿（RasterScene.poses 的返回值）"""
+        frame = self.poses[index]
+        frame[:, :2] = positions
+        frame[:, 2] = angles
+        frame[:, 3] = sleeping
+
+    def frame(self, index: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        读取第 index 帧的位姿
+
+        Returns:
+            (positions, angles, sleeping)，可直接传给 RasterScene.render
+        """
+        frame = np.asarray(self.poses[index], dtype=np.float64)
+        return frame[:, :2], frame[:, 2], frame[:, 3] != 0
+
+    def flush(self) -> None:
+        """把内存映射的修改写回文件"""
+        if isinstance(self.poses, np.memmap):
+            self.poses.flush()
+
+
+def record_trajectory(sandbox: PhysicsSandbox, scene: RasterScene, frame_count: int, dt: float,
+                      path: Optional[str] = None) -> PoseTrajectory:
+    """
+    步进沙盒并记录每帧的位姿：第 i 帧是第 i 次步进之前的状态，与 render_video 逐帧绘制的内容一致
+
+    Args:
+        sandbox: 要模拟的沙盒（会被原地步进）
+        scene: 由沙盒当前空间构建的光栅化场景，决定记录哪些物体
+        frame_count: 帧数
+        dt: 每帧的时间步长
+        path: 轨迹文件路径，None表示只保存在内存中
+
+    Returns:
+        位姿轨迹
+    """
+    trajectory = PoseTrajectory(frame_count, len(scene.bodies), path)
+    for index in range(frame_count):
+        trajectory.record(index, *scene.poses())
+        sandbox.step(dt)
+    trajectory.flush()
+    return trajectory
+
+
+def _render_segment(task: tuple) -> int:
+    """工作进程入口：按轨迹绘制 [start, stop) 帧并编码为一个视频片段"""
+    scene, trajectory_path, start, stop, segment_path, fps, quality = task
+    trajectory = PoseTrajectory.open(trajectory_path)
+    frame = scene.background.copy()
+    writer = imageio_ffmpeg.write_frames(segment_path, scene.size, fps=fps, quality=quality, pix_fmt_in="rgb24")
+    writer.send(None)  # 启动生成器
+    try:
+        for index in range(start, stop):
+            writer.send(scene.render(*trajectory.frame(index), out=frame))
+    finally:
+        writer.close()
+    return stop - start
+
+
+def concat_segments(segment_paths: list, video_path: str) -> None:
+    """
+    用 ffmpeg 的 concat 分离器按顺序拼接编码参数相同的视频片段（直接复制码流，不重新编码）
+
+    Args:
+        segment_paths: 片段路径列表
+        video_path: 输出视频路径
+    """
+    list_path = f"{video_path}.segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        completed = subprocess.run(
+            [imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+             "-i", list_path, "-c", "copy", video_path],
+            capture_output=True, text=True)
+    finally:
+        os.remove(list_path)
+    if completed.returncode != 0:
+        raise RuntimeError(f"拼接视频片段失败：{completed.stderr.strip()}")
+
+
+def render_video_parallel(sandbox: PhysicsSandbox, video_path: str, duration_seconds: float = 10,
+                          fps: int = 60, size: Tuple[int, int] = (800, 600),
+                          background: Tuple[int, int, int] = (255, 255, 255), max_workers: Optional[int] = None,
+                          quality: int = 7) -> str:
+    """
+    先记录位姿轨迹、再在多个进程中并行绘制和编码的离线视频渲染
+
+    帧内容与 render_video(renderer="numpy") 相同。帧按顺序分成每个工作进程一个连续区间（不少于
+    MIN_SEGMENT_FRAMES 帧），每个区间编码为一个片段；只有一个区间或 max_workers 为1时在当前进程中绘制。
+    轨迹文件和片段写在输出目录下的临时目录中，完成后删除。
+
+    Args:
+        sandbox: 要渲染的沙盒（会被原地步进）
+        video_path: 输出视频路径
+        duration_seconds: 视频时长（秒）
+        fps: 帧率，同时决定步进的时间步长
+        size: 画面尺寸 (width, height)
+        background: 背景颜色
+        max_workers: 工作进程数，默认等于CPU核数
+        quality: 编码质量（0-10）
+
+    Returns:
+        视频路径
+    """
+    total_frames = int(duration_seconds * fps)
+    if total_frames <= 0:
+        raise ValueError(f"视频时长{duration_seconds}秒在帧率{fps}下不足一帧")
+    max_workers = max(1, max_workers or os.cpu_count() or 1)
+    segment_count = max(1, min(max_workers, total_frames // MIN_SEGMENT_FRAMES))
+    bounds = np.linspace(0, total_frames, segment_count + 1).astype(int)
+
+    scene = RasterScene(sandbox.space, size, background)
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(video_path))) as work_dir:
+        trajectory = record_trajectory(sandbox, scene, total_frames, 1.0 / fps,
+                                       path=os.path.join(work_dir, "trajectory.npy"))
+        del trajectory  # 释放内存映射，工作进程各自重新打开
+        segment_paths = [os.path.join(work_dir, f"segment_{index:03d}.mp4") for index in range(segment_count)]
+        tasks = [(scene, os.path.join(work_dir, "trajectory.npy"), int(bounds[index]), int(bounds[index + 1]),
+                  segment_paths[index], fps, quality) for index in range(segment_count)]
+        if max_workers == 1 or segment_count == 1:
+            for task in tasks:
+                _render_segment(task)
+        else:
+            with ProcessPoolExecutor(max_workers=min(max_workers, segment_count)) as executor:
+                list(executor.map(_render_segment, tasks))
+        if segment_count == 1:
+            os.replace(segment_paths[0], video_path)
+        else:
+            concat_segments(segment_paths, video_path)
+    return video_path
@@ -1,7 +1,29 @@
 import pymunk
 import math
-from typing import Dict, Tuple, Optional
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+import numpy as np
+from typing import Dict, List, Tuple, Optional
 import pymunk.pygame_util
+from trajectory_recorder import TrajectoryRecorder
+from convergence import ConvergenceMonitor
+from collision_events import CollisionRecorder
+from particle_field import ParticleField
+from sandbox_snapshot import MAX_THREADS, SandboxSnapshot, clone_space, new_space
+from scene_format import read_scene, scene_hash, write_scene
+
+
+def _mutates(method):
+    """标记会修改沙盒状态的方法：调用结束后递增版本号和场景版本号，使状态缓存和静态图层缓存失效"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.version += 1
+            self.scene_version += 1
+    return wrapper
 
 
 class PhysicsSandbox:
@@ -14,18 +36,338 @@ class PhysicsSandbox:
     - 原点(0,0)位于左上角
     """
     
-    def __init__(self, gravity: Tuple[float, float] = (0, 981)):
+    def __init__(self, gravity: Tuple[float, float] = (0, 981), threads: int = 1):
         """
         初始化物理沙盒
         
         Args:
             gravity: 重力向量，默认为(0, 981)表示向下980像素/秒²
+            threads: 物理步进的求解线程数，大于1时使用多线程求解器（最多2个线程，Windows上退回单线程）
         """
-        self.space = pymunk.Space()
+        self.space = new_space(threads)
         self.space.gravity = gravity
         self.bodies: Dict[str, pymunk.Body] = {}  # 用字典来管理人机交互中的物体
         self.shapes: Dict[str, pymunk.Shape] = {}  # 存储形状信息
-        
+        # 反向索引：对象 -> 名称，用于状态查询时O(1)解析名称
+        self._body_names: Dict[pymunk.Body, str] = {}
+        self._shape_names: Dict[pymunk.Shape, str] = {}
+        # 粒子场不进入按名称登记表，单独记录粒子物体以便在逐物体状态中跳过
+        self.particle_fields: Dict[str, ParticleField] = {}
+        self._particle_bodies: set = set()
+        # 折线地形：名称 -> 按顺序排列的线段，以及地形物体 -> 名称
+        self.terrains: Dict[str, List[pymunk.Segment]] = {}
+        self._terrain_bodies: Dict[pymunk.Body, str] = {}
+        # 命名约束登记表、反向索引，以及 物体 -> 相连约束名称 的邻接索引，删除物体时按度数级联删除约束
+        self.constraints: Dict[str, pymunk.Constraint] = {}
+        self._constraint_names: Dict[pymunk.Constraint, str] = {}
+        self._body_constraints: Dict[pymunk.Body, set] = {}
+        # 列式状态快照的预分配缓冲区与物体顺序/名称表缓存
+        self._state_buffers: Dict[str, np.ndarray] = {}
+        self._state_order: List[pymunk.Body] = []
+        self._state_names: List[Optional[str]] = []
+        self._state_particles = np.zeros(0, dtype=bool)
+        # 宽相位配置，见 configure_broadphase
+        self._broadphase_mode = "bbtree"
+        # 是否通过 configure_broadphase 显式选择过宽相位（显式选择后不再自动切换模式）
+        self._broadphase_configured = False
+        self._spatial_hash_params: Optional[Tuple[float, int]] = None
+        self._broadphase_shape_count = 0
+        # 状态版本号：每次修改沙盒或步进时递增；按版本缓存最近的状态，用于直接复用和计算增量
+        self.version = 0
+        # 场景版本号：只在增删或修改物体时递增（步进不递增），用于判断静态几何是否变化
+        self.scene_version = 0
+        self._status_history: "OrderedDict[int, dict]" = OrderedDict()
+        # 最近一次计算的内容哈希及其对应的版本号
+        self._content_hash: Optional[Tuple[int, str]] = None
+        
+    def _register(self, name: str, body: pymunk.Body, shape: pymunk.Shape) -> None:
+        """登记命名物体，同时维护正向字典和反向索引"""
+        self.bodies[name] = body
+        self.shapes[name] = shape
+        self._body_names[body] = name
+        self._shape_names[shape] = name
+        self._check_broadphase()
+
+    def _register_constraint(self, name: str, constraint: pymunk.Constraint) -> None:
+        """登记命名约束，同时维护反向索引和两端物体的邻接索引"""
+        self.constraints[name] = constraint
+        self._constraint_names[constraint] = name
+        self._body_constraints.setdefault(constraint.a, set()).add(name)
+        self._body_constraints.setdefault(constraint.b, set()).add(name)
+
+    def _unregister_constraint(self, name: str) -> pymunk.Constraint:
+        """注销命名约束并返回它，调用方负责从空间中移除"""
+        constraint = self.constraints.pop(name)
+        self._constraint_names.pop(constraint, None)
+        for body in (constraint.a, constraint.b):
+            names = self._body_constraints.get(body)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self._body_constraints[body]
+        return constraint
+
+    def _constraint_name(self, base: str) -> str:
+        """为自动命名的约束生成不重复的名称"""
+        name = base
+        suffix = 2
+        while name in self.constraints:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        return name
+
+    @staticmethod
+    def _remap_registries(source, mapping: dict) -> dict:
+        """
+        把沙盒或快照中的各个名称登记表重映射到克隆对象上
+
+        Args:
+            source: PhysicsSandbox 或 SandboxSnapshot
+            mapping: clone_space 返回的 原对象 -> 新对象 映射
+
+        Returns:
+            bodies、shapes、particle_fields、terrains、constraints 五个登记表
+        """
+        return {
+            "bodies": {name: mapping[body] for name, body in source.bodies.items()},
+            "shapes": {name: mapping[shape] for name, shape in source.shapes.items()},
+            "particle_fields": {name: field.remap(mapping) for name, field in source.particle_fields.items()},
+            "terrains": {name: [mapping[segment] for segment in segments]
+                         for name, segments in source.terrains.items()},
+            "constraints": {name: mapping[constraint] for name, constraint in source.constraints.items()}
+        }
+
+    def _adopt(self, space: pymunk.Space, mapping: Optional[dict], source) -> None:
+        """
+        换用克隆出的空间，并把 source（沙盒或快照）的名称登记表重映射到克隆对象上；
+        mapping 为None时 source 的登记表已经指向 space 中的对象，直接使用
+        """
+        if mapping is None:
+            registries = {key: getattr(source, key)
+                          for key in ("bodies", "shapes", "particle_fields", "terrains", "constraints")}
+        else:
+            registries = self._remap_registries(source, mapping)
+        self.space = space
+        self.bodies = registries["bodies"]
+        self.shapes = registries["shapes"]
+        self._body_names = {body: name for name, body in self.bodies.items()}
+        self._shape_names = {shape: name for name, shape in self.shapes.items()}
+        self.particle_fields = registries["particle_fields"]
+        self._particle_bodies = {body for field in self.particle_fields.values() for body in field.bodies}
+        self.terrains = registries["terrains"]
+        self._terrain_bodies = {self.bodies[name]: name for name in self.terrains}
+        for segments in self.terrains.values():
+            self._link_segments(segments)
+        self.constraints = {}
+        self._constraint_names = {}
+        self._body_constraints = {}
+        for name, constraint in registries["constraints"].items():
+            self._register_constraint(name, constraint)
+        self._state_order = []
+        # 克隆出的空间总是包围盒树，需要时重新启用空间哈希
+        if self._spatial_hash_params is not None:
+            self.space.use_spatial_hash(*self._spatial_hash_params)
+
+    def snapshot(self) -> SandboxSnapshot:
+        """
+        保存当前沙盒的快照（空间及各个名称登记表）
+
+        Returns:
+            可多次恢复的快照对象
+        """
+        space, mapping = clone_space(self.space)
+        return SandboxSnapshot(space, **self._remap_registries(self, mapping))
+
+    @_mutates
+    def restore(self, snapshot: SandboxSnapshot) -> str:
+        """
+        把沙盒恢复到快照时的状态，快照本身保持不变
+
+        Args:
+            snapshot: snapshot() 返回的快照
+
+        Returns:
+            操作结果信息
+        """
+        space, mapping = clone_space(snapshot.space)
+        self._adopt(space, mapping, snapshot)
+        return "已恢复到快照状态。"
+
+    def fork(self) -> "PhysicsSandbox":
+        """
+        分叉出一个独立的沙盒副本，名称登记表指向副本中的对象，对副本的模拟不影响当前沙盒
+
+        Returns:
+            新的沙盒实例
+        """
+        space, mapping = clone_space(self.space)
+        forked = PhysicsSandbox(gravity=tuple(self.space.gravity), threads=self.space.threads)
+        forked._broadphase_mode = self._broadphase_mode
+        forked._broadphase_configured = self._broadphase_configured
+        forked._spatial_hash_params = self._spatial_hash_params
+        forked._broadphase_shape_count = self._broadphase_shape_count
+        forked._adopt(space, mapping, self)
+        return forked
+
+    def save_scene(self, path: str, format: Optional[str] = None) -> str:
+        """
+        把当前场景保存为场景文件（格式见 scene_format）
+
+        Args:
+            path: 文件路径
+            format: "npz"（二进制）或 "json"（文本），默认按扩展名判断
+
+        Returns:
+            操作结果信息
+        """
+        settings = {"broadphase_mode": self._broadphase_mode, "broadphase_configured": self._broadphase_configured,
+                    "spatial_hash": self._spatial_hash_params}
+        try:
+            write_scene(path, self, settings=settings, format=format)
+        except (OSError, ValueError) as e:
+            return f"错误：保存场景失败：{e}"
+        return f"已保存场景到'{path}'，共{len(self.space.bodies)}个物体、{len(self.space.constraints)}个约束。"
+
+    @_mutates
+    def load_scene(self, path: str, format: Optional[str] = None) -> str:
+        """
+        从场景文件加载场景，替换当前沙盒中的全部内容
+
+        Args:
+            path: 文件路径
+            format: "npz" 或 "json"，默认按扩展名判断
+
+        Returns:
+            操作结果信息
+        """
+        try:
+            snapshot, settings = read_scene(path, format=format)
+        except (OSError, ValueError, KeyError) as e:
+            return f"错误：加载场景失败：{e}"
+        self._broadphase_mode = settings.get("broadphase_mode", "bbtree")
+        self._broadphase_configured = settings.get("broadphase_configured", False)
+        spatial_hash = settings.get("spatial_hash")
+        self._spatial_hash_params = tuple(spatial_hash) if spatial_hash else None
+        self._broadphase_shape_count = len(snapshot.space.shapes)
+        # 新读取的空间不与任何快照共享，直接接管而不再克隆
+        self._adopt(snapshot.space, None, snapshot)
+        return f"已从'{path}'加载场景，共{len(self.space.bodies)}个物体、{len(self.space.constraints)}个约束。"
+
+    def content_hash(self) -> str:
+        """
+        当前场景的内容哈希（见 scene_format.scene_hash），版本号不变时直接复用上次的结果
+
+        Returns:
+            32位十六进制字符串
+        """
+        if self._content_hash is None or self._content_hash[0] != self.version:
+            self._content_hash = (self.version, scene_hash(self))
+        return self._content_hash[1]
+
+    def _unregister(self, name: str) -> None:
+        """注销命名物体，同时维护正向字典和反向索引"""
+        body = self.bodies.pop(name)
+        shape = self.shapes.pop(name)
+        self._body_names.pop(body, None)
+        self._shape_names.pop(shape, None)
+        self.terrains.pop(name, None)
+        self._terrain_bodies.pop(body, None)
+        self._body_constraints.pop(body, None)
+        self._check_broadphase()
+
+    def configure_threads(self, threads: int) -> str:
+        """
+        设置物理步进的求解线程数，需要时重建空间（是否多线程只能在创建空间时决定）
+
+        Args:
+            threads: 线程数，1表示单线程
+
+        Returns:
+            操作结果信息
+        """
+        if threads < 1:
+            return "错误：线程数必须大于等于1。"
+        if (threads > 1) != self.space.threaded:
+            space, mapping = clone_space(self.space, threads=threads)
+            self._adopt(space, mapping, self)
+        elif self.space.threaded:
+            self.space.threads = min(threads, MAX_THREADS)
+
+        if threads > 1 and not self.space.threaded:
+            return "当前平台不支持多线程求解器，已使用单线程。"
+        return f"物理步进求解线程数已设置为{self.space.threads}。"
+
+    # 自动模式下启用空间哈希所需的最少动态形状数，以及允许的形状尺寸离散度（90分位/10分位）
+    _SPATIAL_HASH_MIN_SHAPES = 200
+    _SPATIAL_HASH_MAX_SIZE_SPREAD = 4.0
+
+    def configure_broadphase(self, mode: str = "auto") -> str:
+        """
+        配置碰撞检测的宽相位算法
+
+        Args:
+            mode: 宽相位模式
+                - "bbtree": Pymunk默认的包围盒树，适合尺寸差异大的场景
+                - "spatial_hash": 空间哈希，单元尺寸和数量根据当前形状尺寸分布推导
+                - "auto": 存在大量尺寸相近的动态形状时使用空间哈希，否则使用包围盒树
+                非 bbtree 模式下，形状数量相对上次推导变化一倍以上时会自动重新推导。
+
+        Returns:
+            操作结果信息
+        """
+        if mode not in ("bbtree", "spatial_hash", "auto"):
+            return f"错误：不支持的宽相位模式'{mode}'。"
+        self._broadphase_mode = mode
+        self._broadphase_configured = True
+        return self._tune_broadphase(allow_rebuild=True)
+
+    def _tune_broadphase(self, allow_rebuild: bool = False) -> str:
+        """
+        根据当前形状尺寸分布选择宽相位并推导空间哈希参数
+
+        Args:
+            allow_rebuild: 是否允许为切回包围盒树而重建空间。自动重新推导发生在增删物体的过程中，
+                此时重建会使调用方持有的对象失效，因此已启用空间哈希时只更新哈希参数
+        """
+        shapes = self.space.shapes
+        self._broadphase_shape_count = len(shapes)
+        sizes = np.array([
+            max(bb.right - bb.left, bb.top - bb.bottom)
+            for bb in (shape.bb for shape in shapes if shape.body.body_type != pymunk.Body.STATIC)
+        ])
+
+        use_hash = self._broadphase_mode == "spatial_hash"
+        if self._broadphase_mode == "auto" and len(sizes) >= self._SPATIAL_HASH_MIN_SHAPES:
+            low, high = np.percentile(sizes, [10, 90])
+            use_hash = high <= self._SPATIAL_HASH_MAX_SIZE_SPREAD * max(low, 1e-6)
+        if not allow_rebuild and self._spatial_hash_params is not None:
+            use_hash = True
+
+        if use_hash:
+            # 单元尺寸取动态形状尺寸的中位数，单元数量约为形状数量的10倍
+            dim = float(np.median(sizes)) if len(sizes) else 50.0
+            count = max(1000, 10 * len(shapes))
+            self._spatial_hash_params = (max(dim, 1.0), count)
+            self.space.use_spatial_hash(*self._spatial_hash_params)
+            return f"已启用空间哈希宽相位，单元尺寸{self._spatial_hash_params[0]:.1f}，单元数量{count}。"
+
+        if self._spatial_hash_params is not None:
+            # Pymunk无法把已启用空间哈希的空间切回包围盒树，需要重建空间
+            self._spatial_hash_params = None
+            space, mapping = clone_space(self.space)
+            self._adopt(space, mapping, self)
+        return "已使用包围盒树宽相位。"
+
+    def _check_broadphase(self) -> None:
+        """形状数量相对上次推导变化一倍以上时重新推导宽相位"""
+        if self._broadphase_mode == "bbtree":
+            return
+        count = len(self.space.shapes)
+        tuned = self._broadphase_shape_count
+        if count >= 2 * max(tuned, 1) or 2 * count <= tuned:
+            self._tune_broadphase()
+
+    @_mutates
     def create_circle(self, name: str, position: Tuple[float, float], radius: float, 
                      mass: float = 1.0, is_static: bool = False) -> str:
         """
@@ -41,7 +383,7 @@ class PhysicsSandbox:
         Returns:
             操作结果信息
         """
-        if name in self.bodies:
+        if name in self.bodies or name in self.particle_fields:
             return f"错误：名为'{name}'的物体已存在。"
             
         # 创建身体
@@ -62,11 +404,11 @@ class PhysicsSandbox:
         self.space.add(body, shape)
         
         # 存储引用
-        self.bodies[name] = body
-        self.shapes[name] = shape
+        self._register(name, body, shape)
         
         return f"成功创建名为'{name}'的圆形，位置({position[0]:.1f}, {position[1]:.1f})，半径{radius}。"
     
+    @_mutates
     def create_box(self, name: str, position: Tuple[float, float], size: Tuple[float, float], 
                   mass: float = 1.0, is_static: bool = False) -> str:
         """
@@ -82,7 +424,7 @@ class PhysicsSandbox:
         Returns:
             操作结果信息
         """
-        if name in self.bodies:
+        if name in self.bodies or name in self.particle_fields:
             return f"错误：名为'{name}'的物体已存在。"
             
         # 创建身体
@@ -103,14 +445,14 @@ class PhysicsSandbox:
         self.space.add(body, shape)
         
         # 存储引用
-        self.bodies[name] = body
-        self.shapes[name] = shape
+        self._register(name, body, shape)
         
         return f"成功创建名为'{name}'的矩形，位置({position[0]:.1f}, {position[1]:.1f})，尺寸{size}。"
     
+    @_mutates
     def add_spring_joint(self, body1_name: str, body2_name: str, 
                         anchor1: Tuple[float, float], anchor2: Tuple[float, float],
-                        stiffness: float, damping: float) -> str:
+                        stiffness: float, damping: float, name: Optional[str] = None) -> str:
         """
         在两个物体之间添加弹簧关节
         
@@ -121,6 +463,7 @@ class PhysicsSandbox:
             anchor2: 第二个物体的锚点
             stiffness: 弹簧刚度
             damping: 阻尼系数
+            name: 关节名称，默认自动命名为 物体1_物体2_spring
             
         Returns:
             操作结果信息
@@ -129,6 +472,8 @@ class PhysicsSandbox:
             return f"错误：名为'{body1_name}'的物体不存在。"
         if body2_name not in self.bodies:
             return f"错误：名为'{body2_name}'的物体不存在。"
+        if name is not None and name in self.constraints:
+            return f"错误：名为'{name}'的约束已存在。"
             
         body1 = self.bodies[body1_name]
         body2 = self.bodies[body2_name]
@@ -137,13 +482,17 @@ class PhysicsSandbox:
         spring = pymunk.DampedSpring(body1, body2, anchor1, anchor2, 
                                    rest_length=50, stiffness=stiffness, damping=damping)
         
-        # 添加到空间
+        # 添加到空间并登记
         self.space.add(spring)
+        name = name or self._constraint_name(f"{body1_name}_{body2_name}_spring")
+        self._register_constraint(name, spring)
         
-        return f"成功在'{body1_name}'和'{body2_name}'之间添加了弹簧关节。"
+        return f"成功在'{body1_name}'和'{body2_name}'之间添加了弹簧关节'{name}'。"
 
+    @_mutates
     def add_pin_joint(self, body1_name: str, body2_name: str, 
-                     anchor1: Tuple[float, float], anchor2: Tuple[float, float]) -> str:
+                     anchor1: Tuple[float, float], anchor2: Tuple[float, float],
+                     name: Optional[str] = None) -> str:
         """
         在两个物体之间添加刚性连接（PinJoint）
         
@@ -152,6 +501,7 @@ class PhysicsSandbox:
             body2_name: 第二个物体名称
             anchor1: 第一个物体的锚点
             anchor2: 第二个物体的锚点
+            name: 关节名称，默认自动命名为 物体1_物体2_pin
             
         Returns:
             操作结果信息
@@ -160,6 +510,8 @@ class PhysicsSandbox:
             return f"错误：名为'{body1_name}'的物体不存在。"
         if body2_name not in self.bodies:
             return f"错误：名为'{body2_name}'的物体不存在。"
+        if name is not None and name in self.constraints:
+            return f"错误：名为'{name}'的约束已存在。"
             
         body1 = self.bodies[body1_name]
         body2 = self.bodies[body2_name]
@@ -167,11 +519,14 @@ class PhysicsSandbox:
         # 创建PinJoint刚性连接
         pin_joint = pymunk.PinJoint(body1, body2, anchor1, anchor2)
         
-        # 添加到空间
+        # 添加到空间并登记
         self.space.add(pin_joint)
+        name = name or self._constraint_name(f"{body1_name}_{body2_name}_pin")
+        self._register_constraint(name, pin_joint)
         
-        return f"成功在'{body1_name}'和'{body2_name}'之间添加了刚性连接。"
+        return f"成功在'{body1_name}'和'{body2_name}'之间添加了刚性连接'{name}'。"
     
+    @_mutates
     def apply_impulse(self, body_name: str, impulse: Tuple[float, float]) -> str:
         """
         对指定物体施加冲量
@@ -191,6 +546,7 @@ class PhysicsSandbox:
         
         return f"已对'{body_name}'施加冲量({impulse[0]:.1f}, {impulse[1]:.1f})。"
     
+    @_mutates
     def apply_force(self, body_name: str, force: Tuple[float, float]) -> str:
         """
         对指定物体施加力
@@ -210,6 +566,7 @@ class PhysicsSandbox:
         
         return f"已对'{body_name}'施加力({force[0]:.1f}, {force[1]:.1f})。"
     
+    @_mutates
     def set_position(self, body_name: str, position: Tuple[float, float]) -> str:
         """
         设置物体位置
@@ -247,6 +604,7 @@ class PhysicsSandbox:
         
         return f"'{body_name}'的当前位置：({pos.x:.1f}, {pos.y:.1f})"
     
+    @_mutates
     def remove_body(self, body_name: str) -> str:
         """
         删除指定物体
@@ -257,21 +615,48 @@ class PhysicsSandbox:
         Returns:
             操作结果信息
         """
+        if body_name in self.particle_fields:
+            field = self.particle_fields.pop(body_name)
+            self.space.remove(*field.bodies, *field.shapes)
+            self._particle_bodies.difference_update(field.bodies)
+            self._check_broadphase()
+            return f"已删除名为'{body_name}'的粒子场，共{len(field)}个粒子。"
         if body_name not in self.bodies:
             return f"错误：名为'{body_name}'的物体不存在。"
             
         body = self.bodies[body_name]
-        shape = self.shapes[body_name]
         
-        # 从空间中移除
-        self.space.remove(body, shape)
+        # 通过邻接索引级联删除与该物体相连的约束，避免空间中残留悬空约束
+        constraint_names = sorted(self._body_constraints.get(body, ()))
+        constraints = [self._unregister_constraint(name) for name in constraint_names]
+        
+        # 从空间中移除（地形物体带有多个线段）
+        self.space.remove(*constraints, body, *body.shapes)
         
         # 从字典中删除
-        del self.bodies[body_name]
-        del self.shapes[body_name]
+        self._unregister(body_name)
         
+        if constraint_names:
+            return f"已删除名为'{body_name}'的物体及与其相连的约束：{', '.join(constraint_names)}。"
         return f"已删除名为'{body_name}'的物体。"
+
+    @_mutates
+    def remove_constraint(self, constraint_name: str) -> str:
+        """
+        删除指定约束（关节），两端物体保持不变
+
+        Args:
+            constraint_name: 约束名称
+
+        Returns:
+            操作结果信息
+        """
+        if constraint_name not in self.constraints:
+            return f"错误：名为'{constraint_name}'的约束不存在。"
+        self.space.remove(self._unregister_constraint(constraint_name))
+        return f"已删除名为'{constraint_name}'的约束。"
     
+    @_mutates
     def set_gravity(self, gravity: Tuple[float, float]) -> str:
         """
         设置重力
@@ -286,23 +671,70 @@ class PhysicsSandbox:
         return f"重力已设置为({gravity[0]:.1f}, {gravity[1]:.1f})。"
     
     
+    @_mutates
     def clear_all(self) -> str:
         """
-        清空所有物体
+        清空所有物体和约束
         
         Returns:
             操作结果信息
         """
-        # 从空间中移除所有物体
-        for body, shape in zip(self.bodies.values(), self.shapes.values()):
-            self.space.remove(body, shape)
+        # 一次性从空间中移除所有约束、物体和形状
+        removed = list(self.space.constraints)
+        for body in self.bodies.values():
+            removed.append(body)
+            removed.extend(body.shapes)
+        for field in self.particle_fields.values():
+            removed.extend(field.bodies)
+            removed.extend(field.shapes)
+        self.space.remove(*removed)
             
         # 清空字典
         self.bodies.clear()
         self.shapes.clear()
+        self._body_names.clear()
+        self._shape_names.clear()
+        self.particle_fields.clear()
+        self._particle_bodies.clear()
+        self.terrains.clear()
+        self._terrain_bodies.clear()
+        self.constraints.clear()
+        self._constraint_names.clear()
+        self._body_constraints.clear()
+        self._check_broadphase()
         
         return "已清空所有物体。"
 
+    @property
+    def sleeping_enabled(self) -> bool:
+        """是否启用了物体休眠"""
+        return self.space.sleep_time_threshold != float("inf")
+
+    @_mutates
+    def set_sleeping(self, sleep_time_threshold: Optional[float],
+                     idle_speed_threshold: float = 0.0) -> str:
+        """
+        设置物体休眠：静止超过一定时间的物体不再参与积分，直到被碰撞或操作唤醒
+
+        Args:
+            sleep_time_threshold: 物体保持空闲多少秒后进入休眠，None或非正数表示关闭休眠
+            idle_speed_threshold: 速度低于该值视为空闲（像素/秒），0表示根据重力自动估计
+
+        Returns:
+            操作结果信息
+        """
+        if sleep_time_threshold is None or sleep_time_threshold <= 0:
+            self.space.sleep_time_threshold = float("inf")
+            # 关闭休眠时唤醒所有物体
+            for body in self.space.bodies:
+                body.activate()
+            return "已关闭物体休眠。"
+
+        self.space.sleep_time_threshold = sleep_time_threshold
+        self.space.idle_speed_threshold = idle_speed_threshold
+        return f"已开启物体休眠，空闲{sleep_time_threshold}秒后休眠，空闲速度阈值{idle_speed_threshold}。"
+
+    @_mutates
     def set_body_properties(self, body_name: str, **properties) -> str:
         """
         设置物体的物理属性
@@ -335,7 +767,7 @@ class PhysicsSandbox:
                 if isinstance(shape, pymunk.Circle):
                     moment = pymunk.moment_for_circle(new_mass, 0, shape.radius)
                 elif isinstance(shape, pymunk.Poly):
-                    moment = pymunk.moment_for_box(new_mass, shape.get_vertices())
+                    moment = pymunk.moment_for_poly(new_mass, shape.get_vertices(), radius=shape.radius)
                 else:
                     moment = pymunk.moment_for_circle(new_mass, 0, 10)  # 默认值
                 
@@ -343,14 +775,16 @@ class PhysicsSandbox:
                 body.moment = moment
                 result_messages.append(f"质量设置为{new_mass}")
         
-        # 设置摩擦系数
+        # 设置摩擦系数（地形物体的所有线段一起设置）
         if "friction" in properties:
-            shape.friction = properties["friction"]
+            for body_shape in body.shapes:
+                body_shape.friction = properties["friction"]
             result_messages.append(f"摩擦系数设置为{properties['friction']}")
         
         # 设置弹性系数
         if "elasticity" in properties:
-            shape.elasticity = properties["elasticity"]
+            for body_shape in body.shapes:
+                body_shape.elasticity = properties["elasticity"]
             result_messages.append(f"弹性系数设置为{properties['elasticity']}")
         
         # 设置速度
@@ -368,6 +802,7 @@ class PhysicsSandbox:
         else:
             return f"没有提供有效的属性来更新'{body_name}'。"
 
+    @_mutates
     def create_ground(self, name: str, start_point: Tuple[float, float], 
                      end_point: Tuple[float, float], friction: float = 0.7, 
                      elasticity: float = 0.3) -> str:
@@ -384,7 +819,7 @@ class PhysicsSandbox:
         Returns:
             操作结果信息
         """
-        if name in self.bodies:
+        if name in self.bodies or name in self.particle_fields:
             return f"错误：名为'{name}'的物体已存在。"
         
         # 创建静态身体
@@ -399,11 +834,11 @@ class PhysicsSandbox:
         self.space.add(body, shape)
         
         # 存储引用
-        self.bodies[name] = body
-        self.shapes[name] = shape
+        self._register(name, body, shape)
         
         return f"成功创建名为'{name}'的地面，从({start_point[0]:.1f}, {start_point[1]:.1f})到({end_point[0]:.1f}, {end_point[1]:.1f})。"
     
+    @_mutates
     def duplicate_body(self, original_name: str, count: int, offset: Tuple[float, float] = (50, 0)) -> str:
         """
         复制指定物体成多个副本
@@ -421,6 +856,9 @@ class PhysicsSandbox:
         
         if count <= 0:
             return f"错误：复制数量必须大于0。"
+
+        if original_name in self.terrains:
+            return f"错误：不支持复制地形'{original_name}'，请使用create_terrain创建新的地形。"
         
         original_body = self.bodies[original_name]
         original_shape = self.shapes[original_name]
@@ -501,13 +939,264 @@ class PhysicsSandbox:
             self.space.add(new_body, new_shape)
             
             # 存储引用
-            self.bodies[new_name] = new_body
-            self.shapes[new_name] = new_shape
+            self._register(new_name, new_body, new_shape)
             
             created_names.append(new_name)
         
         return f"成功复制'{original_name}' {count}次，创建了：{', '.join(created_names)}。"
     
+    def _layout_positions(self, layout: dict) -> np.ndarray:
+        """
+        根据布局描述生成位置数组
+
+        Args:
+            layout: 布局描述，type 取值：
+                - "grid": origin 左上角位置, rows 行数, columns 列数, spacing 行列间距 (dx, dy)
+                - "array": start 起点, count 数量, offset 相邻物体的偏移 (dx, dy)
+                - "pyramid": base_center 底层中心位置, levels 层数, spacing 水平与竖直间距 (dx, dy)，
+                  底层 levels 个物体，每往上一层少一个
+                - "random": count 数量, bounds 区域 (x_min, y_min, x_max, y_max), seed 随机种子（可选）
+
+        Returns:
+            形状为 (n, 2) 的位置数组
+        """
+        layout_type = layout.get("type")
+        if layout_type == "grid":
+            rows, columns = int(layout["rows"]), int(layout["columns"])
+            dx, dy = layout.get("spacing", (50, 50))
+            row_index, column_index = np.divmod(np.arange(rows * columns), columns)
+            offsets = np.column_stack((column_index * dx, row_index * dy))
+            return np.asarray(layout.get("origin", (0, 0)), dtype=float) + offsets
+        if layout_type == "array":
+            count = int(layout["count"])
+            steps = np.arange(count)[:, None]
+            return np.asarray(layout["start"], dtype=float) + steps * np.asarray(layout.get("offset", (50, 0)), dtype=float)
+        if layout_type == "pyramid":
+            levels = int(layout["levels"])
+            dx, dy = layout.get("spacing", (50, 50))
+            base_x, base_y = layout["base_center"]
+            # 第 level 层（从底层0开始）有 levels - level 个物体，水平居中
+            counts = np.arange(levels, 0, -1)
+            level = np.repeat(np.arange(levels), counts)
+            index_in_level = np.arange(len(level)) - np.repeat(np.cumsum(counts) - counts, counts)
+            x = base_x + (index_in_level - (levels - level - 1) / 2) * dx
+            # y轴向下为正，越往上y越小
+            y = base_y - level * dy
+            return np.column_stack((x, y))
+        if layout_type == "random":
+            count = int(layout["count"])
+            x_min, y_min, x_max, y_max = layout["bounds"]
+            rng = np.random.default_rng(layout.get("seed"))
+            return rng.uniform((x_min, y_min), (x_max, y_max), size=(count, 2))
+        raise ValueError(f"不支持的布局类型'{layout_type}'")
+
+    def _resolve_positions(self, positions, layout: Optional[dict],
+                           item_label: str) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """
+        解析批量创建时的 positions / layout 参数
+
+        Args:
+            positions: 位置列表 [(x, y), ...]
+            layout: 布局描述，见 _layout_positions
+            item_label: 错误信息中对单个对象的称呼，如"物体"、"粒子"
+
+        Returns:
+            (形状为 (n, 2) 的位置数组, None)，参数无效时为 (None, 错误信息)
+        """
+        if (positions is None) == (layout is None):
+            return None, "错误：positions 和 layout 必须且只能提供一个。"
+        try:
+            points = np.asarray(positions, dtype=float) if layout is None else self._layout_positions(layout)
+        except KeyError as e:
+            return None, f"错误：布局缺少参数{e}。"
+        except (TypeError, ValueError) as e:
+            return None, f"错误：布局参数无效：{e}。"
+        if len(points) == 0 or points.shape != (len(points), 2):
+            return None, f"错误：至少需要一个{item_label}位置，且每个位置必须是 (x, y)。"
+        return points, None
+
+    @staticmethod
+    def _body_sizes(shape: str, size, count: int) -> Optional[list]:
+        """
+        把 create_bodies 的 size 参数展开为每个物体的尺寸：圆形为半径，矩形为 (width, height)
+
+        长度等于物体数量的列表视为逐个物体的尺寸（矩形的单个数值表示正方形边长），
+        否则矩形的两元素序列视为所有物体共用的 (width, height)。
+
+        Returns:
+            尺寸列表，参数无法解释时返回None
+        """
+        def is_pair(item) -> bool:
+            return np.shape(item) == (2,)
+
+        try:
+            if np.isscalar(size):
+                sizes = [size] * count
+            elif len(size) == count:
+                sizes = list(size)
+            elif shape == "box" and is_pair(size):
+                sizes = [tuple(size)] * count
+            else:
+                return None
+            if shape == "circle":
+                return [float(item) for item in sizes]
+            resolved = []
+            for item in sizes:
+                if np.isscalar(item):
+                    resolved.append((float(item), float(item)))
+                elif is_pair(item):
+                    resolved.append((float(item[0]), float(item[1])))
+                else:
+                    return None
+            return resolved
+        except (TypeError, ValueError):
+            return None
+
+    @_mutates
+    def create_bodies(self, name_prefix: str, shape: str = "circle",
+                      positions: Optional[List[Tuple[float, float]]] = None,
+                      layout: Optional[dict] = None, size=10, mass=1.0,
+                      is_static: bool = False, friction: float = 0.7, elasticity: float = 0.3) -> str:
+        """
+        批量创建圆形或矩形物体，一次性加入空间
+
+        相同尺寸和质量的物体共享预先计算的转动惯量和顶点模板，适合一次创建成百上千个物体。
+
+        Args:
+            name_prefix: 名称前缀，物体依次命名为 前缀_1、前缀_2...
+            shape: 形状类型，"circle" 或 "box"
+            positions: 位置列表 [(x, y), ...]，与 layout 二选一
+            layout: 布局描述，见 _layout_positions
+            size: 圆形为半径，矩形为 (width, height) 或正方形边长；也可以是长度等于物体数量的列表，
+                逐个给出每个物体的尺寸（矩形的列表元素可以是边长或 (width, height)）
+            mass: 质量，或每个物体各自质量组成的列表
+            is_static: 是否为静态物体
+            friction: 摩擦系数
+            elasticity: 弹性系数
+
+        Returns:
+            操作结果信息
+        """
+        if shape not in ("circle", "box"):
+            return f"错误：不支持的形状类型'{shape}'，只能是circle或box。"
+        points, error = self._resolve_positions(positions, layout, "物体")
+        if error:
+            return error
+        count = len(points)
+
+        # 尺寸和质量可以是单个值或逐个物体的列表
+        sizes = self._body_sizes(shape, size, count)
+        if sizes is None:
+            size_hint = "半径" if shape == "circle" else "边长或 (width, height)"
+            return f"错误：尺寸必须是单个{size_hint}，或长度等于物体数量{count}的列表。"
+        masses = [mass] * count if np.isscalar(mass) else list(mass)
+        if len(masses) != count or not all(np.isscalar(item) for item in masses):
+            return f"错误：质量必须是单个数值，或长度等于物体数量{count}的列表。"
+
+        names = [f"{name_prefix}_{i}" for i in range(1, count + 1)]
+        existing = [name for name in names if name in self.bodies or name in self.particle_fields]
+        if existing:
+            return f"错误：名为'{existing[0]}'的物体已存在。"
+
+        # 形状模板：每种 (尺寸, 质量) 组合只计算一次转动惯量和顶点
+        templates = {}
+        created = []
+        for name, position, item_size, item_mass in zip(names, points.tolist(), sizes, masses):
+            key = (item_size, item_mass)
+            template = templates.get(key)
+            if template is None:
+                if shape == "circle":
+                    moment = pymunk.moment_for_circle(item_mass, 0, item_size)
+                    template = templates[key] = (moment, item_size)
+                else:
+                    width, height = item_size
+                    vertices = [(-width / 2, -height / 2), (width / 2, -height / 2),
+                                (width / 2, height / 2), (-width / 2, height / 2)]
+                    moment = pymunk.moment_for_box(item_mass, (width, height))
+                    template = templates[key] = (moment, vertices)
+            moment, geometry = template
+
+            if is_static:
+                body = pymunk.Body(body_type=pymunk.Body.STATIC)
+            else:
+                body = pymunk.Body(item_mass, moment)
+            body.position = position
+            if shape == "circle":
+                body_shape = pymunk.Circle(body, geometry)
+            else:
+                body_shape = pymunk.Poly(body, geometry)
+            body_shape.friction = friction
+            body_shape.elasticity = elasticity
+            created.append((name, body, body_shape))
+
+        # 一次性加入空间并登记，宽相位只在最后检查一次
+        self.space.add(*(obj for _, body, body_shape in created for obj in (body, body_shape)))
+        for name, body, body_shape in created:
+            self.bodies[name] = body
+            self.shapes[name] = body_shape
+            self._body_names[body] = name
+            self._shape_names[body_shape] = name
+        self._check_broadphase()
+
+        shape_label = "圆形" if shape == "circle" else "矩形"
+        return f"成功批量创建{count}个{shape_label}，名称为{names[0]}到{names[-1]}。"
+
+    @_mutates
+    def create_particle_field(self, name: str, positions: Optional[List[Tuple[float, float]]] = None,
+                              layout: Optional[dict] = None, radius: float = 3.0,
+                              particle_mass: float = 0.1, friction: float = 0.5,
+                              elasticity: float = 0.0) -> str:
+        """
+        创建粒子场：一组同尺寸的小圆（沙子、弹珠、流体），整体命名并以聚合统计的形式输出状态
+
+        粒子默认不反弹（弹性系数0）以减少堆积时的抖动；粒子数量较多且宽相位仍是默认的包围盒树
+        （未通过 configure_broadphase 显式选择）时，宽相位切换为自动模式，让大量同尺寸粒子使用空间哈希。
+
+        Args:
+            name: 粒子场名称
+            positions: 粒子位置列表 [(x, y), ...]，与 layout 二选一
+            layout: 布局描述，见 _layout_positions
+            radius: 粒子半径
+            particle_mass: 单个粒子的质量
+            friction: 摩擦系数
+            elasticity: 弹性系数
+
+        Returns:
+            操作结果信息
+        """
+        if name in self.bodies or name in self.particle_fields:
+            return f"错误：名为'{name}'的物体已存在。"
+        points, error = self._resolve_positions(positions, layout, "粒子")
+        if error:
+            return error
+        count = len(points)
+
+        # 所有粒子共享同一个转动惯量
+        moment = pymunk.moment_for_circle(particle_mass, 0, radius)
+        bodies = []
+        shapes = []
+        for position in points.tolist():
+            body = pymunk.Body(particle_mass, moment)
+            body.position = position
+            shape = pymunk.Circle(body, radius)
+            shape.friction = friction
+            shape.elasticity = elasticity
+            bodies.append(body)
+            shapes.append(shape)
+        self.space.add(*bodies, *shapes)
+        self.particle_fields[name] = ParticleField(name, bodies, shapes, radius)
+        self._particle_bodies.update(bodies)
+
+        message = f"成功创建名为'{name}'的粒子场，共{count}个粒子，粒子半径{radius}。"
+        if (self._broadphase_mode == "bbtree" and not self._broadphase_configured
+                and count >= self._SPATIAL_HASH_MIN_SHAPES):
+            self._broadphase_mode = "auto"
+            message += f"宽相位已从默认的包围盒树切换为自动模式：{self._tune_broadphase()}"
+        else:
+            self._check_broadphase()
+        return message
+
+    @_mutates
     def create_car(self, name: str, position: Tuple[float, float], 
                    chassis_size: Tuple[float, float] = (50, 20), 
                    wheel_radius: float = 10, chassis_mass: float = 10, 
@@ -526,8 +1215,10 @@ class PhysicsSandbox:
         Returns:
             操作结果信息
         """
-        if name in self.bodies:
+        if name in self.bodies or name in self.particle_fields:
             return f"错误：名为'{name}'的物体已存在。"
+        if f"{name}_joint1" in self.constraints or f"{name}_joint2" in self.constraints:
+            return f"错误：名为'{name}_joint1'或'{name}_joint2'的约束已存在。"
         
         x, y = position
         
@@ -572,19 +1263,20 @@ class PhysicsSandbox:
         self.space.add(joint1, joint2)
         
         # 存储引用（只存储车身，轮子作为车身的组成部分）
-        self.bodies[name] = chassis_body
-        self.shapes[name] = chassis_shape
+        self._register(name, chassis_body, chassis_shape)
         
         # 存储轮子信息（用于后续操作）
-        self.bodies[f"{name}_wheel1"] = wheel1_body
-        self.shapes[f"{name}_wheel1"] = wheel1_shape
-        self.bodies[f"{name}_wheel2"] = wheel2_body
-        self.shapes[f"{name}_wheel2"] = wheel2_shape
+        self._register(f"{name}_wheel1", wheel1_body, wheel1_shape)
+        self._register(f"{name}_wheel2", wheel2_body, wheel2_shape)
+        self._register_constraint(f"{name}_joint1", joint1)
+        self._register_constraint(f"{name}_joint2", joint2)
         
         return f"成功创建名为'{name}'的小车，车身位置({x:.1f}, {y:.1f})，尺寸{chassis_size}，轮子半径{wheel_radius}。"
 
+    @_mutates
     def add_pivot_joint(self, body1_name: str, body2_name: str, 
-                       anchor1: Tuple[float, float], anchor2: Tuple[float, float]) -> str:
+                       anchor1: Tuple[float, float], anchor2: Tuple[float, float],
+                       name: Optional[str] = None) -> str:
         """
         在两个物体之间添加枢轴关节（PivotJoint）
         
@@ -593,6 +1285,7 @@ class PhysicsSandbox:
             body2_name: 第二个物体名称
             anchor1: 第一个物体上的锚点 (相对于物体中心)
             anchor2: 第二个物体上的锚点 (相对于物体中心)
+            name: 关节名称，默认自动命名为 物体1_物体2_pivot
             
         Returns:
             操作结果信息
@@ -601,6 +1294,8 @@ class PhysicsSandbox:
             return f"错误：名为'{body1_name}'的物体不存在。"
         if body2_name not in self.bodies:
             return f"错误：名为'{body2_name}'的物体不存在。"
+        if name is not None and name in self.constraints:
+            return f"错误：名为'{name}'的约束已存在。"
             
         body1 = self.bodies[body1_name]
         body2 = self.bodies[body2_name]
@@ -608,10 +1303,12 @@ class PhysicsSandbox:
         # 创建PivotJoint
         pivot_joint = pymunk.PivotJoint(body1, body2, anchor1, anchor2)
         
-        # 添加到空间
+        # 添加到空间并登记
         self.space.add(pivot_joint)
+        name = name or self._constraint_name(f"{body1_name}_{body2_name}_pivot")
+        self._register_constraint(name, pivot_joint)
         
-        return f"成功在'{body1_name}'和'{body2_name}'之间添加了枢轴关节。"
+        return f"成功在'{body1_name}'和'{body2_name}'之间添加了枢轴关节'{name}'。"
 
     def create_slope(self, name: str, start_point: Tuple[float, float], 
                     end_point: Tuple[float, float], friction: float = 0.7, 
@@ -632,285 +1329,591 @@ class PhysicsSandbox:
         # 斜面本质上也是地面，只是角度不同
         return self.create_ground(name, start_point, end_point, friction, elasticity)
 
-    def get_space_status(self) -> dict:
+    @staticmethod
+    def _link_segments(segments: List[pymunk.Segment]) -> None:
+        """为首尾相接的线段设置相邻关系，物体滑过连接处时不会被接缝卡住（克隆空间后需重新设置）"""
+        for index, segment in enumerate(segments):
+            previous_segment = segments[index - 1] if index > 0 else segment
+            next_segment = segments[index + 1] if index + 1 < len(segments) else segment
+            segment.set_neighbors(previous_segment.a, next_segment.b)
+
+    @_mutates
+    def create_terrain(self, name: str, points: Optional[List[Tuple[float, float]]] = None,
+                       heights: Optional[List[float]] = None, start_x: float = 0.0, spacing: float = 50.0,
+                       smoothing: int = 0, thickness: float = 5.0, friction: float = 0.7,
+                       elasticity: float = 0.3) -> str:
         """
-        获取 Pymunk 空间的状态信息。
+        创建折线地形：所有线段挂在同一个静态物体上，状态中只作为一个物体输出
+
+        Args:
+            name: 地形名称
+            points: 折线顶点列表 [(x, y), ...]，与 heights 二选一
+            heights: 高度场，第 i 个顶点为 (start_x + i * spacing, heights[i])
+            start_x: 高度场第一个顶点的x坐标
+            spacing: 高度场相邻顶点的水平间距
+            smoothing: 圆角平滑迭代次数（Chaikin切角），0表示保持原折线，每次迭代线段数约翻倍
+            thickness: 线段厚度（半径）
+            friction: 摩擦系数
+            elasticity: 弹性系数
 
         Returns:
-            一个包含空间、所有物体、形状和约束详细信息的字典。
-        """
-        status_info = {
-            "summary": {
-                "body_count": len(self.space.bodies),
-                "shape_count": len(self.space.shapes),
-                "constraint_count": len(self.space.constraints),
-                "gravity": tuple(self.space.gravity),
-                "iterations": self.space.iterations,
-                "current_time_step": self.space.current_time_step
-            },
-            "bodies": [],
-            "shapes": [],
-            "constraints": []
+            操作结果信息
+        """
+        if name in self.bodies or name in self.particle_fields:
+            return f"错误：名为'{name}'的物体已存在。"
+        if (points is None) == (heights is None):
+            return "错误：points 和 heights 必须且只能提供一个。"
+        if heights is not None:
+            points = [(start_x + i * spacing, height) for i, height in enumerate(heights)]
+        vertices = np.asarray(points, dtype=float)
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 2:
+            return "错误：地形至少需要两个顶点，且每个顶点必须是 (x, y)。"
+
+        # Chaikin切角：每条边取1/4和3/4处的点，保留两个端点
+        for _ in range(max(0, smoothing)):
+            left, right = vertices[:-1], vertices[1:]
+            cut = np.empty((2 * len(left), 2))
+            cut[0::2] = 0.75 * left + 0.25 * right
+            cut[1::2] = 0.25 * left + 0.75 * right
+            vertices = np.vstack((vertices[:1], cut, vertices[-1:]))
+
+        body = pymunk.Body(body_type=pymunk.Body.STATIC)
+        vertex_list = [tuple(vertex) for vertex in vertices.tolist()]
+        segments = []
+        for start_point, end_point in zip(vertex_list, vertex_list[1:]):
+            if start_point == end_point:
+                continue
+            segment = pymunk.Segment(body, start_point, end_point, thickness)
+            segment.friction = friction
+            segment.elasticity = elasticity
+            segments.append(segment)
+        if not segments:
+            return "错误：地形的顶点不能全部重合。"
+        self._link_segments(segments)
+        self.space.add(body, *segments)
+
+        # 第一段作为登记表中的代表形状，其余线段通过 terrains 找到
+        self.terrains[name] = segments
+        self._terrain_bodies[body] = name
+        self._register(name, body, segments[0])
+
+        return f"成功创建名为'{name}'的地形，共{len(segments)}段，从({vertex_list[0][0]:.1f}, {vertex_list[0][1]:.1f})到({vertex_list[-1][0]:.1f}, {vertex_list[-1][1]:.1f})。"
+
+    def step(self, dt: float = 1.0/60.0) -> None:
+        """
+        推进一步物理模拟并递增状态版本号
+
+        Args:
+            dt: 时间步长（秒）
+        """
+        self.space.step(dt)
+        self.version += 1
+
+    def mark_dirty(self) -> None:
+        """绕过沙盒方法直接修改了 space 或物体属性后调用，使状态缓存和静态图层缓存失效"""
+        self.version += 1
+        self.scene_version += 1
+
+    def _space_summary(self) -> dict:
+        """空间整体信息"""
+        return {
+            "body_count": len(self.space.bodies),
+            "shape_count": len(self.space.shapes),
+            "constraint_count": len(self.space.constraints),
+            "gravity": tuple(self.space.gravity),
+            "iterations": self.space.iterations,
+            "current_time_step": self.space.current_time_step,
+            "particle_count": len(self._particle_bodies)
         }
 
-        # 1. 收集所有物体的信息
-        for body in self.space.bodies:
-            # 查找对应的名称
-            body_name = None
-            for name, stored_body in self.bodies.items():
-                if stored_body == body:
-                    body_name = name
-                    break
-            
-            body_data = {
-                "name": body_name,
-                "type": "STATIC" if body.body_type == pymunk.Body.STATIC else "DYNAMIC",
+    def _body_info(self, body: pymunk.Body, check_sleeping: bool = False) -> dict:
+        """
+        单个物体的完整状态信息
+
+        Args:
+            body: 物体
+            check_sleeping: 是否检查休眠状态；休眠物体速度和受力都为0，只输出位置等简要信息
+        """
+        if check_sleeping and body.body_type == pymunk.Body.DYNAMIC and body.is_sleeping:
+            return {
+                "name": self._body_names.get(body),
+                "type": "DYNAMIC",
+                "sleeping": True,
                 "position": tuple(body.position),
                 "angle_radians": body.angle,
                 "angle_degrees": math.degrees(body.angle),
-                "velocity": tuple(body.velocity),
-                "angular_velocity": body.angular_velocity,
-                "mass": body.mass,
-                "moment": body.moment,
-                "center_of_gravity": tuple(body.center_of_gravity),
-                "force": tuple(body.force),
-                "torque": body.torque
+                "mass": body.mass
             }
-            status_info["bodies"].append(body_data)
+        return {
+            "name": self._body_names.get(body),
+            "type": "STATIC" if body.body_type == pymunk.Body.STATIC else "DYNAMIC",
+            "position": tuple(body.position),
+            "angle_radians": body.angle,
+            "angle_degrees": math.degrees(body.angle),
+            "velocity": tuple(body.velocity),
+            "angular_velocity": body.angular_velocity,
+            "mass": body.mass,
+            "moment": body.moment,
+            "center_of_gravity": tuple(body.center_of_gravity),
+            "force": tuple(body.force),
+            "torque": body.torque
+        }
 
-        # 2. 收集所有形状的信息
-        for shape in self.space.shapes:
-            # 查找对应的名称
-            shape_name = None
-            for name, stored_shape in self.shapes.items():
-                if stored_shape == shape:
-                    shape_name = name
-                    break
-            
-            # 根据形状类型获取特定信息
-            shape_details = {
-                "name": shape_name,
-                "type": shape.__class__.__name__,
-                "friction": shape.friction,
-                "elasticity": shape.elasticity,
-                "mass": shape.mass,
-                "sensor": shape.sensor,
-                "collision_type": shape.collision_type,
-                "body_hash": hash(shape.body)
-            }
-            
-            # 添加特定形状的详细信息
-            if isinstance(shape, pymunk.Circle):
-                shape_details["radius"] = shape.radius
-                shape_details["offset"] = tuple(shape.offset)
-            elif isinstance(shape, pymunk.Poly):
-                shape_details["vertices"] = [tuple(v) for v in shape.get_vertices()]
-                shape_details["radius"] = shape.radius
-            elif isinstance(shape, pymunk.Segment):
+    def _shape_info(self, shape: pymunk.Shape) -> dict:
+        """单个形状的几何与材质信息"""
+        # 根据形状类型获取特定信息
+        shape_details = {
+            "name": self._shape_names.get(shape),
+            "type": shape.__class__.__name__,
+            "friction": shape.friction,
+            "elasticity": shape.elasticity,
+            "mass": shape.mass,
+            "sensor": shape.sensor,
+            "collision_type": shape.collision_type,
+            "body_hash": hash(shape.body)
+        }
+        
+        # 添加特定形状的详细信息
+        if isinstance(shape, pymunk.Circle):
+            shape_details["radius"] = shape.radius
+            shape_details["offset"] = tuple(shape.offset)
+        elif isinstance(shape, pymunk.Poly):
+            shape_details["vertices"] = [tuple(v) for v in shape.get_vertices()]
+            shape_details["radius"] = shape.radius
+        elif isinstance(shape, pymunk.Segment):
+            terrain_name = self._terrain_bodies.get(shape.body)
+            if terrain_name is not None:
+                # 地形的所有线段合并为一条折线输出
+                segments = self.terrains[terrain_name]
+                shape_details["type"] = "Terrain"
+                shape_details["points"] = [tuple(segments[0].a)] + [tuple(segment.b) for segment in segments]
+            else:
                 shape_details["a"] = tuple(shape.a)
                 shape_details["b"] = tuple(shape.b)
-                shape_details["radius"] = shape.radius
-            
-            status_info["shapes"].append(shape_details)
-        
-        # 3. 收集所有约束的信息
-        for constraint in self.space.constraints:
-            constraint_data = {
-                "type": constraint.__class__.__name__,
-                "max_force": constraint.max_force,
-                "error_bias": constraint.error_bias,
-                "max_bias": constraint.max_bias,
-                "collide_bodies": constraint.collide_bodies
+            shape_details["radius"] = shape.radius
+        return shape_details
+
+    def _reported_shapes(self):
+        """需要逐个输出状态的形状：跳过粒子，地形只输出登记表中的代表线段"""
+        particles = self._particle_bodies
+        terrains = self._terrain_bodies
+        for shape in self.space.shapes:
+            body = shape.body
+            if body in particles or (body in terrains and shape not in self._shape_names):
+                continue
+            yield shape
+
+    def _constraint_info(self, constraint: pymunk.Constraint) -> dict:
+        """单个约束的参数及连接的物体"""
+        constraint_data = {
+            "name": self._constraint_names.get(constraint),
+            "type": constraint.__class__.__name__,
+            "max_force": constraint.max_force,
+            "error_bias": constraint.error_bias,
+            "max_bias": constraint.max_bias,
+            "collide_bodies": constraint.collide_bodies
+        }
+        
+        # 添加特定约束的详细信息
+        if isinstance(constraint, pymunk.PivotJoint):
+            constraint_data["anchor_a"] = tuple(constraint.anchor_a)
+            constraint_data["anchor_b"] = tuple(constraint.anchor_b)
+        elif isinstance(constraint, pymunk.PinJoint):
+            constraint_data["anchor_a"] = tuple(constraint.anchor_a)
+            constraint_data["anchor_b"] = tuple(constraint.anchor_b)
+            constraint_data["dist"] = constraint.distance
+        elif isinstance(constraint, pymunk.DampedSpring):
+            constraint_data["anchor_a"] = tuple(constraint.anchor_a)
+            constraint_data["anchor_b"] = tuple(constraint.anchor_b)
+            constraint_data["rest_length"] = constraint.rest_length
+            constraint_data["stiffness"] = constraint.stiffness
+            constraint_data["damping"] = constraint.damping
+        
+        # 通过反向索引查找连接的物体名称
+        constraint_data["body_a"] = self._body_names.get(constraint.a)
+        constraint_data["body_b"] = self._body_names.get(constraint.b)
+        return constraint_data
+
+    # 状态缓存保留的最近版本数，since_version 早于这些版本时返回完整状态
+    _STATUS_HISTORY_SIZE = 8
+    # 增量中按名称比较的状态条目
+    _STATUS_SECTIONS = ("bodies", "shapes", "constraints", "particle_fields")
+
+    def get_space_status(self, since_version: Optional[int] = None) -> dict:
+        """
+        获取 Pymunk 空间的状态信息。
+
+        自上次构建以来沙盒没有被修改或步进时直接返回缓存的状态，返回的字典不应被调用方修改。
+        直接修改 space 或物体属性（绕过沙盒方法）后需先调用 mark_dirty。
+
+        Args:
+            since_version: 调用方已持有的状态版本号；提供且该版本仍在缓存中时返回相对它的增量
+
+        Returns:
+            一个包含空间、所有物体、形状和约束详细信息的字典。粒子场中的粒子不逐个输出，
+            而是在 particle_fields 中给出每个粒子场的聚合统计。version 为该状态的版本号。
+            返回增量时包含 version、since_version、summary，以及 bodies/shapes/constraints/particle_fields
+            各自的 added（新增条目）、removed（删除的名称）、changed（变化后的条目）。
+        """
+        status = self._status_history.get(self.version)
+        if status is None:
+            sleeping_enabled = self.sleeping_enabled
+            particles = self._particle_bodies
+            status = {
+                "version": self.version,
+                "summary": self._space_summary(),
+                "bodies": [self._body_info(body, sleeping_enabled) for body in self.space.bodies if body not in particles],
+                "shapes": [self._shape_info(shape) for shape in self._reported_shapes()],
+                "constraints": [self._constraint_info(constraint) for constraint in self.space.constraints],
+                "particle_fields": self.get_particle_statistics()
             }
-            
-            # 添加特定约束的详细信息
-            if isinstance(constraint, pymunk.PivotJoint):
-                constraint_data["anchor_a"] = tuple(constraint.anchor_a)
-                constraint_data["anchor_b"] = tuple(constraint.anchor_b)
-            elif isinstance(constraint, pymunk.PinJoint):
-                constraint_data["anchor_a"] = tuple(constraint.anchor_a)
-                constraint_data["anchor_b"] = tuple(constraint.anchor_b)
-                constraint_data["dist"] = constraint.dist
-            elif isinstance(constraint, pymunk.DampedSpring):
-                constraint_data["anchor_a"] = tuple(constraint.anchor_a)
-                constraint_data["anchor_b"] = tuple(constraint.anchor_b)
-                constraint_data["rest_length"] = constraint.rest_length
-                constraint_data["stiffness"] = constraint.stiffness
-                constraint_data["damping"] = constraint.damping
-            
-            # 查找连接的物体名称
-            body_a_name = None
-            body_b_name = None
-            for name, stored_body in self.bodies.items():
-                if stored_body == constraint.a:
-                    body_a_name = name
-                if stored_body == constraint.b:
-                    body_b_name = name
-            
-            constraint_data["body_a"] = body_a_name
-            constraint_data["body_b"] = body_b_name
-            
-            status_info["constraints"].append(constraint_data)
-            
-        return status_info
+            self._status_history[self.version] = status
+            while len(self._status_history) > self._STATUS_HISTORY_SIZE:
+                self._status_history.popitem(last=False)
+
+        previous = self._status_history.get(since_version) if since_version is not None else None
+        if previous is None:
+            return status
+        delta = {"version": status["version"], "since_version": since_version, "summary": status["summary"]}
+        for section in self._STATUS_SECTIONS:
+            delta[section] = self._diff_records(previous[section], status[section])
+        return delta
+
+    @staticmethod
+    def _diff_records(old: List[dict], new: List[dict]) -> dict:
+        """按名称比较两组状态条目，未命名条目按位置区分"""
+        def keyed(records: List[dict]) -> Dict[str, dict]:
+            return {record["name"] if record.get("name") is not None else f"#{index}": record
+                    for index, record in enumerate(records)}
+
+        old_records = keyed(old)
+        new_records = keyed(new)
+        return {
+            "added": [record for key, record in new_records.items() if key not in old_records],
+            "removed": [key for key in old_records if key not in new_records],
+            "changed": [record for key, record in new_records.items()
+                        if key in old_records and old_records[key] != record]
+        }
+
+    def get_particle_statistics(self) -> List[dict]:
+        """
+        获取所有粒子场的聚合统计
+
+        Returns:
+            每个粒子场一条统计记录的列表，字段见 ParticleField.statistics
+        """
+        return [field.statistics() for field in self.particle_fields.values()]
+
+    def get_scene_description(self) -> dict:
+        """
+        获取模拟过程中不会变化的场景拓扑：形状、约束、静态物体及动态物体的质量属性。
+
+        与 get_dynamic_state 配合使用，静态部分只需输出一次。
+
+        Returns:
+            场景描述字典，形状通过 body 字段引用所属物体的名称
+        """
+        static_bodies = []
+        dynamic_bodies = []
+        particles = self._particle_bodies
+        for body in self.space.bodies:
+            if body in particles:
+                continue
+            name = self._body_names.get(body)
+            if body.body_type == pymunk.Body.STATIC:
+                static_bodies.append({"name": name, "position": tuple(body.position), "angle_radians": body.angle})
+            else:
+                dynamic_bodies.append({
+                    "name": name,
+                    "type": "KINEMATIC" if body.body_type == pymunk.Body.KINEMATIC else "DYNAMIC",
+                    "mass": body.mass,
+                    "moment": body.moment
+                })
+
+        shapes = []
+        for shape in self._reported_shapes():
+            shape_details = self._shape_info(shape)
+            del shape_details["body_hash"]
+            shape_details["body"] = self._body_names.get(shape.body)
+            shapes.append(shape_details)
+
+        summary = self._space_summary()
+        del summary["current_time_step"]
+        return {
+            "summary": summary,
+            "static_bodies": static_bodies,
+            "dynamic_bodies": dynamic_bodies,
+            "shapes": shapes,
+            "constraints": [self._constraint_info(constraint) for constraint in self.space.constraints],
+            "particle_fields": [field.describe() for field in self.particle_fields.values()]
+        }
+
+    def get_dynamic_state(self) -> List[dict]:
+        """
+        获取所有非静态物体随时间变化的状态（位置、角度、速度、角速度）
+
+        启用休眠时，休眠物体的速度恒为0，只输出名称、休眠标记和位姿。
+        粒子场中的粒子不在其中，见 get_particle_statistics。
+
+        Returns:
+            每个非静态物体一条记录的列表
+        """
+        fields = ("position", "velocity", "angle", "angular_velocity", "type_mask")
+        if self.sleeping_enabled:
+            fields += ("sleeping",)
+        state = self.get_state_arrays(fields)
+        names = state["names"]
+        moving = (state["type_mask"] != pymunk.Body.STATIC) & ~self._state_particles
+        records = {}
+        if "sleeping" in state:
+            indices = np.flatnonzero(moving & state["sleeping"]).tolist()
+            positions = state["position"][indices].tolist()
+            angles = state["angle"][indices].tolist()
+            for index, position, angle in zip(indices, positions, angles):
+                records[index] = {"name": names[index], "sleeping": True, "position": tuple(position), "angle_radians": angle}
+            moving &= ~state["sleeping"]
+
+        indices = np.flatnonzero(moving).tolist()
+        positions = state["position"][indices].tolist()
+        velocities = state["velocity"][indices].tolist()
+        angles = state["angle"][indices].tolist()
+        angular_velocities = state["angular_velocity"][indices].tolist()
+        for index, position, angle, velocity, angular_velocity in zip(
+                indices, positions, angles, velocities, angular_velocities):
+            records[index] = {
+                "name": names[index],
+                "position": tuple(position),
+                "angle_radians": angle,
+                "velocity": tuple(velocity),
+                "angular_velocity": angular_velocity
+            }
+        # 保持与 space.bodies 一致的顺序
+        return [records[index] for index in sorted(records)]
+
+    # 列式快照字段及其读取方式
+    _STATE_FIELDS = {
+        "position": lambda body: body.position,
+        "velocity": lambda body: body.velocity,
+        "angle": lambda body: body.angle,
+        "angular_velocity": lambda body: body.angular_velocity,
+        "mass": lambda body: body.mass,
+        "moment": lambda body: body.moment,
+        "type_mask": lambda body: body.body_type,
+        "sleeping": lambda body: body.is_sleeping,
+    }
+    # 默认填充的字段（休眠状态需显式请求）
+    _DEFAULT_STATE_FIELDS = ("position", "velocity", "angle", "angular_velocity", "mass", "moment", "type_mask")
+
+    def get_state_arrays(self, fields: Optional[Tuple[str, ...]] = None) -> dict:
+        """
+        以列式NumPy数组获取所有物体的动态状态，不为每个物体构造字典。
+
+        物体顺序与 space.bodies 的添加顺序一致，在没有增删物体时保持稳定。
+        返回的数组是预分配缓冲区的视图，下一次调用会被覆盖，需要保留时请自行copy。
+
+        Args:
+            fields: 需要填充的字段，默认为除 sleeping 外的全部字段；只需部分字段时（如收敛判断只读速度）可减少读取开销
+
+        Returns:
+            包含以下字段的字典：
+            - names: 名称表（list），未命名物体（如粒子）为None
+            - position: 位置 (N, 2)
+            - velocity: 速度 (N, 2)
+            - angle: 角度（弧度） (N,)
+            - angular_velocity: 角速度 (N,)
+            - mass: 质量 (N,)，静态物体为inf
+            - moment: 转动惯量 (N,)，静态物体为inf
+            - type_mask: 物体类型 (N,)，取值为 pymunk.Body.DYNAMIC/KINEMATIC/STATIC
+            - sleeping: 是否休眠 (N,)，仅在 fields 中显式请求时填充
+        """
+        bodies = list(self.space.bodies)
+        count = len(bodies)
+
+        # 物体集合或顺序变化时才重建名称表
+        if bodies != self._state_order:
+            self._state_order = bodies
+            self._state_names = [self._body_names.get(body) for body in bodies]
+            particles = self._particle_bodies
+            self._state_particles = np.fromiter((body in particles for body in bodies), dtype=bool, count=count)
+
+        # 容量不足时按倍数扩容缓冲区
+        buffers = self._state_buffers
+        capacity = len(buffers["angle"]) if buffers else 0
+        if count > capacity or not buffers:
+            capacity = max(count, capacity * 2, 16)
+            buffers["position"] = np.empty((capacity, 2), dtype=np.float64)
+            buffers["velocity"] = np.empty((capacity, 2), dtype=np.float64)
+            buffers["angle"] = np.empty(capacity, dtype=np.float64)
+            buffers["angular_velocity"] = np.empty(capacity, dtype=np.float64)
+            buffers["mass"] = np.empty(capacity, dtype=np.float64)
+            buffers["moment"] = np.empty(capacity, dtype=np.float64)
+            buffers["type_mask"] = np.empty(capacity, dtype=np.int8)
+            buffers["sleeping"] = np.empty(capacity, dtype=bool)
+
+        state = {"names": self._state_names}
+        for key in fields or self._DEFAULT_STATE_FIELDS:
+            buffer = buffers[key][:count]
+            if count:
+                getter = self._STATE_FIELDS[key]
+                if buffer.ndim == 2:
+                    # 把 Vec2d 列表直接赋给二维数组很慢，展平后用 fromiter 填充
+                    buffer.reshape(-1)[:] = np.fromiter(chain.from_iterable([getter(body) for body in bodies]),
+                                                        dtype=np.float64, count=2 * count)
+                else:
+                    buffer[:] = [getter(body) for body in bodies]
+            state[key] = buffer
+        return state
+
+    def _collision_names(self) -> Dict[pymunk.Body, str]:
+        """碰撞事件中使用的名称：命名物体（含地形）用其名称，粒子用所属粒子场的名称"""
+        names = dict(self._body_names)
+        for field in self.particle_fields.values():
+            names.update(dict.fromkeys(field.bodies, field.name))
+        return names
+
+    def _compact_state(self) -> dict:
+        """compact 格式的一帧：非静态物体的动态字段，存在粒子场时附带其聚合统计"""
+        frame = {"bodies": self.get_dynamic_state()}
+        if self.particle_fields:
+            frame["particle_fields"] = self.get_particle_statistics()
+        return frame
 
     def get_simulation_sequence(self, max_steps: int = 2000, dt: float = 1.0/60.0, 
                                 velocity_threshold: float = 0.1, angular_threshold: float = 0.01,
-                                max_sequence_length: int = 20) -> dict:
+                                max_sequence_length: int = 20, output_format: str = "full",
+                                convergence_window: int = 10,
+                                kinetic_energy_threshold: Optional[float] = None,
+                                record_collisions: bool = False, min_collision_impulse: float = 0.0,
+                                global_velocity_threshold: Optional[float] = None,
+                                global_angular_threshold: Optional[float] = None) -> dict:
             """
             获取一段时间内的空间状态序列信息，直到系统达到稳定状态或达到最大步数
             
             Args:
                 max_steps: 最大模拟步数
                 dt: 时间步长（秒）
-                velocity_threshold: 速度阈值，用于判断是否稳定
-                angular_threshold: 角速度阈值，用于判断是否稳定
+                velocity_threshold: 单个动态物体的速度阈值，用于判断是否稳定
+                angular_threshold: 单个动态物体的角速度阈值，用于判断是否稳定
+                max_sequence_length: 输出序列的最大帧数，只有会被保留的帧才会被物化
+                output_format: 输出格式
+                    - "full": 每帧都是完整的 get_space_status 状态
+                    - "compact": 静态场景拓扑只在 scene 中输出一次，每帧只包含非静态物体的动态字段
+                      及粒子场的聚合统计
+                convergence_window: 连续满足阈值多少步才判定为收敛
+                kinetic_energy_threshold: 系统总动能阈值，None表示不使用动能判据
+                record_collisions: 是否记录碰撞事件流（见 CollisionRecorder），同时把碰撞开始的帧作为关键帧优先保留
+                min_collision_impulse: 峰值冲量低于该值的接触不输出
+                global_velocity_threshold: 所有动态物体速度大小总和的阈值，None表示不使用该判据
+                global_angular_threshold: 所有动态物体角速度绝对值总和的阈值，None表示不使用该判据
                 
             Returns:
                 包含序列信息的字典，包括：
                 - metadata: 模拟元信息
+                - scene: 静态场景描述（仅compact格式）
                 - sequence: 状态序列列表
                 - final_state: 最终状态
                 - convergence_info: 收敛信息
+                - collision_events / collision_summary: 碰撞事件流及统计（仅 record_collisions 为True时）
             """
-            import copy
-            
-            # 复制当前的 space
-            copied_space = copy.deepcopy(self.space)
-            copied_sandbox = PhysicsSandbox()
-            copied_sandbox.space = copied_space
+            if output_format not in ("full", "compact"):
+                raise ValueError(f"不支持的输出格式: {output_format}")
+
+            # 分叉出独立副本进行模拟，副本保留名称登记表
+            copied_sandbox = self.fork()
             
+            def capture(step: int) -> dict:
+                """物化一帧状态"""
+                if output_format == "compact":
+                    frame = copied_sandbox._compact_state()
+                else:
+                    frame = copied_sandbox.get_space_status()
+                # get_space_status 返回的是状态缓存中的字典，不能原地修改
+                return {**frame, "time_step": step, "simulation_time": step * dt}
+
             # 保存初始状态
-            initial_status = copied_sandbox.get_space_status()
-            full_sequence = []
+            if output_format == "compact":
+                initial_status = copied_sandbox._compact_state()
+            else:
+                initial_status = copied_sandbox.get_space_status()
+            # 静态场景拓扑在模拟过程中不变，只描述一次
+            scene = copied_sandbox.get_scene_description() if output_format == "compact" else None
             convergence_info = {
                 "converged": False,
                 "convergence_step": None,
                 "reason": "",
                 "final_velocity_sum": 0.0,
-                "final_angular_velocity_sum": 0.0
+                "final_angular_velocity_sum": 0.0,
+                "final_kinetic_energy": 0.0
             }
-            
-            # 记录初始速度和角速度
-            initial_velocity_sum = sum(
-                abs(body["velocity"][0]) + abs(body["velocity"][1]) + abs(body["angular_velocity"])
-                for body in initial_status["bodies"]
-                if body["type"] == "DYNAMIC"
-            )
-            
-            previous_status = None
-            previous_velocity_sum = initial_velocity_sum
+
+            # 只物化最终会保留的关键帧，收敛判断直接基于速度数组
+            recorder = TrajectoryRecorder(capture, max_sequence_length)
+            monitor = ConvergenceMonitor(velocity_threshold, angular_threshold, window=convergence_window,
+                                         global_velocity_threshold=global_velocity_threshold,
+                                         global_angular_threshold=global_angular_threshold,
+                                         kinetic_energy_threshold=kinetic_energy_threshold)
+            state_fields = ConvergenceMonitor.STATE_FIELDS
+            if copied_sandbox.sleeping_enabled:
+                # 启用休眠时，所有动态物体休眠即可立即判定收敛
+                state_fields += ("sleeping",)
+            steps_run = 0
+            collisions = None
+            if record_collisions:
+                collisions = CollisionRecorder(copied_sandbox._collision_names(), dt,
+                                               min_impulse=min_collision_impulse)
+                collisions.install(copied_sandbox.space)
             
             # 开始模拟序列
             for step in range(max_steps):
                 # 执行物理步进
-                copied_space.step(dt)
-                
-                # 获取当前状态
-                current_status = copied_sandbox.get_space_status()
-                current_status["time_step"] = step
-                current_status["simulation_time"] = step * dt
-                full_sequence.append(current_status)
+                if collisions is not None:
+                    collisions.step = step
+                copied_sandbox.step(dt)
+                steps_run = step + 1
+                recorder.record(step)
+                if collisions is not None and collisions.pop_step_begin():
+                    recorder.mark(step)
                 
-                # 计算当前速度和角速度总和
-                current_velocity_sum = sum(
-                    abs(body["velocity"][0]) + abs(body["velocity"][1]) + abs(body["angular_velocity"])
-                    for body in current_status["bodies"]
-                    if body["type"] == "DYNAMIC"
-                )
-                
-                # 检查是否收敛（速度和角速度都很小）
-                if current_velocity_sum < velocity_threshold and current_velocity_sum < angular_threshold:
+                reason = monitor.update(copied_sandbox.get_state_arrays(state_fields))
+                if reason:
                     convergence_info["converged"] = True
                     convergence_info["convergence_step"] = step
-                    convergence_info["reason"] = "系统达到速度和角速度阈值，趋于稳定"
-                    convergence_info["final_velocity_sum"] = current_velocity_sum
-                    convergence_info["final_angular_velocity_sum"] = sum(
-                        abs(body["angular_velocity"]) for body in current_status["bodies"]
-                        if body["type"] == "DYNAMIC"
-                    )
+                    convergence_info["reason"] = reason
                     break
-                
-                # 检查是否振荡收敛（速度变化很小）
-                if previous_status is not None:
-                    velocity_change = abs(current_velocity_sum - previous_velocity_sum)
-                    if velocity_change < 0.001:  # 速度变化极小
-                        # 检查几个连续步骤的速度变化
-                        if step > 10:  # 至少运行10步后才检查
-                            recent_changes = [
-                                abs(full_sequence[i]["bodies"][0]["velocity"][0] - full_sequence[i-1]["bodies"][0]["velocity"][0])
-                                for i in range(max(1, len(full_sequence)-5), len(full_sequence))
-                            ]
-                            if all(change < 0.1 for change in recent_changes if len(full_sequence) > 1):
-                                convergence_info["converged"] = True
-                                convergence_info["convergence_step"] = step
-                                convergence_info["reason"] = "系统趋于稳定，速度变化极小"
-                                convergence_info["final_velocity_sum"] = current_velocity_sum
-                                break
-                
-                previous_status = current_status
-                previous_velocity_sum = current_velocity_sum
-                
-                # 如果达到最大步数
-                if step == max_steps - 1:
-                    convergence_info["reason"] = f"达到最大步数 {max_steps}"
-                    convergence_info["final_velocity_sum"] = current_velocity_sum
-            
-            # 控制序列长度：保留初始和末尾状态，中间按顺序间隔抽取
-            sequence = []
-            
-            if len(full_sequence) == 0:
-                # 如果没有序列数据，返回空序列
-                pass
-            elif len(full_sequence) == 1 or max_sequence_length == 1:
-                # 如果只有一个状态或只要求一个状态，只返回初始状态
-                sequence.append(full_sequence[0])
-            elif max_sequence_length == 2:
-                # 特殊情况：只保留初始和最终状态
-                sequence.append(full_sequence[0])
-                if len(full_sequence) > 1:
-                    sequence.append(full_sequence[-1])
-            elif len(full_sequence) <= max_sequence_length:
-                # 如果序列长度小于等于最大长度，直接使用完整序列
-                sequence = full_sequence.copy()
             else:
-                # 需要抽样以控制长度
-                # 添加初始状态
-                sequence.append(full_sequence[0])
-                
-                # 计算需要抽取的中间状态数量
-                middle_count = max_sequence_length - 2
-                if middle_count > 0 and len(full_sequence) > 2:
-                    # 计算间隔
-                    interval = (len(full_sequence) - 2) / (middle_count + 1)
-                    # 按顺序间隔抽取中间状态
-                    for i in range(middle_count):
-                        index = int(1 + (i + 1) * interval)
-                        if 1 <= index < len(full_sequence) - 1:
-                            sequence.append(full_sequence[index])
-                
-                # 添加最终状态
-                if len(full_sequence) > 1:
-                    sequence.append(full_sequence[-1])
+                convergence_info["reason"] = f"达到最大步数 {max_steps}"
+            convergence_info["final_velocity_sum"] = monitor.metrics["velocity_sum"]
+            convergence_info["final_angular_velocity_sum"] = monitor.metrics["angular_velocity_sum"]
+            convergence_info["final_kinetic_energy"] = monitor.metrics["kinetic_energy"]
             
-            # 确保序列长度不超过限制
-            if len(sequence) > max_sequence_length:
-                sequence = sequence[:max_sequence_length]
+            # 保留初始和末尾状态，中间按顺序间隔抽取
+            recorder.finish()
+            sequence = recorder.frames()
             
-            return {
+            result = {
                 "metadata": {
                     "max_steps": max_steps,
                     "dt": dt,
                     "velocity_threshold": velocity_threshold,
                     "angular_threshold": angular_threshold,
-                    "total_steps": len(full_sequence),
-                    "max_sequence_length": max_sequence_length
-                },
+                    "total_steps": steps_run,
+                    "max_sequence_length": max_sequence_length,
+                    "output_format": output_format
+                }
+            }
+            if scene is not None:
+                result["scene"] = scene
+            result.update({
                 "sequence": sequence,
-                "final_state": full_sequence[-1] if full_sequence else initial_status,
+                "final_state": recorder.final_frame or initial_status,
                 "convergence_info": convergence_info,
                 "initial_state": initial_status
-            }
+            })
+            if collisions is not None:
+                collisions.close()
+                result["collision_events"] = collisions.events()
+                result["collision_summary"] = collisions.summary()
+            return result
 # if __name__ == "__main__":
 #     sandbox = PhysicsSandbox()
 #     sandbox.create_circle("ball1", (100, 200), 25)
@@ -1,5 +1,6 @@
 from re import S
 from pymunk_tools import PymunkToolManager
+from status_renderer import render_status
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import SystemMessagePromptTemplate
 from langchain_core.messages import HumanMessage, AIMessage
@@ -15,7 +16,7 @@ import os
 class PymunkAgent:
     def __init__(self):
         # 工具配置
-        self.tool_manager = PymunkToolManager()
+        self.tool_manager = PymunkToolManager(threads=SANDBOX_THREADS)
         self.tools = self.tool_manager.get_tools()
         self.tools_description = self.tool_manager.get_tools_description()
         # 大模型API配置
@@ -35,11 +36,10 @@ class PymunkAgent:
         tool = next((t for t in self.tools if t.name == tool_name), None)
         if tool:
             try:
-                if tool_input == "":
-                    tool_execute_result =  tool.func()
-                else:
-                    tool_execute_result =  tool.func(tool_input)
-                space_current_status = self.tool_manager.get_sandbox_status()
+                # 通过工具管理器调用，成功修改沙盒的调用会记入动作日志
+                tool_execute_result = self.tool_manager.call_tool(tool_name, tool_input)
+                space_current_status = render_status(self.tool_manager.get_sandbox_status(),
+                                                     precision=STATUS_PRECISION, max_chars=STATUS_MAX_CHARS)
                 aggregated_status = f"工具 {tool_name} 执行成功，执行结果: {tool_execute_result}，物理沙盒状态: {space_current_status}"
                 return aggregated_status
             except Exception as e:
@@ -141,10 +141,17 @@ class PymunkAgent:
         # 创建success_cases目录
         os.makedirs("success_cases", exist_ok=True)
         
+        # 动作日志单独保存，成功案例中只记录路径，避免检索到的案例撑大提示词
+        os.makedirs("action_logs", exist_ok=True)
+        action_log_file = f"action_logs/{time.strftime('%Y%m%d_%H%M%S')}.json"
+        self.tool_manager.action_log.save(action_log_file)
+
         # 准备保存的数据
         success_data = {
             "user_instruction": user_instruction,
             "summary": summary_response,
+            # 可直接回放的动作日志，见 PymunkToolManager.from_action_log
+            "action_log": action_log_file,
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
         }
         
@@ -4,17 +4,65 @@ Pymunk物理引擎的LangChain工具注册
 """
 
 from langchain.tools import Tool
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import json
+from action_log import ActionLog
 from physics_sandbox import PhysicsSandbox
 
 
 class PymunkToolManager:
     """Pymunk工具管理器，管理物理沙盒实例和工具注册"""
     
-    def __init__(self):
-        self.sandbox = PhysicsSandbox()
+    def __init__(self, threads: int = 1):
+        self.sandbox = PhysicsSandbox(threads=threads)
         self.tools = self._create_tools()
+        self._tools_by_name = {tool.name: tool for tool in self.tools}
+        # 成功修改了沙盒的工具调用，用于保存和回放
+        self.action_log = ActionLog()
+
+    @classmethod
+    def from_action_log(cls, action_log: ActionLog, threads: int = 1) -> "PymunkToolManager":
+        """
+        在新的沙盒上依次回放动作日志，不调用大模型
+
+        Args:
+            action_log: 动作日志
+            threads: 物理步进的求解线程数
+
+        Returns:
+            回放完成的工具管理器，其 action_log 与回放的日志一致
+
+        Raises:
+            ValueError: 某一步工具不存在、返回错误信息或没有修改沙盒；工具内部抛出的异常原样传出
+        """
+        manager = cls(threads=threads)
+        for index, action in enumerate(action_log, start=1):
+            result = manager.call_tool(action["tool_name"], action.get("tool_input", ""))
+            # 日志中只有成功修改沙盒的调用，回放时每一步都应当再次被记录
+            if len(manager.action_log) != index:
+                raise ValueError(f"回放第{index}步 {action['tool_name']} 失败: {result}")
+        return manager
+
+    def call_tool(self, tool_name: str, tool_input) -> str:
+        """
+        调用工具，调用成功且修改了沙盒时记入动作日志
+
+        Args:
+            tool_name: 工具名称
+            tool_input: 工具参数，空字符串表示无参数
+
+        Returns:
+            工具执行结果；工具不存在时返回错误信息，工具内部出错时抛出异常
+        """
+        tool = self._tools_by_name.get(tool_name)
+        if tool is None:
+            return f"错误：工具'{tool_name}'不存在。"
+        version = self.sandbox.version
+        result = tool.func() if tool_input == "" else tool.func(tool_input)
+        # 只读工具（如 get_position）不改变版本号，不需要回放
+        if self.sandbox.version != version and not str(result).startswith("错误"):
+            self.action_log.record(tool_name, tool_input, result)
+        return result
     
     def _create_tools(self) -> List[Tool]:
         """创建所有Pymunk工具"""
@@ -33,9 +81,14 @@ class PymunkToolManager:
             self._create_set_properties_tool(),
             self._create_ground_tool(),
             self._create_slope_tool(),
+            self._create_terrain_tool(),
             self._create_duplicate_body_tool(),
+            self._create_bodies_tool(),
+            self._create_particle_field_tool(),
             self._create_car_tool(),
             self._create_pivot_joint_tool(),
+            self._create_remove_constraint_tool(),
+            self._create_set_sleeping_tool(),
         ]
     
     def _create_circle_tool(self) -> Tool:
@@ -43,13 +96,15 @@ class PymunkToolManager:
         def create_circle_wrapper(input_str: dict) -> str:
             try:
                 params = input_str
-                self.sandbox.create_circle(
+                result = self.sandbox.create_circle(
                     name=params["name"],
                     position=tuple(params["position"]),
                     radius=params["radius"],
                     mass=params.get("mass", 1.0),
                     is_static=params.get("is_static", False)
                 )
+                if result.startswith("错误"):
+                    return result
                 return f"创建圆形成功！名称：{params['name']}，位置：{params['position']}，半径：{params['radius']}，质量：{params.get('mass', 1.0)}，是否静态：{params.get('is_static', False)}"
             except Exception as e:
                 raise Exception(f"创建圆形时出错: {str(e)}")
@@ -120,7 +175,8 @@ JSON格式示例：{"name": "box1", "position": [150, 300], "size": [50, 30], "m
                     anchor1=tuple(params["anchor1"]),
                     anchor2=tuple(params["anchor2"]),
                     stiffness=params["stiffness"],
-                    damping=params["damping"]
+                    damping=params["damping"],
+                    name=params.get("name")
                 )
             except Exception as e:
                 raise Exception(f"创建弹簧关节时出错: {str(e)}")
@@ -136,6 +192,9 @@ JSON格式示例：{"name": "box1", "position": [150, 300], "size": [50, 30], "m
 - stiffness (number): 弹簧刚度，数值越大弹簧越硬，单位为N/m
 - damping (number): 阻尼系数，数值越大阻尼越强，用于减少振荡
 
+可选参数：
+- name (string): 关节名称，默认自动命名为 物体1_物体2_spring
+
 注意事项：
 - 弹簧会尝试保持rest_length（默认50像素）的长度
 - 刚度值建议范围：100-10000
@@ -154,7 +213,8 @@ JSON格式示例：{"body1_name": "ball1", "body2_name": "ball2", "anchor1": [0,
                     body1_name=params["body1_name"],
                     body2_name=params["body2_name"],
                     anchor1=tuple(params["anchor1"]),
-                    anchor2=tuple(params["anchor2"])
+                    anchor2=tuple(params["anchor2"]),
+                    name=params.get("name")
                 )
             except Exception as e:
                 raise Exception(f"创建刚性连接时出错: {str(e)}")
@@ -168,6 +228,9 @@ JSON格式示例：{"body1_name": "ball1", "body2_name": "ball2", "anchor1": [0,
 - anchor1 (array): 第一个物体上的连接点 [x, y]，相对于物体中心
 - anchor2 (array): 第二个物体上的连接点 [x, y]，相对于物体中心
 
+可选参数：
+- name (string): 关节名称，默认自动命名为 物体1_物体2_pin
+
 注意事项：
 - 这种连接就像用钉子将两个物体钉在一起，它们会保持相对位置不变
 - 两个物体会一起移动和旋转，但连接点之间的距离和角度保持不变
@@ -475,6 +538,53 @@ JSON格式示例：{"name": "slope1", "start_point": [100, 300], "end_point": [5
             func=create_slope_wrapper
         )
     
+    def _create_terrain_tool(self) -> Tool:
+        """创建折线地形工具"""
+        def create_terrain_wrapper(input_str: dict) -> str:
+            try:
+                params = input_str
+                points = params.get("points")
+                return self.sandbox.create_terrain(
+                    name=params["name"],
+                    points=[tuple(point) for point in points] if points is not None else None,
+                    heights=params.get("heights"),
+                    start_x=params.get("start_x", 0.0),
+                    spacing=params.get("spacing", 50.0),
+                    smoothing=params.get("smoothing", 0),
+                    thickness=params.get("thickness", 5.0),
+                    friction=params.get("friction", 0.7),
+                    elasticity=params.get("elasticity", 0.3)
+                )
+            except Exception as e:
+                raise Exception(f"创建地形时出错: {str(e)}")
+
+        return Tool(
+            name="create_terrain",
+            description="""创建由多段线段首尾相接组成的静态折线地形（轨道、起伏路面、多段坡道、U形槽等），整条地形作为一个物体。
+必需参数：
+- name (string): 地形的唯一名称
+- points (array) 或 heights (array): 二选一
+  - points: 折线顶点列表 [[x1, y1], [x2, y2], ...]，至少两个顶点
+  - heights: 高度场 [y1, y2, ...]，第i个顶点为 [start_x + i * spacing, heights[i]]
+
+可选参数：
+- start_x (number): 高度场第一个顶点的x坐标，默认为0
+- spacing (number): 高度场相邻顶点的水平间距，默认为50
+- smoothing (number): 圆角平滑次数，默认为0；1-3可以把折线的尖角变得圆滑，每次平滑线段数约翻倍
+- thickness (number): 线段厚度，默认为5
+- friction (number): 摩擦系数，默认为0.7
+- elasticity (number): 弹性系数，默认为0.3
+
+注意事项：
+- 由多段组成的路面、坡道和轨道应使用本工具，而不是多次调用create_ground或create_slope
+- 相邻线段的连接处经过平滑处理，物体滚过接缝时不会被卡住
+- 注意Pymunk使用y轴向下为正的坐标系统，heights越大位置越低
+- 使用remove_body并传入地形名称可以删除整条地形
+
+JSON格式示例：{"name": "track", "points": [[0, 300], [200, 400], [400, 420], [600, 350]], "smoothing": 2}""",
+            func=create_terrain_wrapper
+        )
+    
     def _create_duplicate_body_tool(self) -> Tool:
         """创建复制物体工具"""
         def duplicate_body_wrapper(input_str: dict) -> str:
@@ -509,6 +619,99 @@ JSON格式示例：{"original_name": "ball1", "count": 3, "offset": [60, 0]}""",
             func=duplicate_body_wrapper
         )
     
+    def _create_bodies_tool(self) -> Tool:
+        """创建批量创建物体工具"""
+        def create_bodies_wrapper(input_str: dict) -> str:
+            try:
+                params = input_str
+                positions = params.get("positions")
+                return self.sandbox.create_bodies(
+                    name_prefix=params["name_prefix"],
+                    shape=params.get("shape", "circle"),
+                    positions=[tuple(position) for position in positions] if positions is not None else None,
+                    layout=params.get("layout"),
+                    size=params.get("size", 10),
+                    mass=params.get("mass", 1.0),
+                    is_static=params.get("is_static", False),
+                    friction=params.get("friction", 0.7),
+                    elasticity=params.get("elasticity", 0.3)
+                )
+            except Exception as e:
+                raise Exception(f"批量创建物体时出错: {str(e)}")
+
+        return Tool(
+            name="create_bodies",
+            description="""一次性批量创建多个圆形或矩形物体，适合金字塔、方块堆、球堆、网格阵列等包含大量物体的场景，比逐个创建快得多。
+必需参数：
+- name_prefix (string): 名称前缀，物体依次命名为 前缀_1、前缀_2...
+- positions (array) 或 layout (object): 二选一
+  - positions: 位置列表 [[x1, y1], [x2, y2], ...]
+  - layout: 布局描述，type 可选：
+    - "grid": {"type": "grid", "origin": [x, y], "rows": 行数, "columns": 列数, "spacing": [dx, dy]}，origin为左上角物体位置
+    - "array": {"type": "array", "start": [x, y], "count": 数量, "offset": [dx, dy]}，沿偏移方向排成一列
+    - "pyramid": {"type": "pyramid", "base_center": [x, y], "levels": 层数, "spacing": [dx, dy]}，底层levels个物体，每往上一层少一个
+    - "random": {"type": "random", "count": 数量, "bounds": [x_min, y_min, x_max, y_max], "seed": 随机种子}
+
+可选参数：
+- shape (string): "circle" 或 "box"，默认为"circle"
+- size: 圆形为半径(number)，矩形为[width, height]，默认为10；也可以传入与物体数量等长的列表为每个物体单独指定
+- mass: 质量(number)，默认为1.0；也可以传入与物体数量等长的列表
+- is_static (boolean): 是否为静态物体，默认为false
+- friction (number): 摩擦系数，默认为0.7
+- elasticity (number): 弹性系数，默认为0.3
+
+注意事项：
+- 注意Pymunk使用y轴向下为正的坐标系统，金字塔从base_center向上（y减小）堆叠
+- 堆叠物体时，spacing应略大于物体尺寸，避免初始重叠
+- 任一名称已存在时操作会失败，不会创建任何物体
+
+JSON格式示例：{"name_prefix": "brick", "shape": "box", "layout": {"type": "pyramid", "base_center": [400, 480], "levels": 5, "spacing": [42, 20]}, "size": [40, 20], "mass": 2}""",
+            func=create_bodies_wrapper
+        )
+    
+    def _create_particle_field_tool(self) -> Tool:
+        """创建粒子场工具"""
+        def create_particle_field_wrapper(input_str: dict) -> str:
+            try:
+                params = input_str
+                positions = params.get("positions")
+                return self.sandbox.create_particle_field(
+                    name=params["name"],
+                    positions=[tuple(position) for position in positions] if positions is not None else None,
+                    layout=params.get("layout"),
+                    radius=params.get("radius", 3.0),
+                    particle_mass=params.get("particle_mass", 0.1),
+                    friction=params.get("friction", 0.5),
+                    elasticity=params.get("elasticity", 0.0)
+                )
+            except Exception as e:
+                raise Exception(f"创建粒子场时出错: {str(e)}")
+
+        return Tool(
+            name="create_particle_field",
+            description="""创建粒子场：由成百上千个同尺寸小圆组成的整体，用于模拟沙子、弹珠、流体等颗粒物质。
+必需参数：
+- name (string): 粒子场的唯一名称
+- positions (array) 或 layout (object): 二选一，格式与 create_bodies 相同
+  - 常用 {"type": "grid", "origin": [x, y], "rows": 行数, "columns": 列数, "spacing": [dx, dy]} 或
+    {"type": "random", "count": 数量, "bounds": [x_min, y_min, x_max, y_max], "seed": 随机种子}
+
+可选参数：
+- radius (number): 粒子半径，默认为3
+- particle_mass (number): 单个粒子的质量，默认为0.1
+- friction (number): 摩擦系数，默认为0.5（沙子可取0.6-0.9，流体可取0-0.1）
+- elasticity (number): 弹性系数，默认为0（弹珠可取0.3-0.5）
+
+注意事项：
+- 粒子不会单独命名，沙盒状态中以聚合统计（数量、质心、包围盒、平均速度、水平位置和速度分布直方图）描述整个粒子场
+- grid布局的spacing应略大于粒子直径，避免初始重叠
+- 使用remove_body并传入粒子场名称可以删除整个粒子场
+- 粒子数量建议不超过5000，数量越多模拟越慢
+
+JSON格式示例：{"name": "sand", "layout": {"type": "grid", "origin": [300, 100], "rows": 30, "columns": 40, "spacing": [7, 7]}, "radius": 3, "friction": 0.8}""",
+            func=create_particle_field_wrapper
+        )
+    
     def _create_car_tool(self) -> Tool:
         """创建小车工具"""
         def create_car_wrapper(input_str: dict) -> str:
@@ -545,7 +748,7 @@ JSON格式示例：{"original_name": "ball1", "count": 3, "offset": [60, 0]}""",
 - 车身具有中等摩擦系数(0.7)和低弹性系数(0.1)
 - 在设置小车位置时，需要为车身下的轮子留出足够空间
 - 建议小车位置y坐标至少比地面高30-50像素，确保轮子不嵌入地面
-- 小车创建后，轮子会自动命名为：小车名_wheel1、小车名_wheel2
+- 小车创建后，轮子会自动命名为：小车名_wheel1、小车名_wheel2，连接轮子的关节命名为：小车名_joint1、小车名_joint2
 
 JSON格式示例：{"name": "car1", "position": [200, 100], "chassis_size": [60, 25], "wheel_radius": 12, "chassis_mass": 15, "wheel_mass": 3}""",
             func=create_car_wrapper
@@ -560,7 +763,8 @@ JSON格式示例：{"name": "car1", "position": [200, 100], "chassis_size": [60,
                     body1_name=params["body1_name"],
                     body2_name=params["body2_name"],
                     anchor1=tuple(params["anchor1"]),
-                    anchor2=tuple(params["anchor2"])
+                    anchor2=tuple(params["anchor2"]),
+                    name=params.get("name")
                 )
             except Exception as e:
                 raise Exception(f"创建枢轴关节时出错: {str(e)}")
@@ -574,6 +778,9 @@ JSON格式示例：{"name": "car1", "position": [200, 100], "chassis_size": [60,
 - anchor1 (array): 第一个物体上的锚点 [x, y]，相对于物体中心
 - anchor2 (array): 第二个物体上的锚点 [x, y]，相对于物体中心
 
+可选参数：
+- name (string): 关节名称，默认自动命名为 物体1_物体2_pivot
+
 注意事项：
 - 枢轴关节允许两个物体围绕共同的锚点自由旋转
 - 适用于创建铰链、车轮、摆锤等需要旋转的连接
@@ -584,6 +791,60 @@ JSON格式示例：{"body1_name": "wheel1", "body2_name": "chassis1", "anchor1":
             func=add_pivot_joint_wrapper
         )
     
+    def _create_remove_constraint_tool(self) -> Tool:
+        """创建删除约束工具"""
+        def remove_constraint_wrapper(input_str: dict) -> str:
+            try:
+                params = input_str
+                return self.sandbox.remove_constraint(params["constraint_name"])
+            except Exception as e:
+                raise Exception(f"删除约束时出错: {str(e)}")
+
+        return Tool(
+            name="remove_constraint",
+            description="""删除指定的关节或约束（弹簧、刚性连接、枢轴关节等），两端的物体保持不变。
+必需参数：
+- constraint_name (string): 要删除的约束名称
+
+注意事项：
+- 约束名称在创建关节时返回，也可以从沙盒状态的constraints列表中查看
+- 小车的轮子关节名称为：小车名_joint1、小车名_joint2
+- 删除物体时与其相连的约束会自动删除，无需单独调用本工具
+
+JSON格式示例：{"constraint_name": "ball1_ball2_spring"}""",
+            func=remove_constraint_wrapper
+        )
+    
+    def _create_set_sleeping_tool(self) -> Tool:
+        """创建设置物体休眠工具"""
+        def set_sleeping_wrapper(input_str: dict) -> str:
+            try:
+                params = input_str
+                return self.sandbox.set_sleeping(
+                    sleep_time_threshold=params.get("sleep_time_threshold"),
+                    idle_speed_threshold=params.get("idle_speed_threshold", 0.0)
+                )
+            except Exception as e:
+                raise Exception(f"设置物体休眠时出错: {str(e)}")
+        
+        return Tool(
+            name="set_sleeping",
+            description="""开启或关闭物体休眠。开启后，静止一段时间的物体会进入休眠，不再参与物理计算，被碰撞或施加冲量/力、设置位置或速度时自动唤醒。
+必需参数：
+- sleep_time_threshold (number): 物体保持静止多少秒后进入休眠，建议0.5-1.0；设置为0或null表示关闭休眠
+
+可选参数：
+- idle_speed_threshold (number): 速度低于该值视为静止，单位为像素/秒，默认为0表示根据重力自动估计
+
+注意事项：
+- 适用于大量物体最终会静止的场景（如堆叠、停放在地面上的小车），可以显著加快模拟和稳定判断
+- 所有动态物体都休眠时，模拟会立即判定为已稳定
+- 休眠物体在沙盒状态中只显示位置等简要信息
+
+JSON格式示例：{"sleep_time_threshold": 0.5, "idle_speed_threshold": 0}""",
+            func=set_sleeping_wrapper
+        )
+    
     def get_tools_description(self) -> List[str]:
         """获取所有工具描述列表"""
         return [f"tool_name: {tool.name}, tool_description: {tool.description}" for tool in self.tools]
@@ -592,6 +853,6 @@ JSON格式示例：{"body1_name": "wheel1", "body2_name": "chassis1", "anchor1":
         """获取所有工具列表 (工具对象列表) """
         return self.tools
     
-    def get_sandbox_status(self) -> PhysicsSandbox:
-        """获取物理沙盒状态"""
-        return self.sandbox.get_space_status()
+    def get_sandbox_status(self, since_version: Optional[int] = None) -> dict:
+        """获取物理沙盒状态，沙盒未变化时复用缓存；提供 since_version 时返回相对该版本的增量"""
+        return self.sandbox.get_space_status(since_version)
@@ -0,0 +1,129 @@
+"""
+模拟结果缓存
+以场景内容哈希和模拟参数为键缓存 get_simulation_sequence 的结果：内存中保留最近使用的若干条（LRU），
+可选的磁盘层按键保存为 pickle 文件，在进程重启后继续命中
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import pickle
+from collections import OrderedDict
+from typing import Optional
+
+from physics_sandbox import PhysicsSandbox
+
+
+# 缓存结果的格式版本，get_simulation_sequence 的输出格式变化时递增，使磁盘上旧格式的结果不再命中
+CACHE_FORMAT_VERSION = 1
+
+# get_simulation_sequence 的参数签名，用于补全默认值，使省略参数与显式传入默认值得到相同的键
+_SEQUENCE_SIGNATURE = inspect.signature(PhysicsSandbox.get_simulation_sequence)
+
+
+class RolloutCache:
+    """
+    get_simulation_sequence 结果的两级缓存
+
+    命中时直接返回缓存的结果对象（不复制），调用方不应修改返回值。
+    """
+
+    def __init__(self, max_entries: int = 32, cache_dir: Optional[str] = None):
+        """
+        初始化模拟结果缓存
+
+        Args:
+            max_entries: 内存中保留的最大条目数
+            cache_dir: 磁盘缓存目录，None表示只使用内存缓存
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(sandbox: PhysicsSandbox, **options) -> str:
+        """
+        计算缓存键：缓存格式版本、场景内容哈希加上补全默认值后的模拟参数
+
+        Args:
+            sandbox: 要模拟的沙盒
+            **options: 传给 get_simulation_sequence 的参数
+
+        Returns:
+            十六进制字符串
+        """
+        bound = _SEQUENCE_SIGNATURE.bind(sandbox, **options)
+        bound.apply_defaults()
+        arguments = {name: value for name, value in bound.arguments.items() if name != "self"}
+        digest = hashlib.blake2b(f"v{CACHE_FORMAT_VERSION}:".encode("utf-8"), digest_size=16)
+        digest.update(sandbox.content_hash().encode("utf-8"))
+        digest.update(json.dumps(arguments, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[dict]:
+        """按键查找结果，内存未命中时查找磁盘缓存并放回内存，都未命中时返回None"""
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+            return result
+        if self.cache_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), "rb") as f:
+                    result = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None
+            self._remember(key, result)
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """保存结果，启用磁盘缓存时同时写入磁盘"""
+        self._remember(key, result)
+        if self.cache_dir:
+            # 先写临时文件再改名，避免并发读取到写了一半的文件
+            temp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, self._path(key))
+
+    def _remember(self, key: str, result: dict) -> None:
+        """放入内存缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空内存缓存（磁盘缓存保留）"""
+        self._entries.clear()
+
+    def simulate(self, sandbox: PhysicsSandbox, **options) -> dict:
+        """
+        带缓存的 get_simulation_sequence：内容与参数都相同的模拟直接返回缓存的结果
+
+        Args:
+            sandbox: 要模拟的沙盒（模拟在分叉出的副本上进行，沙盒本身不受影响）
+            **options: 传给 get_simulation_sequence 的参数
+
+        Returns:
+            get_simulation_sequence 的结果
+        """
+        key = self.make_key(sandbox, **options)
+        result = self.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.misses += 1
+        result = sandbox.get_simulation_sequence(**options)
+        self.put(key, result)
+        return result
@@ -0,0 +1,158 @@
+"""
+多进程并行模拟服务
+把多个沙盒快照（或一个快照加多组参数扰动）分发到工作进程中并行执行 get_simulation_sequence，
+探索多个场景变体的耗时随CPU核数而不是变体数量增长
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from physics_sandbox import PhysicsSandbox
+from sandbox_snapshot import SandboxSnapshot
+
+
+# 参数扰动中可以通过 set_body_properties 修改的物体属性
+PERTURBABLE_PROPERTIES = ("mass", "friction", "elasticity", "velocity", "angular_velocity")
+
+
+def apply_perturbation(sandbox: PhysicsSandbox, perturbation: dict) -> List[str]:
+    """
+    把一组参数扰动应用到沙盒上
+
+    Args:
+        sandbox: 目标沙盒
+        perturbation: 扰动描述，包括：
+            - gravity: 重力向量 (x, y)，可选
+            - bodies: {物体名称: {属性: 值}}，属性可以是 position 或 PERTURBABLE_PROPERTIES 中的任意一项
+
+    Returns:
+        应用过程中产生的错误信息列表
+    """
+    errors = []
+    if "gravity" in perturbation:
+        sandbox.set_gravity(tuple(perturbation["gravity"]))
+    for body_name, properties in perturbation.get("bodies", {}).items():
+        messages = []
+        if "position" in properties:
+            messages.append(sandbox.set_position(body_name, tuple(properties["position"])))
+        unknown = set(properties) - set(PERTURBABLE_PROPERTIES) - {"position"}
+        if unknown:
+            errors.append(f"错误：物体'{body_name}'不支持扰动属性{sorted(unknown)}。")
+        updates = {key: value for key, value in properties.items() if key in PERTURBABLE_PROPERTIES}
+        if updates:
+            messages.append(sandbox.set_body_properties(body_name, **updates))
+        errors.extend(message for message in messages if message.startswith("错误"))
+    return errors
+
+
+def _run_variant(task: tuple) -> dict:
+    """工作进程入口：恢复快照、应用扰动并执行一次模拟"""
+    index, snapshot, perturbation, options = task
+    start = time.perf_counter()
+    errors = []
+    result = None
+    # 单个变体出错时只记录到该变体的 errors 中，不影响同一批次的其他变体
+    try:
+        sandbox = PhysicsSandbox()
+        sandbox.restore(snapshot)
+        if perturbation:
+            errors.extend(apply_perturbation(sandbox, perturbation))
+        result = sandbox.get_simulation_sequence(output_format="compact", **options)
+    except Exception as e:
+        errors.append(f"错误：变体{index}执行失败：{type(e).__name__}: {e}")
+    convergence = result["convergence_info"] if result is not None else {}
+    return {
+        "variant": index,
+        "perturbation": perturbation,
+        "errors": errors,
+        "metrics": {
+            "converged": convergence.get("converged", False),
+            "convergence_step": convergence.get("convergence_step"),
+            "total_steps": result["metadata"]["total_steps"] if result is not None else 0,
+            "final_kinetic_energy": convergence.get("final_kinetic_energy"),
+            "wall_time": time.perf_counter() - start
+        },
+        "trajectory": result
+    }
+
+
+class RolloutService:
+    """
+    并行模拟服务
+
+    工作进程池在第一次需要时创建并在多次调用之间复用；只有一个变体或 max_workers 为1时在当前进程中执行。
+    快照通过 pickle 传给工作进程，任务按变体顺序返回。
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化并行模拟服务
+
+        Args:
+            max_workers: 工作进程数，默认等于CPU核数
+        """
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "RolloutService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """关闭工作进程池"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def run(self, snapshots: Sequence[SandboxSnapshot], perturbations: Optional[Sequence[dict]] = None,
+            **options) -> List[dict]:
+        """
+        并行模拟多个场景变体
+
+        Args:
+            snapshots: 沙盒快照列表；只有一个快照时与 perturbations 中的每一组扰动组合
+            perturbations: 每个变体的参数扰动（格式见 apply_perturbation），None表示不扰动
+            **options: 传给 get_simulation_sequence 的参数（output_format 固定为 compact）
+
+        Returns:
+            按变体顺序排列的结果列表，每项包括：
+            - variant: 变体序号
+            - perturbation: 应用的参数扰动
+            - errors: 应用扰动或执行模拟时产生的错误信息
+            - metrics: 收敛与耗时指标
+            - trajectory: compact 格式的模拟序列，执行失败时为None
+        """
+        options.pop("output_format", None)
+        if perturbations is None:
+            perturbations = [None] * len(snapshots)
+        elif len(snapshots) == 1:
+            snapshots = list(snapshots) * len(perturbations)
+        if len(snapshots) != len(perturbations):
+            raise ValueError(f"快照数量({len(snapshots)})与扰动数量({len(perturbations)})不一致")
+
+        tasks = [(index, snapshot, perturbation, options)
+                 for index, (snapshot, perturbation) in enumerate(zip(snapshots, perturbations))]
+        if self.max_workers == 1 or len(tasks) <= 1:
+            return [_run_variant(task) for task in tasks]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return list(self._executor.map(_run_variant, tasks))
+
+    def run_perturbations(self, sandbox: PhysicsSandbox, perturbations: Sequence[dict],
+                          **options) -> List[dict]:
+        """
+        以沙盒当前状态为基准，并行模拟多组参数扰动，沙盒本身不受影响
+
+        Args:
+            sandbox: 基准沙盒
+            perturbations: 每个变体的参数扰动
+            **options: 传给 get_simulation_sequence 的参数
+
+        Returns:
+            与 run 相同格式的结果列表
+        """
+        return self.run([sandbox.snapshot()], perturbations, **options)
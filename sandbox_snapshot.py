@@ -0,0 +1,171 @@
+"""
+物理空间的快速克隆与快照
+逐个对象重建空间，代替 copy.deepcopy 的 pickle 往返，并返回新旧对象的映射用于重映射名称登记表
+"""
+
+import copy
+from typing import Dict, List, Optional, Tuple
+
+import pymunk
+
+from particle_field import ParticleField
+
+
+# 需要在克隆中复制的空间、物体、形状和约束属性
+SPACE_ATTRS = ("iterations", "gravity", "damping", "idle_speed_threshold", "sleep_time_threshold",
+               "collision_slop", "collision_bias", "collision_persistence")
+BODY_ATTRS = ("center_of_gravity", "position", "angle", "velocity", "angular_velocity", "force", "torque")
+SHAPE_ATTRS = ("friction", "elasticity", "collision_type", "filter", "sensor", "surface_velocity")
+CONSTRAINT_ATTRS = ("max_force", "error_bias", "max_bias", "collide_bodies")
+
+ObjectMap = Dict[object, object]
+
+# Chipmunk多线程求解器支持的最大线程数
+MAX_THREADS = 2
+
+
+def _clone_body(body: pymunk.Body) -> pymunk.Body:
+    """按类型重建物体并复制运动状态"""
+    if body.body_type == pymunk.Body.STATIC:
+        new_body = pymunk.Body(body_type=pymunk.Body.STATIC)
+    elif body.body_type == pymunk.Body.KINEMATIC:
+        new_body = pymunk.Body(body_type=pymunk.Body.KINEMATIC)
+    else:
+        new_body = pymunk.Body(body.mass, body.moment)
+    for attr in BODY_ATTRS:
+        setattr(new_body, attr, getattr(body, attr))
+    return new_body
+
+
+def _clone_shape(shape: pymunk.Shape, body: pymunk.Body) -> pymunk.Shape:
+    """在新物体上重建形状，不支持的类型返回None"""
+    if isinstance(shape, pymunk.Circle):
+        new_shape = pymunk.Circle(body, shape.radius, shape.offset)
+    elif isinstance(shape, pymunk.Poly):
+        new_shape = pymunk.Poly(body, shape.get_vertices(), radius=shape.radius)
+    elif isinstance(shape, pymunk.Segment):
+        new_shape = pymunk.Segment(body, shape.a, shape.b, shape.radius)
+    else:
+        return None
+    for attr in SHAPE_ATTRS:
+        setattr(new_shape, attr, getattr(shape, attr))
+    if shape.mass:
+        # 形状自带质量时物体质量由形状推导
+        new_shape.mass = shape.mass
+    return new_shape
+
+
+def _clone_constraint(constraint: pymunk.Constraint, a: pymunk.Body, b: pymunk.Body) -> pymunk.Constraint:
+    """在新物体之间重建约束，不支持的类型返回None"""
+    if isinstance(constraint, pymunk.DampedSpring):
+        new_constraint = pymunk.DampedSpring(a, b, constraint.anchor_a, constraint.anchor_b,
+                                             constraint.rest_length, constraint.stiffness, constraint.damping)
+    elif isinstance(constraint, pymunk.PinJoint):
+        new_constraint = pymunk.PinJoint(a, b, constraint.anchor_a, constraint.anchor_b)
+        new_constraint.distance = constraint.distance
+    elif isinstance(constraint, pymunk.PivotJoint):
+        new_constraint = pymunk.PivotJoint(a, b, constraint.anchor_a, constraint.anchor_b)
+    else:
+        return None
+    for attr in CONSTRAINT_ATTRS:
+        setattr(new_constraint, attr, getattr(constraint, attr))
+    return new_constraint
+
+
+def _deepcopy_space(space: pymunk.Space) -> Tuple[pymunk.Space, ObjectMap]:
+    """后备方案：deepcopy 整个空间，并借助同一个memo得到新旧对象映射"""
+    originals = [*space.bodies, *space.shapes, *space.constraints]
+    copied, copies = copy.deepcopy((space, originals))
+    return copied, dict(zip(originals, copies))
+
+
+def new_space(threads: int = 1) -> pymunk.Space:
+    """
+    创建物理空间，threads 大于1时使用多线程求解器
+
+    Chipmunk的多线程求解器最多使用2个线程，且在Windows上不可用（此时退回单线程空间）。
+    """
+    space = pymunk.Space(threaded=threads > 1)
+    if space.threaded:
+        space.threads = min(threads, MAX_THREADS)
+    return space
+
+
+def clone_space(space: pymunk.Space, threads: Optional[int] = None) -> Tuple[pymunk.Space, ObjectMap]:
+    """
+    克隆物理空间
+
+    Args:
+        space: 原始空间
+        threads: 新空间的求解线程数，默认与原空间相同
+
+    Returns:
+        (新空间, 原对象 -> 新对象 的映射)，映射覆盖物体、形状和约束。
+        空间中出现不支持的形状或约束类型时退回 deepcopy，结果等价（此时保持原空间的线程设置）。
+    """
+    cloned = new_space(space.threads if threads is None else threads)
+    for attr in SPACE_ATTRS:
+        setattr(cloned, attr, getattr(space, attr))
+
+    mapping: ObjectMap = {}
+    for body in space.bodies:
+        mapping[body] = _clone_body(body)
+    # 挂在空间内置静态物体上的形状映射到新空间的内置静态物体
+    mapping[space.static_body] = cloned.static_body
+
+    for shape in space.shapes:
+        new_shape = _clone_shape(shape, mapping[shape.body])
+        if new_shape is None:
+            return _deepcopy_space(space)
+        mapping[shape] = new_shape
+
+    for constraint in space.constraints:
+        new_constraint = _clone_constraint(constraint, mapping[constraint.a], mapping[constraint.b])
+        if new_constraint is None:
+            return _deepcopy_space(space)
+        mapping[constraint] = new_constraint
+
+    del mapping[space.static_body]
+    cloned.add(*mapping.values())
+    _copy_sleep_state(space, mapping)
+    return cloned, mapping
+
+
+def _copy_sleep_state(space: pymunk.Space, mapping: ObjectMap) -> None:
+    """让克隆中对应的物体保持休眠，通过约束相连的休眠物体放入同一个休眠组"""
+    if space.sleep_time_threshold == float("inf"):
+        return
+    sleeping = {body for body in space.bodies if body.body_type == pymunk.Body.DYNAMIC and body.is_sleeping}
+    while sleeping:
+        root = sleeping.pop()
+        mapping[root].sleep()
+        # 沿约束遍历同组的休眠物体
+        pending = [root]
+        while pending:
+            body = pending.pop()
+            for constraint in body.constraints:
+                other = constraint.b if constraint.a is body else constraint.a
+                if other in sleeping:
+                    sleeping.remove(other)
+                    mapping[other].sleep_with_group(mapping[root])
+                    pending.append(other)
+
+
+class SandboxSnapshot:
+    """
+    物理沙盒的不可变快照
+
+    持有一份私有的空间克隆及按名称登记的物体、形状、粒子场、地形和约束，恢复时会再克隆一次，
+    因此同一个快照可以被多次恢复或分叉。
+    """
+
+    def __init__(self, space: pymunk.Space, bodies: Dict[str, pymunk.Body], shapes: Dict[str, pymunk.Shape],
+                 particle_fields: Optional[Dict[str, ParticleField]] = None,
+                 terrains: Optional[Dict[str, List[pymunk.Segment]]] = None,
+                 constraints: Optional[Dict[str, pymunk.Constraint]] = None):
+        self.space = space
+        self.bodies = bodies
+        self.shapes = shapes
+        self.particle_fields = particle_fields or {}
+        self.terrains = terrains or {}
+        self.constraints = constraints or {}
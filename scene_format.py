@@ -0,0 +1,412 @@
+"""
+场景文件格式
+把沙盒（或快照）中的物体、形状、约束、名称登记表、材料属性和空间参数保存为带版本号的场景文件，
+并从文件重建空间。数据按列存储为数组：.npz 为二进制变体（np.savez，不压缩以保证读写速度），
+.json 为文本变体，两者内容完全相同
+"""
+
+import gc
+import hashlib
+import json
+import os
+from itertools import chain
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pymunk
+
+from particle_field import ParticleField
+from sandbox_snapshot import SPACE_ATTRS, SandboxSnapshot, new_space
+
+
+FORMAT_NAME = "pymunk-sandbox-scene"
+# 格式版本号，读取时拒绝比当前版本新的文件
+FORMAT_VERSION = 1
+
+# 物体、形状、约束的类型编码
+BODY_TYPES = (pymunk.Body.DYNAMIC, pymunk.Body.KINEMATIC, pymunk.Body.STATIC)
+SHAPE_KINDS = (pymunk.Circle, pymunk.Poly, pymunk.Segment)
+CONSTRAINT_KINDS = (pymunk.DampedSpring, pymunk.PinJoint, pymunk.PivotJoint)
+# 新建物体和形状的默认属性值（tolist 后的形式），读取时跳过等于默认值的赋值
+ZERO = [0.0, 0.0]
+DEFAULT_FILTER = list(pymunk.ShapeFilter())
+
+# 列名 -> (dtype, 单行形状)，空数组读取时按单行形状恢复维度
+ARRAY_SCHEMA = {
+    "body_type": (np.int8, ()),
+    "body_mass": (np.float64, ()),
+    "body_moment": (np.float64, ()),
+    "body_center_of_gravity": (np.float64, (2,)),
+    "body_position": (np.float64, (2,)),
+    "body_angle": (np.float64, ()),
+    "body_velocity": (np.float64, (2,)),
+    "body_angular_velocity": (np.float64, ()),
+    "shape_kind": (np.int8, ()),
+    # 形状所属物体的序号，-1表示空间内置的静态物体
+    "shape_body": (np.int32, ()),
+    "shape_radius": (np.float64, ()),
+    # 圆的偏移或线段起点 / 线段终点
+    "shape_a": (np.float64, (2,)),
+    "shape_b": (np.float64, (2,)),
+    # 多边形顶点：shape_vertex_offsets[i]:shape_vertex_offsets[i + 1] 为第i个形状的顶点
+    "shape_vertex_offsets": (np.int32, ()),
+    "shape_vertices": (np.float64, (2,)),
+    "shape_mass": (np.float64, ()),
+    "shape_friction": (np.float64, ()),
+    "shape_elasticity": (np.float64, ()),
+    "shape_collision_type": (np.int64, ()),
+    "shape_filter": (np.int64, (3,)),
+    "shape_sensor": (np.bool_, ()),
+    "shape_surface_velocity": (np.float64, (2,)),
+    "constraint_kind": (np.int8, ()),
+    "constraint_a": (np.int32, ()),
+    "constraint_b": (np.int32, ()),
+    "constraint_anchor_a": (np.float64, (2,)),
+    "constraint_anchor_b": (np.float64, (2,)),
+    # 弹簧的静止长度、刚度、阻尼；销关节的距离存放在 constraint_rest_length 中
+    "constraint_rest_length": (np.float64, ()),
+    "constraint_stiffness": (np.float64, ()),
+    "constraint_damping": (np.float64, ()),
+    "constraint_max_force": (np.float64, ()),
+    "constraint_error_bias": (np.float64, ()),
+    "constraint_max_bias": (np.float64, ()),
+    "constraint_collide_bodies": (np.bool_, ()),
+}
+
+
+def _column(values: list, key: str) -> np.ndarray:
+    """按 ARRAY_SCHEMA 把列表转为数组，二维列先展平再 fromiter"""
+    dtype, tail = ARRAY_SCHEMA[key]
+    if tail:
+        return np.fromiter(chain.from_iterable(values), dtype=dtype,
+                           count=len(values) * tail[0]).reshape(-1, *tail)
+    return np.fromiter(values, dtype=dtype, count=len(values))
+
+
+def _scene_format(path: str, format: Optional[str]) -> str:
+    """根据显式参数或文件扩展名确定场景文件变体"""
+    format = format or ("json" if path.endswith(".json") else "npz")
+    if format not in ("npz", "json"):
+        raise ValueError(f"不支持的场景文件格式'{format}'")
+    return format
+
+
+def encode_scene(source, settings: Optional[dict] = None) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    把沙盒或快照编码为元数据和按列存储的数组
+
+    Args:
+        source: PhysicsSandbox 或 SandboxSnapshot
+        settings: 随场景保存的附加设置（如宽相位配置），原样写入元数据
+
+    Returns:
+        (元数据, 数组字典)
+    """
+    space = source.space
+    bodies = list(space.bodies)
+    shapes = list(space.shapes)
+    constraints = list(space.constraints)
+    body_index = {body: index for index, body in enumerate(bodies)}
+    body_index[space.static_body] = -1
+    shape_index = {shape: index for index, shape in enumerate(shapes)}
+    constraint_index = {constraint: index for index, constraint in enumerate(constraints)}
+
+    columns = {
+        "body_type": [BODY_TYPES.index(body.body_type) for body in bodies],
+        "body_mass": [body.mass for body in bodies],
+        "body_moment": [body.moment for body in bodies],
+        "body_center_of_gravity": [body.center_of_gravity for body in bodies],
+        "body_position": [body.position for body in bodies],
+        "body_angle": [body.angle for body in bodies],
+        "body_velocity": [body.velocity for body in bodies],
+        "body_angular_velocity": [body.angular_velocity for body in bodies],
+    }
+
+    shape_columns = {key: [] for key in ARRAY_SCHEMA if key.startswith("shape_")}
+    shape_columns["shape_vertex_offsets"].append(0)
+    for shape in shapes:
+        kind = next((index for index, cls in enumerate(SHAPE_KINDS) if isinstance(shape, cls)), None)
+        if kind is None:
+            raise ValueError(f"场景中存在不支持保存的形状类型{type(shape).__name__}")
+        a = b = (0.0, 0.0)
+        vertices = []
+        if kind == 0:
+            a = shape.offset
+        elif kind == 1:
+            vertices = shape.get_vertices()
+            # 重建多边形时凸包的起始顶点会变化，从最小顶点开始保存，使同一几何形状的编码唯一
+            start = vertices.index(min(vertices, key=tuple))
+            vertices = vertices[start:] + vertices[:start]
+        else:
+            a, b = shape.a, shape.b
+        shape_columns["shape_kind"].append(kind)
+        shape_columns["shape_body"].append(body_index[shape.body])
+        shape_columns["shape_radius"].append(shape.radius)
+        shape_columns["shape_a"].append(a)
+        shape_columns["shape_b"].append(b)
+        shape_columns["shape_vertices"].extend(vertices)
+        shape_columns["shape_vertex_offsets"].append(len(shape_columns["shape_vertices"]))
+        shape_columns["shape_mass"].append(shape.mass)
+        shape_columns["shape_friction"].append(shape.friction)
+        shape_columns["shape_elasticity"].append(shape.elasticity)
+        shape_columns["shape_collision_type"].append(shape.collision_type)
+        shape_columns["shape_filter"].append(tuple(shape.filter))
+        shape_columns["shape_sensor"].append(shape.sensor)
+        shape_columns["shape_surface_velocity"].append(shape.surface_velocity)
+    columns.update(shape_columns)
+
+    constraint_columns = {key: [] for key in ARRAY_SCHEMA if key.startswith("constraint_")}
+    for constraint in constraints:
+        kind = next((index for index, cls in enumerate(CONSTRAINT_KINDS) if isinstance(constraint, cls)), None)
+        if kind is None:
+            raise ValueError(f"场景中存在不支持保存的约束类型{type(constraint).__name__}")
+        rest_length = stiffness = damping = 0.0
+        if kind == 0:
+            rest_length, stiffness, damping = constraint.rest_length, constraint.stiffness, constraint.damping
+        elif kind == 1:
+            rest_length = constraint.distance
+        constraint_columns["constraint_kind"].append(kind)
+        constraint_columns["constraint_a"].append(body_index[constraint.a])
+        constraint_columns["constraint_b"].append(body_index[constraint.b])
+        constraint_columns["constraint_anchor_a"].append(constraint.anchor_a)
+        constraint_columns["constraint_anchor_b"].append(constraint.anchor_b)
+        constraint_columns["constraint_rest_length"].append(rest_length)
+        constraint_columns["constraint_stiffness"].append(stiffness)
+        constraint_columns["constraint_damping"].append(damping)
+        constraint_columns["constraint_max_force"].append(constraint.max_force)
+        constraint_columns["constraint_error_bias"].append(constraint.error_bias)
+        constraint_columns["constraint_max_bias"].append(constraint.max_bias)
+        constraint_columns["constraint_collide_bodies"].append(constraint.collide_bodies)
+    columns.update(constraint_columns)
+
+    arrays = {key: _column(values, key) for key, values in columns.items()}
+    space_attrs = {attr: getattr(space, attr) for attr in SPACE_ATTRS}
+    space_attrs["gravity"] = tuple(space.gravity)
+    space_attrs["threads"] = space.threads
+    meta = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "space": space_attrs,
+        "settings": settings or {},
+        "names": {
+            "bodies": {name: body_index[body] for name, body in source.bodies.items()},
+            "shapes": {name: shape_index[shape] for name, shape in source.shapes.items()},
+            "constraints": {name: constraint_index[constraint] for name, constraint in source.constraints.items()},
+            "terrains": {name: [shape_index[segment] for segment in segments]
+                         for name, segments in source.terrains.items()},
+        },
+        # 粒子场只记录名称、半径和粒子物体序号
+        "particle_fields": {
+            name: {"radius": field.radius, "bodies": [body_index[body] for body in field.bodies],
+                   "shapes": [shape_index[shape] for shape in field.shapes]}
+            for name, field in source.particle_fields.items()
+        },
+    }
+    return meta, arrays
+
+
+def decode_scene(meta: dict, arrays: Dict[str, np.ndarray]) -> Tuple[SandboxSnapshot, dict]:
+    """
+    从元数据和数组重建空间及名称登记表
+
+    Args:
+        meta: encode_scene 返回的元数据
+        arrays: encode_scene 返回的数组字典
+
+    Returns:
+        (快照, 附加设置)。快照持有新建的空间，可直接交给沙盒使用
+    """
+    if meta.get("format") != FORMAT_NAME:
+        raise ValueError("不是沙盒场景文件")
+    if meta.get("version", 0) > FORMAT_VERSION:
+        raise ValueError(f"场景文件版本{meta['version']}高于支持的版本{FORMAT_VERSION}")
+    missing = set(ARRAY_SCHEMA) - set(arrays)
+    if missing:
+        raise ValueError(f"场景文件缺少数据列{sorted(missing)}")
+    # 逐对象构建时读取Python标量比读取numpy标量快得多
+    columns = {key: arrays[key].tolist() for key in ARRAY_SCHEMA}
+    # 批量创建的对象都会存活，期间暂停循环垃圾回收，避免反复扫描新对象（约占读取耗时的四成）
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _build_scene(meta, columns)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _build_scene(meta: dict, columns: Dict[str, list]) -> Tuple[SandboxSnapshot, dict]:
+    """按列数据逐个创建物体、形状和约束，并重建名称登记表"""
+
+    space_attrs = dict(meta["space"])
+    space = new_space(space_attrs.pop("threads", 1))
+    for attr in SPACE_ATTRS:
+        if attr in space_attrs:
+            setattr(space, attr, tuple(space_attrs[attr]) if attr == "gravity" else space_attrs[attr])
+
+    bodies = []
+    for body_type, mass, moment, center, position, angle, velocity, angular_velocity in zip(
+            columns["body_type"], columns["body_mass"], columns["body_moment"], columns["body_center_of_gravity"],
+            columns["body_position"], columns["body_angle"], columns["body_velocity"],
+            columns["body_angular_velocity"]):
+        body_type = BODY_TYPES[body_type]
+        if body_type == pymunk.Body.DYNAMIC:
+            body = pymunk.Body(mass, moment)
+            if center != ZERO:
+                body.center_of_gravity = center
+        else:
+            body = pymunk.Body(body_type=body_type)
+        body.position = position
+        # pymunk 的属性赋值带类型检查，开销远大于比较，等于新对象默认值的属性不再赋值
+        if angle:
+            body.angle = angle
+        if velocity != ZERO:
+            body.velocity = velocity
+        if angular_velocity:
+            body.angular_velocity = angular_velocity
+        bodies.append(body)
+    owners = bodies + [space.static_body]
+
+    shapes = []
+    offsets = columns["shape_vertex_offsets"]
+    vertices = columns["shape_vertices"]
+    for index, (kind, owner, radius, a, b, mass) in enumerate(zip(
+            columns["shape_kind"], columns["shape_body"], columns["shape_radius"],
+            columns["shape_a"], columns["shape_b"], columns["shape_mass"])):
+        body = owners[owner]
+        if kind == 0:
+            shape = pymunk.Circle(body, radius, a)
+        elif kind == 1:
+            shape = pymunk.Poly(body, vertices[offsets[index]:offsets[index + 1]], radius=radius)
+        else:
+            shape = pymunk.Segment(body, a, b, radius)
+        shape.friction = columns["shape_friction"][index]
+        shape.elasticity = columns["shape_elasticity"][index]
+        if columns["shape_collision_type"][index]:
+            shape.collision_type = columns["shape_collision_type"][index]
+        if columns["shape_filter"][index] != DEFAULT_FILTER:
+            shape.filter = pymunk.ShapeFilter(*columns["shape_filter"][index])
+        if columns["shape_sensor"][index]:
+            shape.sensor = True
+        if columns["shape_surface_velocity"][index] != ZERO:
+            shape.surface_velocity = columns["shape_surface_velocity"][index]
+        if mass:
+            shape.mass = mass
+        shapes.append(shape)
+
+    constraints = []
+    for index, (kind, a, b, anchor_a, anchor_b) in enumerate(zip(
+            columns["constraint_kind"], columns["constraint_a"], columns["constraint_b"],
+            columns["constraint_anchor_a"], columns["constraint_anchor_b"])):
+        a, b = owners[a], owners[b]
+        if kind == 0:
+            constraint = pymunk.DampedSpring(a, b, anchor_a, anchor_b, columns["constraint_rest_length"][index],
+                                             columns["constraint_stiffness"][index],
+                                             columns["constraint_damping"][index])
+        elif kind == 1:
+            constraint = pymunk.PinJoint(a, b, anchor_a, anchor_b)
+            constraint.distance = columns["constraint_rest_length"][index]
+        else:
+            constraint = pymunk.PivotJoint(a, b, anchor_a, anchor_b)
+        constraint.max_force = columns["constraint_max_force"][index]
+        constraint.error_bias = columns["constraint_error_bias"][index]
+        constraint.max_bias = columns["constraint_max_bias"][index]
+        constraint.collide_bodies = columns["constraint_collide_bodies"][index]
+        constraints.append(constraint)
+
+    space.add(*bodies, *shapes, *constraints)
+
+    names = meta["names"]
+    snapshot = SandboxSnapshot(
+        space,
+        bodies={name: owners[index] for name, index in names["bodies"].items()},
+        shapes={name: shapes[index] for name, index in names["shapes"].items()},
+        particle_fields={
+            name: ParticleField(name, [bodies[index] for index in field["bodies"]],
+                                [shapes[index] for index in field["shapes"]], field["radius"])
+            for name, field in meta["particle_fields"].items()
+        },
+        terrains={name: [shapes[index] for index in indices] for name, indices in names["terrains"].items()},
+        constraints={name: constraints[index] for name, index in names["constraints"].items()},
+    )
+    return snapshot, meta.get("settings", {})
+
+
+def scene_hash(source) -> str:
+    """
+    场景内容哈希：几何、材料、约束、名称、空间参数，以及速度、外力和休眠状态等运动状态
+
+    内容相同的场景（无论是否为同一个对象）得到相同的哈希，可以作为模拟结果缓存的键。
+
+    Args:
+        source: PhysicsSandbox 或 SandboxSnapshot
+
+    Returns:
+        32位十六进制字符串
+    """
+    meta, arrays = encode_scene(source)
+    bodies = list(source.space.bodies)
+    # 场景文件不保存的运动状态同样影响模拟结果
+    arrays["body_force"] = np.fromiter(chain.from_iterable(body.force for body in bodies), dtype=np.float64,
+                                       count=2 * len(bodies))
+    arrays["body_torque"] = np.fromiter((body.torque for body in bodies), dtype=np.float64, count=len(bodies))
+    arrays["body_sleeping"] = np.fromiter((body.is_sleeping for body in bodies), dtype=np.bool_, count=len(bodies))
+    meta["space"].pop("threads")
+    digest = hashlib.blake2b(json.dumps(meta, sort_keys=True, ensure_ascii=False).encode("utf-8"), digest_size=16)
+    for key in sorted(arrays):
+        digest.update(key.encode("utf-8"))
+        digest.update(np.ascontiguousarray(arrays[key]).tobytes())
+    return digest.hexdigest()
+
+
+def write_scene(path: str, source, settings: Optional[dict] = None, format: Optional[str] = None) -> None:
+    """
+    保存场景文件
+
+    Args:
+        path: 文件路径
+        source: PhysicsSandbox 或 SandboxSnapshot
+        settings: 随场景保存的附加设置
+        format: "npz"（二进制）或 "json"（文本），默认按扩展名判断，非 .json 一律为 npz
+    """
+    format = _scene_format(path, format)
+    meta, arrays = encode_scene(source, settings)
+    if format == "json":
+        document = dict(meta, arrays={key: array.tolist() for key, array in arrays.items()})
+        # 标准json模块可以写出并读回 Infinity（约束的 max_force 默认为无穷大）
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(document, file, ensure_ascii=False, separators=(",", ":"))
+    else:
+        meta_bytes = np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)
+        # np.savez 会给没有 .npz 扩展名的路径追加扩展名，先写入文件对象以保持路径不变
+        with open(path, "wb") as file:
+            np.savez(file, meta=meta_bytes, **arrays)
+
+
+def read_scene(path: str, format: Optional[str] = None) -> Tuple[SandboxSnapshot, dict]:
+    """
+    读取场景文件
+
+    Args:
+        path: 文件路径
+        format: "npz" 或 "json"，默认按扩展名判断
+
+    Returns:
+        (快照, 附加设置)
+    """
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"场景文件'{path}'不存在")
+    format = _scene_format(path, format)
+    if format == "json":
+        with open(path, "r", encoding="utf-8") as file:
+            document = json.load(file)
+        arrays = {}
+        for key, values in document.pop("arrays", {}).items():
+            if key in ARRAY_SCHEMA:
+                dtype, tail = ARRAY_SCHEMA[key]
+                arrays[key] = np.asarray(values, dtype=dtype).reshape(-1, *tail)
+        return decode_scene(document, arrays)
+    with np.load(path, allow_pickle=False) as archive:
+        meta = json.loads(archive["meta"].tobytes().decode("utf-8"))
+        arrays = {key: archive[key] for key in archive.files if key in ARRAY_SCHEMA}
+    return decode_scene(meta, arrays)
@@ -0,0 +1,159 @@
+"""
+沙盒状态的紧凑渲染
+把 get_space_status 的结果（或增量）序列化为适合放入LLM提示词的紧凑JSON：
+数值按固定精度取整，省略为0或默认值的字段，超出字符预算时先省略最不相关的条目
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import orjson
+
+
+# 总是省略的字段：可由其他字段推出或对推理没有帮助
+DROPPED_FIELDS = frozenset({"body_hash", "angle_radians", "moment"})
+# 等于默认值时省略的字段
+DEFAULT_VALUES = {
+    "type": "DYNAMIC",
+    "collide_bodies": True,
+    "iterations": 10,
+    "error_bias": (1.0 - 0.1) ** 60,
+}
+# 条目列表所在的状态分区
+ENTITY_SECTIONS = ("bodies", "shapes", "constraints", "particle_fields")
+
+
+def _is_default(key: str, value) -> bool:
+    """字段值为None、False、0、零向量、非有限数或默认值时可以省略"""
+    if value is None or value is False:
+        return True
+    default = DEFAULT_VALUES.get(key)
+    if default is not None:
+        if isinstance(default, float) and isinstance(value, float):
+            if math.isclose(value, default, rel_tol=1e-5):
+                return True
+        elif value == default:
+            return True
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, (int, float)):
+        return not math.isfinite(value) or value == 0
+    if isinstance(value, (tuple, list)) and value and all(isinstance(item, (int, float)) for item in value):
+        return all(item == 0 for item in value)
+    return False
+
+
+def compact(value, precision: int = 2):
+    """
+    递归压缩状态数据：浮点数取整，省略 DROPPED_FIELDS 以及为0、空或默认值的字段
+
+    Args:
+        value: 状态数据（字典、列表、元组或标量）
+        precision: 浮点数保留的小数位数
+
+    Returns:
+        压缩后的数据，元组转为列表
+    """
+    if isinstance(value, dict):
+        result = {}
+        for key, item in value.items():
+            if key in DROPPED_FIELDS or _is_default(key, item):
+                continue
+            item = compact(item, precision)
+            # 压缩后为空的列表和字典同样省略
+            if item != [] and item != {}:
+                result[key] = item
+        return result
+    if isinstance(value, (list, tuple)):
+        return [compact(item, precision) for item in value]
+    if isinstance(value, float):
+        rounded = round(value, precision) if math.isfinite(value) else None
+        # 避免输出 -0.0
+        return rounded + 0.0 if rounded is not None else None
+    return value
+
+
+def _relevance(section: str, record: dict) -> float:
+    """条目与推理的相关度，越小越先被省略：运动中的动态物体最相关，静态物体和形状几何最不相关"""
+    if section == "particle_fields":
+        return 2.5
+    if section == "constraints":
+        return 2.0
+    static = record.get("type") == "STATIC"
+    moving = "velocity" in record or "angular_velocity" in record
+    score = 1.0 if static else (3.0 if moving else 2.0)
+    if record.get("sleeping"):
+        score = 1.5
+    return score - 0.5 if section == "shapes" else score
+
+
+def _entity_lists(status: dict) -> List[Tuple[str, list]]:
+    """找出状态（或增量）中的条目列表，增量中 added/changed 同样视为条目列表"""
+    lists = []
+    for section in ENTITY_SECTIONS:
+        value = status.get(section)
+        if isinstance(value, list):
+            lists.append((section, value))
+        elif isinstance(value, dict):
+            lists.extend((section, value[key]) for key in ("added", "changed") if isinstance(value.get(key), list))
+    return lists
+
+
+def _dumps(value) -> str:
+    return orjson.dumps(value).decode()
+
+
+def render_status(status: dict, precision: int = 2, max_chars: Optional[int] = None) -> str:
+    """
+    把沙盒状态渲染为紧凑JSON字符串
+
+    Args:
+        status: get_space_status 返回的完整状态或增量
+        precision: 浮点数保留的小数位数
+        max_chars: 字符预算，None表示不限制。超出时按相关度从低到高省略条目（静态物体和形状几何最先），
+            并在 omitted 字段中记录各分区省略的条目数；仍超出预算时依次退化为只有摘要、只有各分区条目数、
+            只有总条目数，输出长度始终不超过 max_chars
+
+    Returns:
+        紧凑JSON字符串
+    """
+    compacted = compact(status, precision)
+    rendered = _dumps(compacted)
+    if max_chars is None or len(rendered) <= max_chars:
+        return rendered
+
+    # 统计每个条目的序列化长度，按相关度从高到低保留，直到用完预算
+    entities = []
+    for section, records in _entity_lists(compacted):
+        for index, record in enumerate(records):
+            entities.append((-_relevance(section, record), len(entities), section, records, index, len(_dumps(record)) + 1))
+    entities.sort()
+    # 预留 omitted 字段的长度
+    remaining = max_chars - (len(rendered) - sum(entity[-1] for entity in entities)) - 80
+    dropped = set()
+    omitted = {}
+    for _, _, section, records, index, size in entities:
+        if size <= remaining:
+            remaining -= size
+        else:
+            dropped.add((id(records), index))
+            omitted[section] = omitted.get(section, 0) + 1
+
+    totals = {}
+    for section, records in _entity_lists(compacted):
+        totals[section] = totals.get(section, 0) + len(records)
+    for _, records in _entity_lists(compacted):
+        records[:] = [record for index, record in enumerate(records) if (id(records), index) not in dropped]
+    compacted["omitted"] = omitted
+    rendered = _dumps(compacted)
+    if len(rendered) <= max_chars:
+        return rendered
+
+    # 预留长度不够或摘要本身超出预算：依次退化为只有摘要、只有各分区条目数、只有总条目数
+    summary = {key: value for key, value in compacted.items() if key not in ENTITY_SECTIONS}
+    summary["omitted"] = totals
+    for fallback in (summary, {"omitted": totals}, {"omitted": sum(totals.values())}, {}):
+        rendered = _dumps(fallback)
+        if len(rendered) <= max_chars:
+            return rendered
+    return ""
@@ -1,12 +1,11 @@
 import streamlit as st
-import pygame as pg
 import time
 import json
 from pymunk_agent import PymunkAgent
-from pymunk.pygame_util import DrawOptions
 from util import CasesSearch
-import imageio
-import numpy as np
+from video_renderer import render_video
+from rollout_cache import RolloutCache
+from config import JUDGE_MIN_COLLISION_IMPULSE, ROLLOUT_CACHE_DIR, ROLLOUT_CACHE_SIZE, VIDEO_RENDERER
 import os
 
 # 设置页面配置
@@ -25,6 +24,9 @@ if 'ready_to_simulate' not in st.session_state:
     st.session_state.ready_to_simulate = False
 if 'video_path' not in st.session_state:
     st.session_state.video_path = None
+if 'rollout_cache' not in st.session_state:
+    # 场景未变化的Judge轮次直接复用上一次的模拟结果
+    st.session_state.rollout_cache = RolloutCache(max_entries=ROLLOUT_CACHE_SIZE, cache_dir=ROLLOUT_CACHE_DIR)
 
 """视频模式：不进行实时线程模拟"""
 
@@ -50,39 +52,17 @@ def clear_logs():
 
 # 删除实时模拟线程逻辑
 
-def render_video_frames(agent, duration_seconds=10, fps=60, width=800, height=600, tmp_dir=".cache_frames"):
-    """离线渲染固定时长到帧序列并编码为mp4，返回视频路径"""
+def render_video_frames(agent, duration_seconds=10, fps=60, width=800, height=600, tmp_dir=".cache_frames",
+                        renderer=VIDEO_RENDERER):
+    """离线渲染固定时长到帧序列并编码为mp4，返回视频路径；renderer 为 "pygame"、"numpy"（无需SDL）或 "parallel"（多进程）"""
     if agent is None:
         raise RuntimeError("Agent未初始化")
     
-    space = agent.tool_manager.sandbox.space
-    
-    # 离线渲染：使用pygame的Surface在内存中绘制
-    pg.init()
-    surface = pg.Surface((width, height))
-    draw_options = DrawOptions(surface)
-    background = (255, 255, 255)
-    total_frames = int(duration_seconds * fps)
-    dt = 1.0 / fps
-    
     os.makedirs(tmp_dir, exist_ok=True)
-    frames = []
-    
-    for _ in range(total_frames):
-        surface.fill(background)
-        space.debug_draw(draw_options)
-        space.step(dt)
-        # 转为RGB ndarray
-        img_str = pg.image.tostring(surface, 'RGB')
-        frame = np.frombuffer(img_str, dtype=np.uint8)
-        frame = frame.reshape((height, width, 3))
-        frames.append(frame)
-    
-    # 编码为mp4
     video_path = os.path.join(tmp_dir, f"simulation_{int(time.time())}.mp4")
-    imageio.mimwrite(video_path, frames, fps=fps, quality=7)
-    pg.quit()
-    return video_path
+    # 流式编码：每帧绘制后直接交给编码线程，不在内存中缓存整段视频
+    return render_video(agent.tool_manager.sandbox, video_path, duration_seconds=duration_seconds, fps=fps,
+                        size=(width, height), renderer=renderer)
 
 def execute_instruction_step_by_step(instruction, log_placeholder):
     """分步执行用户指令，实现实时日志显示"""
@@ -166,7 +146,9 @@ def execute_instruction_step_by_step(instruction, log_placeholder):
             # Judge执行判断
             add_log(f"Judge正在进行结果判断🔍...", "judge")
             update_log_display(log_placeholder)
-            sequence_data = st.session_state.agent.tool_manager.sandbox.get_simulation_sequence()
+            sequence_data = st.session_state.rollout_cache.simulate(st.session_state.agent.tool_manager.sandbox,
+                                                                    output_format="compact", record_collisions=True,
+                                                                    min_collision_impulse=JUDGE_MIN_COLLISION_IMPULSE)
             agent.judge_init(sequence_data=sequence_data, user_instruction=instruction)
             judge_response = agent.judge_execute()
             add_log(f"观察👀   {judge_response["sequence_observation"]}", "judge")
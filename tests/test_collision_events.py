@@ -0,0 +1,28 @@
+"""碰撞事件记录的回归测试"""
+
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLLOUT_SCRIPT = """
+import gc
+from physics_sandbox import PhysicsSandbox
+
+sandbox = PhysicsSandbox()
+sandbox.create_ground("ground", (0, 400), (800, 400))
+sandbox.create_circle("ball", (100, 300), 10)
+result = sandbox.get_simulation_sequence(record_collisions=True, max_steps=200)
+assert result["collision_events"], result["collision_summary"]
+del result
+gc.collect()
+"""
+
+
+def test_recorded_rollout_writes_nothing_to_stderr():
+    """分叉空间析构时触发的 separate 回调不应在 cffi 回调中抛出异常"""
+    completed = subprocess.run([sys.executable, "-c", ROLLOUT_SCRIPT], cwd=REPO_ROOT,
+                               capture_output=True, text=True, timeout=120)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stderr == ""
@@ -0,0 +1,120 @@
+"""
+流式轨迹记录器
+在模拟过程中只物化最终会保留的关键帧，峰值内存与模拟步数无关
+"""
+
+from typing import Any, Callable, List, Tuple
+
+
+class TrajectoryRecorder:
+    """
+    基于步长倍增的有界关键帧记录器
+
+    记录器维护一个容量为 2 * max_frames 的候选帧池，只在步数是当前步长的倍数时
+    调用 capture 物化帧。候选池满时丢弃一半候选帧并把步长翻倍，
+    因此候选帧始终在已模拟区间内均匀分布，且第0步的帧永远保留。
+    通过 mark 标记的关键事件帧（如碰撞开始）单独保存，按标记的序号同样做步长倍增，
+    不在当前步长上的标记直接跳过、不调用 capture，输出时最多占用一半帧数。
+    """
+
+    def __init__(self, capture: Callable[[int], Any], max_frames: int):
+        """
+        初始化记录器
+
+        Args:
+            capture: 物化帧的回调，参数为当前步数，返回该步的帧数据
+            max_frames: 最终输出的最大帧数
+        """
+        self.capture = capture
+        self.max_frames = max(1, max_frames)
+        self.capacity = 2 * self.max_frames
+        self.stride = 1
+        self.candidates: List[Tuple[int, Any]] = []
+        self.marked: List[Tuple[int, Any]] = []
+        self.mark_stride = 1
+        self.mark_count = 0
+        self.last_step = -1
+
+    def record(self, step: int) -> None:
+        """
+        通知记录器第 step 步已完成，按计划决定是否物化该帧
+
+        Args:
+            step: 当前步数，从0开始连续递增
+        """
+        self.last_step = step
+        if step % self.stride != 0:
+            return
+        self.candidates.append((step, self.capture(step)))
+        if len(self.candidates) > self.capacity:
+            # 步长翻倍，只保留落在新步长上的候选帧
+            self.stride *= 2
+            self.candidates = [item for item in self.candidates if item[0] % self.stride == 0]
+
+    def mark(self, step: int) -> None:
+        """
+        标记第 step 步为关键事件帧（需在同一步的 record 之后调用），该帧在输出时优先保留
+
+        Args:
+            step: 当前步数
+        """
+        if self.marked and self.marked[-1][0] == step:
+            return
+        ordinal = self.mark_count
+        self.mark_count += 1
+        if ordinal % self.mark_stride != 0:
+            return
+        if self.candidates and self.candidates[-1][0] == step:
+            frame = self.candidates[-1][1]
+        else:
+            frame = self.capture(step)
+        self.marked.append((step, frame))
+        if len(self.marked) > self.capacity:
+            # 事件过多时步长翻倍、隔一个保留一个（保留的正是序号为新步长倍数的标记），仍覆盖整个模拟区间
+            self.mark_stride *= 2
+            self.marked = self.marked[::2]
+
+    def finish(self) -> None:
+        """模拟结束时调用，确保最后一步的帧被物化（此时空间仍处于最后一步的状态）"""
+        if self.last_step >= 0 and (not self.candidates or self.candidates[-1][0] != self.last_step):
+            self.candidates.append((self.last_step, self.capture(self.last_step)))
+
+    @property
+    def final_frame(self) -> Any:
+        """最后一步的帧，需在 finish 之后读取"""
+        return self.candidates[-1][1] if self.candidates else None
+
+    @staticmethod
+    def _select(items: List[Tuple[int, Any]], count: int) -> List[Tuple[int, Any]]:
+        """保留首尾，中间按顺序等间隔抽取，最多 count 项"""
+        if len(items) <= count:
+            return items
+        if count <= 1:
+            return items[:count]
+
+        selected = [items[0]]
+        middle_count = count - 2
+        if middle_count > 0:
+            interval = (len(items) - 2) / (middle_count + 1)
+            for i in range(middle_count):
+                index = int(1 + (i + 1) * interval)
+                if 1 <= index < len(items) - 1:
+                    selected.append(items[index])
+        selected.append(items[-1])
+        return selected
+
+    def frames(self) -> List[Any]:
+        """
+        从候选帧中选出输出序列：保留首帧和末帧，中间按顺序等间隔抽取；
+        存在关键事件帧时，至多一半的名额留给从中等间隔选出的事件帧，两者按步数合并
+
+        Returns:
+            不超过 max_frames 的帧列表
+        """
+        event_count = min(len(self.marked), max(0, (self.max_frames - 2) // 2))
+        selected = self._select(self.candidates, self.max_frames - event_count)
+        selected_steps = {step for step, _ in selected}
+        marked = [item for item in self.marked if item[0] not in selected_steps]
+        # 均匀帧不足时剩余名额都可以给事件帧
+        events = self._select(marked, min(len(marked), self.max_frames - len(selected)))
+        return [frame for _, frame in sorted(selected + events, key=lambda item: item[0])]
@@ -0,0 +1,280 @@
+"""
+离线视频渲染
+模拟、绘制和编码组成流式流水线：每一帧绘制后立即放入有界队列，由编码线程增量写入视频文件，
+峰值内存与视频时长和帧率无关，编码与模拟重叠进行。
+帧数据直接引用 pygame Surface 的像素内存交给 ffmpeg，不经过中间字节串；
+静态几何（地面、斜面、地形等）只绘制一次缓存为背景图层，每帧只重绘运动物体和约束；
+也可以改用不需要pygame/SDL的NumPy光栅化器（numpy_rasterizer）绘制，或先记录轨迹再多进程并行绘制（parallel_video）
+"""
+
+import queue
+import sys
+import threading
+from functools import partial
+from typing import Callable, Optional, Tuple
+
+import imageio_ffmpeg
+import numpy as np
+import pygame as pg
+import pymunk
+from pymunk.pygame_util import DrawOptions
+
+from numpy_rasterizer import RasterScene
+from parallel_video import render_video_parallel
+from physics_sandbox import PhysicsSandbox
+
+
+# render_video 可选的绘制方式
+RENDERERS = ("pygame", "numpy", "parallel")
+# 绘制用Surface的32位像素掩码（R、G、B、无alpha），以及该布局在内存中的字节顺序对应的ffmpeg像素格式
+SURFACE_MASKS = (0xFF0000, 0xFF00, 0xFF, 0)
+SURFACE_PIX_FMT = "bgr0" if sys.byteorder == "little" else "0rgb"
+
+
+class StreamingVideoWriter:
+    """
+    后台线程增量编码的视频写入器
+
+    write 把帧放入容量为 queue_size 的队列，队列满时阻塞，使绘制速度不会超过编码速度太多；
+    编码线程把帧数据直接写入 ffmpeg 的标准输入（imageio_ffmpeg.write_frames），C连续的数组不会被复制。
+    编码线程出错时，之后的 write/close 会抛出该异常。
+    """
+
+    def __init__(self, path: str, fps: int, size: Tuple[int, int], pix_fmt_in: str = "rgb24",
+                 quality: int = 7, queue_size: int = 8):
+        """
+        初始化并启动编码线程
+
+        Args:
+            path: 输出视频路径
+            fps: 帧率
+            size: 画面尺寸 (width, height)
+            pix_fmt_in: 输入帧的ffmpeg像素格式，如 "rgb24"（(h, w, 3) 的RGB数组）或 SURFACE_PIX_FMT
+            quality: 编码质量（0-10）
+            queue_size: 等待编码的最大帧数
+        """
+        self.path = path
+        self.frames_written = 0
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._error: Optional[BaseException] = None
+        self._writer = imageio_ffmpeg.write_frames(path, size, fps=fps, quality=quality, pix_fmt_in=pix_fmt_in)
+        self._writer.send(None)  # 启动生成器
+        self._thread = threading.Thread(target=self._run, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "StreamingVideoWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        """编码线程：依次取出帧写入视频，收到None时结束"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, release = item
+            # 出错后继续取空队列并归还缓冲区，避免生产者阻塞
+            if self._error is None:
+                try:
+                    self._writer.send(np.ascontiguousarray(frame))
+                    self.frames_written += 1
+                except BaseException as e:
+                    self._error = e
+            del frame, item
+            if release is not None:
+                release()
+
+    def write(self, frame: np.ndarray, release: Optional[Callable[[], None]] = None) -> None:
+        """
+        提交一帧，在 release 被调用（或没有 release 时永远）之前调用方不能再修改该帧的内存
+
+        Args:
+            frame: 与 pix_fmt_in 对应的帧数组
+            release: 该帧写入ffmpeg后在编码线程中调用，用于归还帧缓冲区
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((frame, release))
+
+    def close(self) -> None:
+        """等待队列中的帧全部编码完成并关闭视频文件"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+            self._writer.close()
+        if self._error is not None:
+            raise self._error
+
+
+def surface_pixels(surface: pg.Surface) -> np.ndarray:
+    """
+    Surface像素内存的 (height, width, 4) 视图，不复制；行尾有填充时才复制出连续数组
+
+    视图存在期间Surface保持锁定，填充和绘制不受影响，但不能作为blit的源或目标
+    """
+    width, height = surface.get_size()
+    pitch = surface.get_pitch()
+    pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8).reshape(height, pitch)
+    if pitch != width * 4:
+        return np.ascontiguousarray(pixels[:, :width * 4]).reshape(height, width, 4)
+    return pixels.reshape(height, width, 4)
+
+
+def draw_shape(draw_options: pymunk.SpaceDebugDrawOptions, shape: pymunk.Shape) -> None:
+    """按 space.debug_draw 的方式（相同的图元与颜色）绘制单个形状"""
+    fill_color = draw_options.color_for_shape(shape)
+    outline_color = draw_options.shape_outline_color
+    body = shape.body
+    if isinstance(shape, pymunk.Circle):
+        draw_options.draw_circle(body.local_to_world(shape.offset), body.angle, shape.radius, outline_color,
+                                 fill_color)
+    elif isinstance(shape, pymunk.Segment):
+        draw_options.draw_fat_segment(body.local_to_world(shape.a), body.local_to_world(shape.b), shape.radius,
+                                      outline_color, fill_color)
+    elif isinstance(shape, pymunk.Poly):
+        vertices = [body.local_to_world(vertex) for vertex in shape.get_vertices()]
+        draw_options.draw_polygon(vertices, shape.radius, outline_color, fill_color)
+
+
+class StaticLayerRenderer:
+    """
+    带静态图层缓存的绘制器
+
+    静态物体的形状绘制在缓存的背景图层上，每帧先把图层像素复制到目标Surface，再绘制非静态物体的形状，
+    最后用 space.debug_draw 绘制约束（不绘制形状）。沙盒的 space 对象或场景版本号（scene_version）
+    变化时重新绘制图层；步进不改变场景版本号，因此模拟过程中图层一直复用。
+    静态形状总是位于运动物体下方，这是与 space.debug_draw 按添加顺序绘制的唯一区别。
+    """
+
+    def __init__(self, size: Tuple[int, int], background: Tuple[int, int, int] = (255, 255, 255)):
+        """
+        初始化绘制器
+
+        Args:
+            size: 画面尺寸 (width, height)，目标Surface必须是该尺寸、SURFACE_MASKS格式的32位Surface
+            background: 背景颜色
+        """
+        self.size = size
+        self.background = background
+        self.layer_redraws = 0
+        self._space: Optional[pymunk.Space] = None
+        self._scene_version = -1
+        self._layer_pixels = np.zeros(0, dtype=np.uint8)
+        self._moving_shapes: list = []
+
+    def _refresh(self, sandbox: PhysicsSandbox) -> None:
+        """场景变化时重新绘制静态图层并重新划分静态/非静态形状"""
+        if self._space is sandbox.space and self._scene_version == sandbox.scene_version:
+            return
+        layer = pg.Surface(self.size, 0, 32, SURFACE_MASKS)
+        layer.fill(self.background)
+        layer_options = DrawOptions(layer)
+        self._moving_shapes = []
+        for shape in sandbox.space.shapes:
+            if shape.body.body_type == pymunk.Body.STATIC:
+                draw_shape(layer_options, shape)
+            else:
+                self._moving_shapes.append(shape)
+        self._layer_pixels = np.frombuffer(layer.get_buffer(), dtype=np.uint8).copy()
+        self._space = sandbox.space
+        self._scene_version = sandbox.scene_version
+        self.layer_redraws += 1
+
+    def draw(self, sandbox: PhysicsSandbox, surface: pg.Surface, draw_options: DrawOptions) -> None:
+        """
+        把沙盒当前状态绘制到 surface 上（覆盖原有内容）
+
+        图层通过像素内存复制而不是blit，目标Surface被 surface_pixels 的视图锁定时也可以绘制
+
+        Args:
+            sandbox: 要绘制的沙盒
+            surface: 目标Surface
+            draw_options: 绑定到 surface 的 DrawOptions
+        """
+        self._refresh(sandbox)
+        pixels = np.frombuffer(surface.get_buffer(), dtype=np.uint8)
+        if pixels.shape != self._layer_pixels.shape:
+            raise ValueError(f"目标Surface的尺寸或像素格式与静态图层{self.size}不一致")
+        pixels[:] = self._layer_pixels
+        del pixels
+        for shape in self._moving_shapes:
+            draw_shape(draw_options, shape)
+        flags = draw_options.flags
+        draw_options.flags = flags & ~DrawOptions.DRAW_SHAPES
+        try:
+            sandbox.space.debug_draw(draw_options)
+        finally:
+            draw_options.flags = flags
+
+
+def render_video(sandbox: PhysicsSandbox, video_path: str, duration_seconds: float = 10, fps: int = 60,
+                 size: Tuple[int, int] = (800, 600), background: Tuple[int, int, int] = (255, 255, 255),
+                 queue_size: int = 8, static_layer: bool = True, renderer: str = "pygame") -> str:
+    """
+    逐帧步进沙盒并把绘制结果流式编码为视频
+
+    绘制使用 queue_size + 2 个帧缓冲区（Surface或数组）轮流进行：一个缓冲区被编码线程写入ffmpeg后才回到池中重绘，
+    帧数据从绘制到编码都不复制。
+
+    Args:
+        sandbox: 要渲染的沙盒（会被原地步进）
+        video_path: 输出视频路径
+        duration_seconds: 视频时长（秒）
+        fps: 帧率，同时决定步进的时间步长
+        size: 画面尺寸 (width, height)
+        background: 背景颜色
+        queue_size: 等待编码的最大帧数
+        static_layer: 是否缓存静态几何图层（见 StaticLayerRenderer），False时每帧用 space.debug_draw 绘制整个空间；
+            只对 pygame 绘制方式有效
+        renderer: 绘制方式，"pygame" 使用 pymunk.pygame_util.DrawOptions，
+            "numpy" 使用 numpy_rasterizer.RasterScene（不初始化pygame，同类形状批量光栅化），
+            "parallel" 使用 parallel_video.render_video_parallel（先记录位姿轨迹，再按CPU核数并行绘制和编码）
+
+    Returns:
+        视频路径
+    """
+    if renderer not in RENDERERS:
+        raise ValueError(f"未知的绘制方式'{renderer}'，可选：{', '.join(RENDERERS)}")
+    total_frames = int(duration_seconds * fps)
+    dt = 1.0 / fps
+
+    if renderer == "parallel":
+        return render_video_parallel(sandbox, video_path, duration_seconds=duration_seconds, fps=fps, size=size,
+                                     background=background)
+    if renderer == "numpy":
+        scene = RasterScene(sandbox.space, size, background)
+        buffers: "queue.Queue[np.ndarray]" = queue.Queue()
+        for _ in range(queue_size + 2):
+            buffers.put(np.empty_like(scene.background))
+        with StreamingVideoWriter(video_path, fps, size, pix_fmt_in="rgb24", queue_size=queue_size) as writer:
+            for _ in range(total_frames):
+                frame = scene.render(out=buffers.get())
+                sandbox.step(dt)
+                writer.write(frame, release=partial(buffers.put, frame))
+        return video_path
+
+    # 离线渲染：使用pygame的Surface在内存中绘制
+    pg.init()
+    try:
+        layer_renderer = StaticLayerRenderer(size, background) if static_layer else None
+        pool: "queue.Queue[Tuple[pg.Surface, DrawOptions]]" = queue.Queue()
+        for _ in range(queue_size + 2):
+            surface = pg.Surface(size, 0, 32, SURFACE_MASKS)
+            pool.put((surface, DrawOptions(surface)))
+        with StreamingVideoWriter(video_path, fps, size, pix_fmt_in=SURFACE_PIX_FMT,
+                                  queue_size=queue_size) as writer:
+            for _ in range(total_frames):
+                entry = pool.get()
+                surface, draw_options = entry
+                if layer_renderer is not None:
+                    layer_renderer.draw(sandbox, surface, draw_options)
+                else:
+                    surface.fill(background)
+                    sandbox.space.debug_draw(draw_options)
+                sandbox.step(dt)
+                writer.write(surface_pixels(surface), release=partial(pool.put, entry))
+    finally:
+        pg.quit()
+    return video_path